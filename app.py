@@ -1,4 +1,11 @@
 # app.py
+import multiprocessing
+
+if __name__ == '__main__':
+    # Executável (PyInstaller): um processo filho do pool de agregação roda
+    # apenas a tarefa e termina aqui, antes de importar o Dash e os callbacks
+    multiprocessing.freeze_support()
+
 import os
 import base64
 import json
@@ -28,8 +35,15 @@ from layouts.tracks_usage_manager import create_tracks_usage_manager_layout
 from layouts.eja_analysis import create_eja_analysis_layout, create_eja_analysis_table
 from layouts.vehicle_analysis import create_vehicle_analysis_layout, create_vehicle_analysis_table
 
-from data.database import get_available_months, load_dashboard_data
+from data.database import get_available_months, load_dashboard_data, fetch_vehicle_access_report, fetch_usage_cube
 from data.weekly_processor import setup_scheduler
+from data.access_mirror import schedule_access_mirror_sync
+from data.prefetch import start_prefetch
+from utils.durations import format_minutes
+from data.usage_cube import rollup, rollup_with_first
+from data.eja_catalog import get_eja_catalog, find_missing_ejas
+from data.aggregation_pool import run_aggregation
+from data.query_control import QueryCancelled, interactive_query
 from data.database import ReportGenerator
 
 
@@ -41,6 +55,16 @@ def init_weekly_processor():
     setup_scheduler()
     trace("Inicialização do processador semanal concluída", color="green")
 
+
+def init_access_mirror():
+    # Sincronização em segundo plano, sob a concessão do agendador (inclusive a
+    # primeira); as leituras do dashboard são apenas locais
+    schedule_access_mirror_sync()
+
+    # Aquecimento do cache do dashboard e manutenção noturna (após a sincronização do espelho)
+    start_prefetch()
+
+
 # Inicializar a aplicação Dash com Bootstrap para melhor estilo
 app = dash.Dash(
     __name__,
@@ -60,6 +84,7 @@ app = dash.Dash(
 # Definição inicial do layout com navegação por abas
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
+    dcc.Store(id='session-id', storage_type='session'),
     dcc.Store(id='eja-store', data={}),
     dcc.Store(id='eja-data-store', data={}),
     html.Div(id='dummy-div-edit', style={'display': 'none'}),
@@ -242,6 +267,25 @@ app.clientside_callback(
 )
 
 
+# Identificador da sessão do navegador (usado para substituir consultas em andamento)
+app.clientside_callback(
+    """
+    function(pathname, sessionId) {
+        if (sessionId) {
+            return window.dash_clientside.no_update;
+        }
+        if (window.crypto && window.crypto.randomUUID) {
+            return window.crypto.randomUUID();
+        }
+        return Date.now().toString(36) + Math.random().toString(36).slice(2);
+    }
+    """,
+    Output('session-id', 'data'),
+    Input('url', 'pathname'),
+    State('session-id', 'data')
+)
+
+
 app.clientside_callback(
     """
     function(value) {
@@ -366,9 +410,10 @@ def load_month_data(selected_month_value):
         Output('loading-overlay', 'style', allow_duplicate=True)
     ],
     [Input('dashboard-data-store', 'data')],
+    [State('session-id', 'data')],
     prevent_initial_call=True
 )
-def update_dashboard_content(data):
+def update_dashboard_content(data, session_id):
     """Callback para atualizar o conteúdo do dashboard e controlar o overlay de carregamento"""
     # Estilo para esconder o overlay
     hidden_style = {
@@ -408,11 +453,14 @@ def update_dashboard_content(data):
 
         # Tentar carregar os dados, com tratamento para erro
         try:
-            result = load_dashboard_data(start_date, end_date)
+            with interactive_query(session_id, 'dashboard-content') as cancel_token:
+                result = load_dashboard_data(start_date, end_date, cancel_token=cancel_token)
 
             # Desempacotar o resultado
             dfs, tracks_data, areas_data_df, periodo_info = result
 
+        except QueryCancelled:
+            raise
         except Exception as e:
             # Capturar qualquer erro durante o carregamento de dados
             print(f"Erro ao carregar dados: {str(e)}")
@@ -439,6 +487,9 @@ def update_dashboard_content(data):
         ytd_availability_percentage = periodo_info.get('ytd_availability_percentage', '0%')
         total_hours = periodo_info.get('total_hours', '0')
         total_hours_ytd = periodo_info.get('total_hours_ytd', '0')
+        if periodo_info.get('ytd_partial'):
+            # Meses sem total disponível localmente: YTD incompleto
+            total_hours_ytd = f"{total_hours_ytd} (partial)"
 
         print(
             f"Valores extraídos: ytd_util={ytd_utilization_percentage}, ytd_avail={ytd_availability_percentage}, total_hours={total_hours}, total_hours_ytd={total_hours_ytd}")
@@ -513,6 +564,9 @@ def update_dashboard_content(data):
         # O overlay será escondido pelo callback clientside quando o dashboard estiver completamente renderizado
         return dashboard_content, no_update
 
+    except QueryCancelled:
+        # Requisição substituída por uma mais nova (ou tempo limite): manter o conteúdo atual
+        raise PreventUpdate
     except Exception as e:
         print(f"Erro ao atualizar conteúdo do dashboard: {e}")
         print(traceback.format_exc())
@@ -2200,11 +2254,12 @@ def enable_analyze_button(month_value):
     Input("analyze-button", "n_clicks"),
     [
         State("analysis-month-selector", "value"),
-        State("analysis-classification-filter", "value")
+        State("analysis-classification-filter", "value"),
+        State("session-id", "data")
     ],
     prevent_initial_call=True
 )
-def analyze_eja_usage(n_clicks, month_value, classification_filter):
+def analyze_eja_usage(n_clicks, month_value, classification_filter, session_id):
     """Analisa a utilização de EJAs para o período selecionado"""
     if not n_clicks or not month_value:
         raise PreventUpdate
@@ -2214,29 +2269,11 @@ def analyze_eja_usage(n_clicks, month_value, classification_filter):
         # Extrair datas do período
         start_date, end_date = month_value.split('|')
 
-        # Obter conexão com o banco
-        from data.database import get_db_connection
-        sql = get_db_connection()
-
-        if not sql:
-            return (
-                html.Div("Erro ao conectar ao banco de dados.", className="text-center text-danger my-4"),
-                {},
-                True,
-                "Erro ao conectar ao banco de dados",
-                "danger",
-                True
-            )
-
-        # Formatar datas para a stored procedure
-        start_date_formatted = f"{start_date} 00:00:00.000"
-        end_date_formatted = f"{end_date} 23:59:59.999"
-
-        # Obter dados do banco
-        dashboard_df = sql.execute_stored_procedure_df("sp_VehicleAccessReport",
-                                                       [start_date_formatted, end_date_formatted])
+        # Obter o cubo de utilização do período (compartilhado via cache de resultados)
+        with interactive_query(session_id, 'eja-analysis-table-container') as cancel_token:
+            usage_cube = fetch_usage_cube(start_date, end_date, cancel_token=cancel_token)
 
-        if dashboard_df is None or dashboard_df.empty:
+        if usage_cube is None or usage_cube.empty:
             return (
                 html.Div("Nenhum dado encontrado para o período selecionado.",
                          className="text-center text-warning my-4"),
@@ -2247,36 +2284,25 @@ def analyze_eja_usage(n_clicks, month_value, classification_filter):
                 True
             )
 
-        # Processar dados
-        report_gen = ReportGenerator(dashboard_df=dashboard_df)
+        report_gen = ReportGenerator()
 
-        # Converter tempo para horas decimais
-        dashboard_df['HorasDecimais'] = dashboard_df['StayTime'].apply(report_gen.converter_tempo_para_horas)
+        # Catálogo de EJAs em memória (lookup pelo código inteiro)
+        catalog = get_eja_catalog().snapshot()
 
-        # Obter todos os EJAs do banco
-        eja_manager = get_eja_manager()
-        all_ejas = eja_manager.get_all_ejas()
-
-        # Criar dicionário de EJAs para lookup rápido
-        eja_dict = {str(eja['eja_code']): eja for eja in all_ejas}
-
-        # Agrupar por EJA
-        eja_usage = dashboard_df.groupby('EJA')['HorasDecimais'].sum().reset_index()
+        # Agrupar por EJA (rollup do cubo)
+        eja_usage = rollup(usage_cube, 'EJA')
+        eja_usage['HorasDecimais'] = eja_usage['minutes'] / 60.0
 
         # Calcular total de horas
         total_hours = eja_usage['HorasDecimais'].sum()
 
         # Processar dados para análise
         analysis_data = []
-        # cumulative_percentage = 0
 
         # Aplicar filtro de classificação primeiro
         if classification_filter != "ALL":
             # Filtrar EJAs pela classificação
-            filtered_eja_codes = [
-                str(eja['eja_code']) for eja in all_ejas
-                if eja.get('new_classification') == classification_filter
-            ]
+            filtered_eja_codes = catalog.codes_for_classification(classification_filter)
             eja_usage = eja_usage[eja_usage['EJA'].isin(filtered_eja_codes)]
             # Recalcular total após filtro
             total_hours = eja_usage['HorasDecimais'].sum()
@@ -2284,14 +2310,12 @@ def analyze_eja_usage(n_clicks, month_value, classification_filter):
         # Reordenar após filtro
         eja_usage = eja_usage.sort_values('HorasDecimais', ascending=False)
 
-        for _, row in eja_usage.iterrows():
-            eja_code = str(row['EJA'])
-            hours = row['HorasDecimais']
+        for code, hours in zip(eja_usage['EJA'], eja_usage['HorasDecimais']):
+            eja_code = str(int(code))
             percentage = (hours / total_hours * 100) if total_hours > 0 else 0
-            # cumulative_percentage += percentage
 
             # Obter informações do EJA
-            eja_info = eja_dict.get(eja_code, {})
+            eja_info = catalog.by_code.get(int(code), {})
 
             # Se não encontrar o título, usar o código EJA
             if eja_info:
@@ -2339,6 +2363,8 @@ def analyze_eja_usage(n_clicks, month_value, classification_filter):
             False
         )
 
+    except QueryCancelled:
+        raise PreventUpdate
     except Exception as e:
         trace(f"Erro na análise de EJAs: {str(e)}", color="red")
         return (
@@ -2471,10 +2497,11 @@ def export_analysis_to_csv(n_clicks, store_data):
         Output("missing-ejas-store", "data")
     ],
     [Input('dashboard-data-store', 'data')],
+    [State('session-id', 'data')],
     prevent_initial_call=True
 )
-def check_missing_ejas_with_vehicle_fixed(dashboard_data):
-    """Versão corrigida - cria HorasDecimais ANTES de usar"""
+def check_missing_ejas_with_vehicle_fixed(dashboard_data, session_id):
+    """Notifica eventos sem EJA informado ou com EJA não cadastrado (agregação no pool de processos)"""
     if not dashboard_data or 'status' in dashboard_data:
         return False, [], []
 
@@ -2486,20 +2513,9 @@ def check_missing_ejas_with_vehicle_fixed(dashboard_data):
         if not start_date or not end_date:
             return False, [], []
 
-        # Carregar dados do banco
-        from data.database import get_db_connection
-        sql = get_db_connection()
-
-        if not sql:
-            return False, [], []
-
-        # Formatar datas
-        start_date_formatted = f"{start_date} 00:00:00.000"
-        end_date_formatted = f"{end_date} 23:59:59.999"
-
-        # Obter dados
-        dashboard_df = sql.execute_stored_procedure_df("sp_VehicleAccessReport",
-                                                       [start_date_formatted, end_date_formatted])
+        # Obter dados (compartilhados via cache de resultados)
+        with interactive_query(session_id, 'eja-not-found-notification') as cancel_token:
+            dashboard_df = fetch_vehicle_access_report(start_date, end_date, cancel_token=cancel_token)
 
         if dashboard_df is None or dashboard_df.empty:
             return False, [], []
@@ -2512,177 +2528,55 @@ def check_missing_ejas_with_vehicle_fixed(dashboard_data):
             print("AVISO: Coluna 'Vehicle' não encontrada nos dados")
             return False, [], []
 
-        # ====== CRIAR COLUNA HorasDecimais PRIMEIRO ======
-        from data.database import ReportGenerator
-        report_gen = ReportGenerator(dashboard_df=dashboard_df)
-        dashboard_df['HorasDecimais'] = dashboard_df['StayTime'].apply(report_gen.converter_tempo_para_horas)
-
-        print(f"DEBUG: Coluna HorasDecimais criada com {dashboard_df['HorasDecimais'].sum():.2f} horas totais")
-
-        # ====== ANÁLISE DE EJA E VEHICLE ======
-        def analyze_eja_vehicle(row):
-            """Analisa cada linha e determina o tipo de problema"""
-            eja_val = row['EJA']
-            vehicle_val = row['Vehicle']
-
-            # Processar valor do EJA
-            eja_is_empty = False
-            eja_clean = None
-
-            if eja_val is None or pd.isna(eja_val):
-                eja_is_empty = True
-            else:
-                try:
-                    eja_str = str(eja_val).strip()
-                    if not eja_str or eja_str.lower() in ['nan', 'none', 'null', '']:
-                        eja_is_empty = True
-                    else:
-                        eja_clean = eja_str
-                except Exception:
-                    eja_is_empty = True
-
-            # Processar valor do Vehicle
-            vehicle_clean = "N/A"
-            if vehicle_val is not None and not pd.isna(vehicle_val):
-                try:
-                    vehicle_str = str(vehicle_val).strip()
-                    if vehicle_str and vehicle_str.lower() not in ['nan', 'none', 'null', '']:
-                        vehicle_clean = vehicle_str
-                except Exception:
-                    pass
-
-            return pd.Series({
-                'eja_is_empty': eja_is_empty,
-                'eja_clean': eja_clean,
-                'vehicle_clean': vehicle_clean
-            })
-
-        # Aplicar análise (usando apply com result_type='expand' para criar múltiplas colunas)
-        analysis_cols = dashboard_df.apply(analyze_eja_vehicle, axis=1)
-        dashboard_df = pd.concat([dashboard_df, analysis_cols], axis=1)
+        report_gen = ReportGenerator()
 
-        # # Separar registros problemáticos
-        # empty_eja_df = dashboard_df[dashboard_df['eja_is_empty'] is True].copy()
-        # valid_eja_df = dashboard_df[dashboard_df['eja_is_empty'] is False].copy()
+        # ====== ANÁLISE DE EJA E VEHICLE (vetorizada, no pool de agregação) ======
+        catalog = get_eja_catalog().snapshot()
+        print(f"DEBUG: {len(catalog)} EJAs cadastrados no sistema")
 
-        empty_eja_df = dashboard_df[dashboard_df['eja_is_empty']].copy()
-        valid_eja_df = dashboard_df[~dashboard_df['eja_is_empty']].copy()
-
-        print(f"DEBUG: {len(empty_eja_df)} registros com EJA vazio")
-        print(f"DEBUG: {len(valid_eja_df)} registros com EJA válido")
-
-        # Obter EJAs cadastrados
-        from layouts.eja_manager import get_eja_manager
-        eja_manager = get_eja_manager()
-        all_ejas = eja_manager.get_all_ejas()
-        ejas_cadastrados = set()
-
-        for eja in all_ejas:
-            eja_code = eja.get('eja_code')
-            if eja_code is not None:
-                ejas_cadastrados.add(str(eja_code).strip())
-
-        print(f"DEBUG: {len(ejas_cadastrados)} EJAs cadastrados no sistema")
+        with interactive_query(session_id, 'eja-not-found-notification') as cancel_token:
+            problems = run_aggregation(
+                find_missing_ejas, dashboard_df, catalog.codes,
+                columns=['EJA', 'Vehicle', 'StayTime'], cancel_token=cancel_token
+            )
 
         # Preparar dados para relatório
         missing_data = []
 
-        # ====== PROCESSAR EJAs VAZIOS (MOSTRAR VEHICLE) ======
-        if not empty_eja_df.empty:
-            print(f"DEBUG: Processando {len(empty_eja_df)} registros com EJA vazio")
-
-            # Verificar se a coluna HorasDecimais existe no dataframe filtrado
-            if 'HorasDecimais' not in empty_eja_df.columns:
-                print("ERRO: Coluna HorasDecimais não existe no dataframe filtrado")
-                return False, [], []
-
-            # Agrupar por Vehicle
-            try:
-                vehicle_groups = empty_eja_df.groupby('vehicle_clean')['HorasDecimais'].sum().reset_index()
-                vehicle_groups.columns = ['vehicle_clean', 'total_hours']
-
-                print(f"DEBUG: {len(vehicle_groups)} grupos de vehicles encontrados")
-
-                for _, row in vehicle_groups.iterrows():
-                    vehicle_name = row['vehicle_clean']
-                    total_hours = row['total_hours']
-
-                    # Contar eventos para este vehicle
-                    event_count = len(empty_eja_df[empty_eja_df['vehicle_clean'] == vehicle_name])
-
-                    # Obter amostra de vehicles originais
-                    original_vehicles = empty_eja_df[empty_eja_df['vehicle_clean'] == vehicle_name]['Vehicle'].unique()
-
-                    missing_data.append({
-                        'problem_type': 'eja_vazio',
-                        'identifier': vehicle_name,
-                        'display_title': f"Veículo: {vehicle_name}",
-                        'display_subtitle': "EJA não informado",
-                        'total_hours': total_hours,
-                        'total_hours_formatted': report_gen.format_datetime(total_hours),
-                        'event_count': event_count,
-                        'additional_info': f"Variações: {', '.join(original_vehicles[:2])}" if len(original_vehicles) > 1 else "",
-                        'color_class': 'border-left-danger',
-                        'icon': '🚗'
-                    })
-
-                    print(f"DEBUG: Vehicle {vehicle_name}: {event_count} eventos, {total_hours:.2f} horas")
-
-            except Exception as e:
-                print(f"ERRO ao agrupar vehicles: {str(e)}")
-                # Fallback: processar individualmente
-                unique_vehicles = empty_eja_df['vehicle_clean'].unique()
-                for vehicle_name in unique_vehicles:
-                    vehicle_data = empty_eja_df[empty_eja_df['vehicle_clean'] == vehicle_name]
-                    total_hours = vehicle_data['HorasDecimais'].sum()
-                    event_count = len(vehicle_data)
-
-                    missing_data.append({
-                        'problem_type': 'eja_vazio',
-                        'identifier': vehicle_name,
-                        'display_title': f"Veículo: {vehicle_name}",
-                        'display_subtitle': "EJA não informado",
-                        'total_hours': total_hours,
-                        'total_hours_formatted': report_gen.format_datetime(total_hours),
-                        'event_count': event_count,
-                        'additional_info': "",
-                        'color_class': 'border-left-danger',
-                        'icon': '🚗'
-                    })
-
-        # ====== PROCESSAR EJAs VÁLIDOS NÃO CADASTRADOS ======
-        if not valid_eja_df.empty:
-            print(f"DEBUG: Processando {len(valid_eja_df)} registros com EJA válido")
-
-            # Encontrar EJAs não cadastrados
-            ejas_validos = set(str(eja) for eja in valid_eja_df['eja_clean'].unique() if eja is not None)
-            ejas_nao_cadastrados = ejas_validos - ejas_cadastrados
-
-            print(f"DEBUG: {len(ejas_nao_cadastrados)} EJAs não cadastrados encontrados")
-
-            for eja_code in ejas_nao_cadastrados:
-                eja_data = valid_eja_df[valid_eja_df['eja_clean'] == eja_code]
-                total_hours = eja_data['HorasDecimais'].sum()
-                event_count = len(eja_data)
-
-                # Obter alguns vehicles que usam este EJA
-                sample_vehicles = eja_data['Vehicle'].dropna().unique()[:3]
-                vehicles_info = f"Ex: {', '.join(sample_vehicles)}" if len(sample_vehicles) > 0 else ""
-
-                missing_data.append({
-                    'problem_type': 'eja_nao_cadastrado',
-                    'identifier': eja_code,
-                    'display_title': f"EJA: {eja_code}",
-                    'display_subtitle': "Não cadastrado no sistema",
-                    'total_hours': total_hours,
-                    'total_hours_formatted': report_gen.format_datetime(total_hours),
-                    'event_count': event_count,
-                    'additional_info': vehicles_info,
-                    'color_class': 'border-left-warning',
-                    'icon': '⚠️'
-                })
+        for problem in problems['eja_vazio']:
+            vehicle_name = problem['identifier']
+            variations = problem['vehicles']
+            missing_data.append({
+                'problem_type': 'eja_vazio',
+                'identifier': vehicle_name,
+                'display_title': f"Veículo: {vehicle_name}",
+                'display_subtitle': "EJA não informado",
+                'total_hours': problem['total_hours'],
+                'total_hours_formatted': report_gen.format_datetime(problem['total_hours']),
+                'event_count': problem['event_count'],
+                'additional_info': f"Variações: {', '.join(variations)}" if len(variations) > 1 else "",
+                'color_class': 'border-left-danger',
+                'icon': '🚗'
+            })
+
+        for problem in problems['eja_nao_cadastrado']:
+            eja_code = problem['identifier']
+            sample_vehicles = problem['vehicles']
+            missing_data.append({
+                'problem_type': 'eja_nao_cadastrado',
+                'identifier': eja_code,
+                'display_title': f"EJA: {eja_code}",
+                'display_subtitle': "Não cadastrado no sistema",
+                'total_hours': problem['total_hours'],
+                'total_hours_formatted': report_gen.format_datetime(problem['total_hours']),
+                'event_count': problem['event_count'],
+                'additional_info': f"Ex: {', '.join(sample_vehicles)}" if sample_vehicles else "",
+                'color_class': 'border-left-warning',
+                'icon': '⚠️'
+            })
 
-                print(f"DEBUG: EJA {eja_code}: {event_count} eventos, {total_hours:.2f} horas")
+        print(f"DEBUG: {len(problems['eja_vazio'])} veículos com EJA vazio, "
+              f"{len(problems['eja_nao_cadastrado'])} EJAs não cadastrados")
 
         if not missing_data:
             print("DEBUG: Nenhum problema encontrado")
@@ -2816,6 +2710,8 @@ def check_missing_ejas_with_vehicle_fixed(dashboard_data):
         print(f"DEBUG: Notificação criada com {len(missing_data)} problemas")
         return True, notification_content, missing_data
 
+    except QueryCancelled:
+        raise PreventUpdate
     except Exception as e:
         print(f"Erro ao verificar EJAs não cadastrados: {str(e)}")
         import traceback
@@ -2842,9 +2738,10 @@ def redirect_to_eja_manager(n_clicks):
 @app.callback(
     Output('dummy-div-edit', 'children', allow_duplicate=True),
     Input('dashboard-data-store', 'data'),
+    State('session-id', 'data'),
     prevent_initial_call=True
 )
-def diagnostic_eja_data(dashboard_data):
+def diagnostic_eja_data(dashboard_data, session_id):
     """Callback para diagnosticar problemas com dados de EJA"""
     if not dashboard_data or 'status' in dashboard_data:
         return ""
@@ -2857,20 +2754,9 @@ def diagnostic_eja_data(dashboard_data):
         if not start_date or not end_date:
             return ""
 
-        # Carregar dados do banco
-        from data.database import get_db_connection
-        sql = get_db_connection()
-
-        if not sql:
-            return ""
-
-        # Formatar datas
-        start_date_formatted = f"{start_date} 00:00:00.000"
-        end_date_formatted = f"{end_date} 23:59:59.999"
-
-        # Obter dados
-        dashboard_df = sql.execute_stored_procedure_df("sp_VehicleAccessReport",
-                                                       [start_date_formatted, end_date_formatted])
+        # Obter dados (compartilhados via cache de resultados)
+        with interactive_query(session_id, 'dummy-div-edit') as cancel_token:
+            dashboard_df = fetch_vehicle_access_report(start_date, end_date, cancel_token=cancel_token)
 
         if dashboard_df is None or dashboard_df.empty:
             return ""
@@ -2912,7 +2798,7 @@ def diagnostic_eja_data(dashboard_data):
 
             # Verificar valores problemáticos
             print("\n--- VALORES PROBLEMÁTICOS ---")
-            problematic = dashboard_df[dashboard_df['EJA'].isna() | (dashboard_df['EJA'] == '')]
+            problematic = dashboard_df[dashboard_df['EJA'].isna() | (dashboard_df['EJA'].astype(str).str.strip() == '')]
             print(f"Registros com EJA nulo ou vazio: {len(problematic)}")
 
             if len(problematic) > 0:
@@ -2925,6 +2811,8 @@ def diagnostic_eja_data(dashboard_data):
 
         return ""
 
+    except QueryCancelled:
+        raise PreventUpdate
     except Exception as e:
         print(f"Erro no diagnóstico: {str(e)}")
         import traceback
@@ -2977,11 +2865,12 @@ def enable_vehicle_analyze_button(month_value):
     Input("vehicle-analyze-button", "n_clicks"),
     [
         State("vehicle-analysis-month-selector", "value"),
-        State("vehicle-search-term", "value")
+        State("vehicle-search-term", "value"),
+        State("session-id", "data")
     ],
     prevent_initial_call=True
 )
-def analyze_vehicle_usage(n_clicks, month_value, search_term):
+def analyze_vehicle_usage(n_clicks, month_value, search_term, session_id):
     """Analisa a utilização de veículos e empresas para o período selecionado"""
     if not n_clicks or not month_value:
         raise PreventUpdate
@@ -2990,28 +2879,11 @@ def analyze_vehicle_usage(n_clicks, month_value, search_term):
         # Extrair datas do período
         start_date, end_date = month_value.split('|')
 
-        # Obter conexão com o banco
-        from data.database import get_db_connection
-        sql = get_db_connection()
+        # Obter o cubo de utilização do período (compartilhado via cache de resultados)
+        with interactive_query(session_id, 'vehicle-analysis-table-container') as cancel_token:
+            usage_cube = fetch_usage_cube(start_date, end_date, cancel_token=cancel_token)
 
-        if not sql:
-            return (
-                html.Div("Erro ao conectar ao banco de dados.", className="text-center text-danger my-4"),
-                {},
-                True,
-                "Erro ao conectar ao banco de dados",
-                "danger"
-            )
-
-        # Formatar datas para a stored procedure
-        start_date_formatted = f"{start_date} 00:00:00.000"
-        end_date_formatted = f"{end_date} 23:59:59.999"
-
-        # Obter dados do banco
-        dashboard_df = sql.execute_stored_procedure_df("sp_VehicleAccessReport",
-                                                       [start_date_formatted, end_date_formatted])
-
-        if dashboard_df is None or dashboard_df.empty:
+        if usage_cube is None:
             return (
                 html.Div("Nenhum dado encontrado para o período selecionado.",
                          className="text-center text-warning my-4"),
@@ -3021,15 +2893,8 @@ def analyze_vehicle_usage(n_clicks, month_value, search_term):
                 "warning"
             )
 
-        # Filtrar dados seguindo a lógica do script auxiliar
-        # Garantir que StayTime não seja nulo, vazio ou inválido
-        filtered_df = dashboard_df[
-            dashboard_df['StayTime'].notna()
-            & (dashboard_df['StayTime'] != '')
-            & dashboard_df['StayTime'].str.contains(':', na=False)
-        ].copy()
-
-        if filtered_df.empty:
+        # O cubo contém apenas eventos com StayTime válido (HH:MM), como no script auxiliar
+        if usage_cube.empty:
             return (
                 html.Div("Nenhum dado válido encontrado para o período selecionado.",
                          className="text-center text-warning my-4"),
@@ -3039,103 +2904,29 @@ def analyze_vehicle_usage(n_clicks, month_value, search_term):
                 "warning"
             )
 
-        # Função para converter StayTime HH:MM para horas decimais (replicando a lógica SQL)
-        def convert_staytime_to_decimal_hours(stay_time):
-            try:
-                if pd.isna(stay_time) or not isinstance(stay_time, str) or ':' not in stay_time:
-                    return 0.0
-
-                parts = stay_time.split(':')
-                if len(parts) != 2:
-                    return 0.0
-
-                hours = int(parts[0])
-                minutes = int(parts[1])
-
-                # Converter para minutos totais e depois para horas decimais
-                total_minutes = hours * 60 + minutes
-                return total_minutes / 60.0
-            except (ValueError, TypeError):
-                return 0.0
-
-        # Aplicar conversão
-        filtered_df['HorasDecimais'] = filtered_df['StayTime'].apply(convert_staytime_to_decimal_hours)
-
         # Processar dados para análise
         analysis_data = []
+        term = search_term.strip().lower() if search_term and search_term.strip() else None
 
-        # Processar veículos (agrupando APENAS por Vehicle, como no script)
-        vehicle_data = filtered_df[
-            filtered_df['Vehicle'].notna()
-            & (filtered_df['Vehicle'] != '')
-        ].copy()
+        # Veículos (agrupando APENAS por Vehicle) e empresas (APENAS por VehicleCompany),
+        # com o primeiro departamento encontrado, como no script
+        for column, item_type in (('Vehicle', 'Veículo'), ('VehicleCompany', 'Empresa')):
+            usage = rollup_with_first(usage_cube, column, 'VehicleDepartment')
+            usage = usage[usage[column] != '']
 
-        if not vehicle_data.empty:
-            # Agrupar apenas por Vehicle (sem VehicleDepartment)
-            vehicle_usage = vehicle_data.groupby('Vehicle').agg({
-                'HorasDecimais': 'sum',
-                'VehicleDepartment': 'first'  # Pegar o primeiro departamento encontrado
-            }).reset_index()
-
-            for _, row in vehicle_usage.iterrows():
-                vehicle_name = str(row['Vehicle'])
-                department = str(row['VehicleDepartment']) if pd.notna(row['VehicleDepartment']) else 'N/A'
-                hours = row['HorasDecimais']
+            for name, minutes, department in zip(usage[column], usage['minutes'], usage['VehicleDepartment']):
+                name = str(name)
 
                 # Aplicar filtro de busca se fornecido
-                if search_term and search_term.strip():
-                    if search_term.lower() not in vehicle_name.lower():
-                        continue
-
-                # Formatar horas no formato HH:MM (replicando a lógica SQL)
-                total_minutes = int(hours * 60)
-                hours_part = total_minutes // 60
-                minutes_part = total_minutes % 60
-                hours_formatted = f"{hours_part:02d}:{minutes_part:02d}"
+                if term and term not in name.lower():
+                    continue
 
                 analysis_data.append({
-                    'name': vehicle_name,
-                    'type': 'Veículo',
-                    'department': department,
-                    'hours_decimal': hours,
-                    'hours_formatted': hours_formatted
-                })
-
-        # Processar empresas (agrupando APENAS por VehicleCompany, como no script)
-        company_data = filtered_df[
-            filtered_df['VehicleCompany'].notna()
-            & (filtered_df['VehicleCompany'] != '')
-        ].copy()
-
-        if not company_data.empty:
-            # Agrupar apenas por VehicleCompany (sem VehicleDepartment)
-            company_usage = company_data.groupby('VehicleCompany').agg({
-                'HorasDecimais': 'sum',
-                'VehicleDepartment': 'first'  # Pegar o primeiro departamento encontrado
-            }).reset_index()
-
-            for _, row in company_usage.iterrows():
-                company_name = str(row['VehicleCompany'])
-                department = str(row['VehicleDepartment']) if pd.notna(row['VehicleDepartment']) else 'N/A'
-                hours = row['HorasDecimais']
-
-                # Aplicar filtro de busca se fornecido
-                if search_term and search_term.strip():
-                    if search_term.lower() not in company_name.lower():
-                        continue
-
-                # Formatar horas no formato HH:MM (replicando a lógica SQL)
-                total_minutes = int(hours * 60)
-                hours_part = total_minutes // 60
-                minutes_part = total_minutes % 60
-                hours_formatted = f"{hours_part:02d}:{minutes_part:02d}"
-
-                analysis_data.append({
-                    'name': company_name,
-                    'type': 'Empresa',
-                    'department': department,
-                    'hours_decimal': hours,
-                    'hours_formatted': hours_formatted
+                    'name': name,
+                    'type': item_type,
+                    'department': str(department) if pd.notna(department) else 'N/A',
+                    'hours_decimal': minutes / 60.0,
+                    'hours_formatted': format_minutes(minutes)
                 })
 
         # Se não houver dados após o filtro
@@ -3179,6 +2970,8 @@ def analyze_vehicle_usage(n_clicks, month_value, search_term):
             "success"
         )
 
+    except QueryCancelled:
+        raise PreventUpdate
     except Exception as e:
         trace(f"Erro na análise de veículos e empresas: {str(e)}", color="red")
         import traceback
@@ -3214,6 +3007,7 @@ def update_vehicle_analysis_pagination(active_page, store_data):
 
 if __name__ == '__main__':
     threading.Thread(target=init_weekly_processor, daemon=True).start()
+    threading.Thread(target=init_access_mirror, daemon=True).start()
 
     debug_mode = os.environ.get('DASH_DEBUG', 'False').lower() == 'true'
     host = os.environ.get('DASH_HOST', '0.0.0.0')  # 0.0.0.0 permite acesso externo
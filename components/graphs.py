@@ -9,6 +9,8 @@ from config.layout_config import layout_config
 import pandas as pd
 import traceback
 
+from utils.durations import parse_hhmm
+
 
 def create_utilization_graph(df, height=None):
     """Cria o gráfico de utilização mensal com design moderno e gradiente"""
@@ -968,11 +970,12 @@ def create_tracks_graph(tracks_dict, height=None, bottom_margin=None, max_items=
                     print(f"Aviso: track_info para '{ponto}' não tem as chaves necessárias. Chaves disponíveis: {list(track_info.keys())}")
                     continue
 
-                # Converter tempo no formato HH:MM para horas decimais
+                # Converter a duração (minutos, ou texto HH:MM) para horas decimais
                 track_time = track_info['track_time']
-                if track_time and ':' in track_time:
-                    hours, minutes = map(int, track_time.split(':'))
-                    total_hours = hours + (minutes / 60)
+                if 'track_minutes' in track_info:
+                    total_hours = track_info['track_minutes'] / 60
+                elif isinstance(track_time, str) and ':' in track_time:
+                    total_hours = parse_hhmm(track_time) / 60
                 else:
                     # Tentar converter diretamente para float
                     try:
@@ -1184,7 +1187,7 @@ def create_areas_graph(areas_df, height=None, bottom_margin=None):
         # Garantir que a coluna hours seja numérica
         try:
             print("Convertendo coluna 'hours' para numérico...")
-            areas_df['hours'] = pd.to_numeric(areas_df['hours'], errors='coerce').fillna(0)
+            areas_df = areas_df.assign(hours=pd.to_numeric(areas_df['hours'], errors='coerce').fillna(0))
             print(f"Conversão concluída. Valores NaN: {areas_df['hours'].isna().sum()}")
         except Exception as e:
             print(f"Erro ao converter horas para numérico: {e}")
@@ -0,0 +1,388 @@
+# data/access_mirror.py
+# Espelho local dos eventos de acesso (sp_VehicleAccessReport) com sincronização incremental
+
+import os
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from utils.tracer import trace, report_exception
+from data.local_db_handler import get_db_handler
+from data.db_connection import get_db_connection, VEHICLE_ACCESS_DTYPES
+from data.usage_cube import USAGE_CUBE_STATE, build_usage_cube, replace_cube_days
+
+
+ACCESS_MIRROR_ENABLED = os.environ.get('ACCESS_MIRROR_ENABLED', 'true').lower() == 'true'
+# Profundidade da carga inicial (dias)
+ACCESS_MIRROR_HISTORY_DAYS = int(os.environ.get('ACCESS_MIRROR_HISTORY_DAYS', '400'))
+# Janela re-consultada antes da marca d'água para capturar saídas tardias (horas)
+ACCESS_MIRROR_LOOKBACK_HOURS = float(os.environ.get('ACCESS_MIRROR_LOOKBACK_HOURS', '24'))
+# Intervalo entre sincronizações agendadas (segundos)
+ACCESS_MIRROR_SYNC_INTERVAL = float(os.environ.get('ACCESS_MIRROR_SYNC_INTERVAL', '300'))
+
+# Eventos ainda abertos (sem saída) mais antigos que isso não são mais re-consultados
+OPEN_EVENT_MAX_AGE_DAYS = 7
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+PROCEDURE_NAME = "sp_VehicleAccessReport"
+STATE_NAME = PROCEDURE_NAME
+ACCESS_MIRROR_JOB_NAME = 'access_mirror_sync'
+
+# Coluna da SP -> coluna local
+COLUMN_MAP = {
+    'LocalityName': 'locality_name',
+    'VehicleDepartment': 'vehicle_department',
+    'VehicleCompany': 'vehicle_company',
+    'Vehicle': 'vehicle',
+    'EJA': 'eja',
+    'StayTime': 'stay_time',
+    'VehicleEntranceTime': 'entry_time',
+    'VehicleExitTime': 'exit_time',
+}
+
+
+def _format_time(value):
+    return value.strftime(TIME_FORMAT)
+
+
+def _parse_time(value):
+    return datetime.strptime(value[:19], TIME_FORMAT) if value else None
+
+
+def resync_start(state):
+    """
+    Instante mais antigo que a próxima sincronização incremental pode regravar,
+    dado o estado atual do espelho (mesmo critério de _sync_since).
+    """
+    since = min(state['watermark'] or state['synced_until'], state['synced_until'])
+    return min(since - timedelta(hours=ACCESS_MIRROR_LOOKBACK_HOURS),
+               state['synced_until'] - timedelta(days=OPEN_EVENT_MAX_AGE_DAYS))
+
+
+class AccessEventMirror:
+    """
+    Mantém uma cópia local (SQLite) dos eventos da sp_VehicleAccessReport.
+
+    A sincronização guarda uma marca d'água sobre VehicleExitTime e, a cada
+    execução, consulta a SP apenas a partir da marca (menos uma janela de
+    segurança para saídas tardias), gravando via upsert.
+    """
+
+    def __init__(self):
+        self._sync_lock = threading.Lock()
+
+    # =================== Estado da sincronização ===================
+
+    def get_state(self, name=STATE_NAME):
+        """
+        Retorna o estado da sincronização ou None se nunca foi carregado.
+
+        Args:
+            name (str): STATE_NAME (espelho) ou USAGE_CUBE_STATE (cubo de utilização)
+        """
+        db_handler = get_db_handler()
+        try:
+            with closing(db_handler.conn.cursor()) as cursor:
+                cursor.execute("SELECT coverage_start, synced_until, watermark FROM access_sync_state WHERE name = ?",
+                               (name,))
+                row = cursor.fetchone()
+            if row is None:
+                return None
+            return {
+                'coverage_start': _parse_time(row[0]),
+                'synced_until': _parse_time(row[1]),
+                'watermark': _parse_time(row[2])
+            }
+        finally:
+            db_handler.close()
+
+    def _save_state(self, conn, coverage_start, synced_until, watermark, name=STATE_NAME):
+        conn.execute("""
+            INSERT INTO access_sync_state (name, coverage_start, synced_until, watermark, last_sync)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(name) DO UPDATE SET
+                coverage_start = excluded.coverage_start,
+                synced_until = excluded.synced_until,
+                watermark = excluded.watermark,
+                last_sync = CURRENT_TIMESTAMP
+        """, (
+            name,
+            _format_time(coverage_start),
+            _format_time(synced_until),
+            _format_time(watermark) if watermark else None
+        ))
+
+    def covers(self, start_date, end_date, state=None):
+        """
+        Indica se o período (YYYY-MM-DD) está inteiramente disponível no espelho.
+        Períodos que incluem o momento atual são aceitos se a última sincronização
+        tiver ocorrido dentro de dois intervalos de sincronização (margem para um
+        job agendado adiado ou em andamento).
+        """
+        state = state if state is not None else self.get_state()
+        if not state:
+            return False
+
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+        required_until = min(end_dt, datetime.now() - timedelta(seconds=2 * ACCESS_MIRROR_SYNC_INTERVAL))
+
+        return state['coverage_start'] <= start_dt and required_until <= state['synced_until']
+
+    # =================== Sincronização ===================
+
+    def _upsert_frame(self, conn, df):
+        """Grava o resultado da SP no espelho; retorna (linhas gravadas, maior saída)."""
+        frame = df[[c for c in COLUMN_MAP if c in df.columns]].rename(columns=COLUMN_MAP)
+        frame = frame[frame['entry_time'].notna()]
+        if frame.empty:
+            return 0, None
+
+        max_exit = frame['exit_time'].max() if 'exit_time' in frame.columns else None
+
+        for column in ('entry_time', 'exit_time'):
+            if column in frame.columns:
+                frame[column] = frame[column].dt.strftime(TIME_FORMAT)
+        for column in ('vehicle', 'locality_name'):
+            frame[column] = frame[column].astype(object).where(frame[column].notna(), '')
+
+        columns = list(frame.columns)
+        records = frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+        updates = ', '.join(f"{c} = excluded.{c}" for c in columns if c not in ('vehicle', 'locality_name', 'entry_time'))
+
+        conn.executemany(f"""
+            INSERT INTO access_events ({', '.join(columns)})
+            VALUES ({', '.join(['?'] * len(columns))})
+            ON CONFLICT(vehicle, locality_name, entry_time) DO UPDATE SET
+                {updates}, synced_at = CURRENT_TIMESTAMP
+        """, records)
+
+        return len(frame), (None if pd.isna(max_exit) else max_exit.to_pydatetime())
+
+    def _fetch_range(self, sql, start_dt, end_dt):
+        """Consulta a SP em [start_dt, end_dt] (em paralelo, por semana), fora de transações do SQLite."""
+        df = sql.execute_stored_procedure_range_df(PROCEDURE_NAME, start_dt, end_dt, split='week',
+                                                   dtypes=VEHICLE_ACCESS_DTYPES)
+        if df is None:
+            raise RuntimeError(f"Falha ao consultar {PROCEDURE_NAME} de {start_dt} a {end_dt}")
+        return df
+
+    def _store_range(self, conn, df):
+        """Grava o resultado da SP no espelho e recalcula o cubo de utilização dos dias afetados."""
+        written, max_exit = self._upsert_frame(conn, df)
+
+        entries = df['VehicleEntranceTime'].dropna() if 'VehicleEntranceTime' in df.columns else pd.Series(dtype=object)
+        if not entries.empty:
+            self._rebuild_cube(conn, entries.min(), entries.max())
+        return written, max_exit
+
+    def _rebuild_cube(self, conn, first_dt, last_dt):
+        """Recalcula o cubo de utilização dos dias em [first_dt, last_dt] a partir do espelho."""
+        first_day = first_dt.strftime('%Y-%m-%d')
+        last_day = last_dt.strftime('%Y-%m-%d')
+        events = _read_events(conn, first_day, last_day)
+        return replace_cube_days(conn, first_day, last_day, build_usage_cube(events))
+
+    def _build_cube(self, conn, coverage_start, synced_until):
+        """Monta o cubo de todo o período já espelhado (mês a mês), ex.: após atualização."""
+        range_start = coverage_start
+        while range_start < synced_until:
+            range_end = min(range_start + timedelta(days=31), synced_until)
+            self._rebuild_cube(conn, range_start, range_end)
+            range_start = range_end + timedelta(days=1)
+        self._save_state(conn, coverage_start, synced_until, None, name=USAGE_CUBE_STATE)
+        trace(f"Cubo de utilização montado desde {coverage_start.date()}", color="green")
+
+    def _sync_since(self, db_handler, state, now):
+        """Define o início da consulta incremental: marca d'água menos a janela de segurança."""
+        since = state['watermark'] or state['synced_until']
+        since = min(since, state['synced_until']) - timedelta(hours=ACCESS_MIRROR_LOOKBACK_HOURS)
+
+        # Re-consultar eventos ainda abertos (sem saída) recentes
+        with closing(db_handler.conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT MIN(entry_time) FROM access_events
+                WHERE exit_time IS NULL AND entry_time >= ?
+            """, (_format_time(now - timedelta(days=OPEN_EVENT_MAX_AGE_DAYS)),))
+            oldest_open = _parse_time(cursor.fetchone()[0])
+
+        if oldest_open and oldest_open < since:
+            since = oldest_open
+        return max(since, state['coverage_start'])
+
+    def sync(self):
+        """
+        Sincroniza o espelho com o SQL Server.
+
+        Na primeira execução carrega ACCESS_MIRROR_HISTORY_DAYS dias, mês a mês;
+        depois consulta apenas a partir da marca d'água.
+
+        Returns:
+            dict: Resultado com contadores ou {"error": ...}
+        """
+        with self._sync_lock:
+            db_handler = get_db_handler()
+            try:
+                sql = get_db_connection()
+                if not sql:
+                    return {"error": "Conexão com o banco de dados principal falhou"}
+
+                now = datetime.now().replace(microsecond=0)
+                state = self.get_state()
+
+                if state is not None and self.get_state(USAGE_CUBE_STATE) is None:
+                    with db_handler.transaction():
+                        self._build_cube(db_handler.conn, state['coverage_start'], state['synced_until'])
+
+                if state is None:
+                    coverage_start = (now - timedelta(days=ACCESS_MIRROR_HISTORY_DAYS)).replace(
+                        hour=0, minute=0, second=0)
+                    watermark = None
+                    ranges = []
+                    range_start = coverage_start
+                    while range_start < now:
+                        range_end = min(range_start + timedelta(days=31), now)
+                        ranges.append((range_start, range_end))
+                        range_start = range_end
+                    trace(f"Carga inicial do espelho de acessos desde {coverage_start.date()} ({len(ranges)} consultas)")
+                else:
+                    coverage_start = state['coverage_start']
+                    watermark = state['watermark']
+                    ranges = [(self._sync_since(db_handler, state, now), now)]
+
+                total = 0
+                for range_start, range_end in ranges:
+                    df = self._fetch_range(sql, range_start, range_end)
+
+                    # Checkpoint a cada intervalo consultado (espelho e cubo na mesma transação)
+                    with db_handler.transaction():
+                        written, max_exit = self._store_range(db_handler.conn, df)
+                        total += written
+                        if max_exit and (watermark is None or max_exit > watermark):
+                            watermark = max_exit
+                        self._save_state(db_handler.conn, coverage_start, range_end, watermark)
+                        self._save_state(db_handler.conn, coverage_start, range_end, None, name=USAGE_CUBE_STATE)
+
+                trace(f"Espelho de acessos sincronizado: {total} eventos gravados, marca d'água {watermark}", color="green")
+                return {"status": "success", "records_synced": total, "watermark": watermark}
+
+            except Exception as e:
+                report_exception(e)
+                trace(f"Erro ao sincronizar espelho de acessos: {str(e)}", color="red")
+                return {"error": str(e)}
+            finally:
+                db_handler.close()
+
+    # =================== Leitura ===================
+
+    def query_events(self, start_date, end_date):
+        """
+        Retorna os eventos do período (YYYY-MM-DD) no mesmo formato e tipos da SP.
+        """
+        db_handler = get_db_handler()
+        try:
+            return _read_events(db_handler.conn, start_date, end_date)
+        finally:
+            db_handler.close()
+
+
+def _read_events(conn, start_date, end_date):
+    """Lê os eventos do espelho no período (YYYY-MM-DD) com os tipos da SP."""
+    local_columns = ', '.join(f"{local} AS {sp}" for sp, local in COLUMN_MAP.items())
+    df = pd.read_sql_query(
+        f"""
+        SELECT {local_columns}
+        FROM access_events
+        WHERE entry_time BETWEEN ? AND ?
+        ORDER BY entry_time
+        """,
+        conn,
+        params=(f"{start_date} 00:00:00", f"{end_date} 23:59:59.999")
+    )
+
+    for column in ('Vehicle', 'LocalityName'):
+        df[column] = df[column].mask(df[column] == '')
+
+    for column, dtype in VEHICLE_ACCESS_DTYPES.items():
+        if column not in df.columns:
+            continue
+        if dtype.startswith('datetime64'):
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+        elif dtype == 'Int64':
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+        else:
+            df[column] = df[column].astype(dtype)
+
+    return df
+
+
+_access_mirror = None
+_access_mirror_lock = threading.Lock()
+
+
+def get_access_mirror():
+    """Retorna a instância única do espelho de acessos."""
+    global _access_mirror
+    if _access_mirror is None:
+        with _access_mirror_lock:
+            if _access_mirror is None:
+                _access_mirror = AccessEventMirror()
+    return _access_mirror
+
+
+def read_from_mirror(start_date, end_date):
+    """
+    Lê o período do espelho local (apenas leitura local: a sincronização roda
+    no job agendado por schedule_access_mirror_sync).
+
+    Returns:
+        DataFrame: Eventos do período, ou None se o espelho não cobre o período
+    """
+    if not ACCESS_MIRROR_ENABLED:
+        return None
+
+    try:
+        mirror = get_access_mirror()
+        if not mirror.covers(start_date, end_date):
+            return None
+
+        df = mirror.query_events(start_date, end_date)
+        trace(f"Período {start_date} até {end_date} lido do espelho local: {len(df)} eventos")
+        return df
+    except Exception as e:
+        report_exception(e)
+        trace(f"Erro ao ler espelho de acessos: {str(e)}", color="red")
+        return None
+
+
+def sync_access_mirror():
+    """Sincroniza o espelho de acessos (job agendado e scripts)."""
+    if not ACCESS_MIRROR_ENABLED:
+        return {"status": "disabled"}
+    return get_access_mirror().sync()
+
+
+def _scheduled_sync():
+    result = sync_access_mirror()
+    if "error" in result:
+        raise RuntimeError(result["error"])
+
+
+def schedule_access_mirror_sync():
+    """
+    Agenda a sincronização a cada ACCESS_MIRROR_SYNC_INTERVAL segundos, com a
+    primeira execução na inicialização (carga inicial, se o espelho estiver
+    vazio). Job exclusivo: com vários processos, apenas um sincroniza por vez.
+
+    Returns:
+        Job: O job agendado (None se desativado)
+    """
+    if not ACCESS_MIRROR_ENABLED:
+        return None
+
+    from data.scheduler import Job, schedule_job
+
+    return schedule_job(Job(ACCESS_MIRROR_JOB_NAME, _scheduled_sync, every=ACCESS_MIRROR_SYNC_INTERVAL,
+                            run_on_start=True))
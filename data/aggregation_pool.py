@@ -0,0 +1,128 @@
+# data/aggregation_pool.py
+# Pool de processos para agregações pesadas em pandas disparadas por callbacks
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.tracer import trace, report_exception
+from data.query_control import QueryCancelled
+from data.aggregation_worker import get_worker_context
+
+
+# Processos do pool de agregação; 0 (padrão) executa no próprio processo (thread do callback)
+AGGREGATION_WORKERS = int(os.environ.get('AGGREGATION_WORKERS', '0'))
+# Intervalo (segundos) entre verificações de cancelamento enquanto aguarda o resultado
+AGGREGATION_POLL_INTERVAL = 0.25
+
+
+class AggregationPool:
+    """
+    Executa funções de agregação em processos separados, fora do GIL do
+    servidor: uma análise pesada deixa de travar os callbacks dos demais
+    usuários.
+
+    Os processos são criados com 'spawn' (o servidor tem threads ativas, o
+    que torna o fork inseguro), sob demanda e sem reimportar app.py
+    (data/aggregation_worker.py). Apenas as colunas necessárias do
+    DataFrame são serializadas para o processo.
+    """
+
+    def __init__(self, max_workers=AGGREGATION_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_workers > 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=get_worker_context()
+                )
+                trace(f"Pool de agregação iniciado com {self.max_workers} processos")
+            return self._executor
+
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, func, frame, *args, columns=None, cancel_token=None, **kwargs):
+        """
+        Executa func(frame, *args, **kwargs) em um processo do pool.
+
+        Args:
+            func (callable): Função de módulo (serializável), sem efeitos colaterais
+            frame (DataFrame): Dados de entrada
+            columns (list, opcional): Colunas enviadas ao processo (padrão: todas)
+            cancel_token (CancelToken, opcional): Interrompe a espera se cancelado
+
+        Returns:
+            Resultado de func (deve ser serializável)
+
+        Raises:
+            QueryCancelled: Se o token for cancelado durante a espera
+        """
+        if columns is not None:
+            frame = frame[columns]
+
+        if not self.enabled:
+            return func(frame, *args, **kwargs)
+
+        if cancel_token is not None:
+            cancel_token.check()
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(func, frame, *args, **kwargs)
+        except (BrokenProcessPool, RuntimeError) as e:
+            report_exception(e)
+            self._discard_executor(executor)
+            return func(frame, *args, **kwargs)
+
+        try:
+            while True:
+                try:
+                    return future.result(timeout=AGGREGATION_POLL_INTERVAL)
+                except FutureTimeout:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        # O processo termina a tarefa em andamento; o resultado é descartado
+                        future.cancel()
+                        cancel_token.check()
+        except BrokenProcessPool as e:
+            report_exception(e)
+            trace("Pool de agregação interrompido; executando no próprio processo", color="yellow")
+            self._discard_executor(executor)
+            return func(frame, *args, **kwargs)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_aggregation_pool = None
+_aggregation_pool_lock = threading.Lock()
+
+
+def get_aggregation_pool():
+    """Retorna a instância única do pool de agregação."""
+    global _aggregation_pool
+    if _aggregation_pool is None:
+        with _aggregation_pool_lock:
+            if _aggregation_pool is None:
+                _aggregation_pool = AggregationPool()
+    return _aggregation_pool
+
+
+def run_aggregation(func, frame, *args, columns=None, cancel_token=None, **kwargs):
+    """Atalho para get_aggregation_pool().run(...)."""
+    return get_aggregation_pool().run(func, frame, *args, columns=columns, cancel_token=cancel_token, **kwargs)
@@ -0,0 +1,49 @@
+# data/aggregation_worker.py
+# Processos do pool de agregação: iniciados sem reexecutar o módulo principal (app.py)
+
+import threading
+from multiprocessing import spawn
+from multiprocessing.context import SpawnContext, SpawnProcess
+
+
+_spawn_lock = threading.Lock()
+
+
+def _worker_preparation_data(name):
+    """Dados de inicialização do filho sem o módulo principal do processo pai."""
+    data = _original_preparation_data(name)
+    data.pop('init_main_from_path', None)
+    data.pop('init_main_from_name', None)
+    return data
+
+
+_original_preparation_data = spawn.get_preparation_data
+
+
+class WorkerProcess(SpawnProcess):
+    """
+    Processo 'spawn' que não importa o módulo principal no filho.
+
+    Por padrão o filho reexecuta o script do pai (app.py: app Dash, callbacks,
+    diskcache) como __mp_main__. Aqui o filho importa apenas este módulo e o
+    da função executada, que precisa ser uma função de módulo.
+    """
+
+    @staticmethod
+    def _Popen(process_obj):
+        with _spawn_lock:
+            spawn.get_preparation_data = _worker_preparation_data
+            try:
+                return SpawnProcess._Popen(process_obj)
+            finally:
+                spawn.get_preparation_data = _original_preparation_data
+
+
+class WorkerContext(SpawnContext):
+    """Contexto 'spawn' cujos processos usam WorkerProcess."""
+    Process = WorkerProcess
+
+
+def get_worker_context():
+    """Contexto de multiprocessing para o pool de agregação."""
+    return WorkerContext()
@@ -0,0 +1,194 @@
+# data/backfill.py
+# Carga histórica de clients_usage: semanas buscadas em paralelo na SP e
+# gravadas por um único escritor no SQLite
+
+import os
+import time
+import queue
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.tracer import trace, report_exception
+from data.db_connection import get_db_connection
+from data.local_db_handler import get_db_handler
+from data.weekly_processor import calculate_week_range, store_week
+
+
+# Semanas consultadas simultaneamente na SP durante a carga histórica
+BACKFILL_WORKERS = int(os.environ.get('BACKFILL_WORKERS', '3'))
+
+# Limita as consultas de carga histórica em andamento no processo (protege o SQL Server,
+# inclusive com mais de uma carga ao mesmo tempo)
+_sql_server_slots = threading.BoundedSemaphore(max(BACKFILL_WORKERS, 1))
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def recent_weeks(num_weeks, reference=None):
+    """
+    Segundas-feiras das últimas `num_weeks` semanas completas, da mais recente para a mais antiga.
+
+    Args:
+        num_weeks (int): Número de semanas
+        reference (datetime, opcional): Data de referência (padrão: agora)
+
+    Returns:
+        list: Inícios de semana (datetime, 00:00)
+    """
+    current_week, _ = calculate_week_range(reference or datetime.now())
+    return [current_week - timedelta(weeks=offset) for offset in range(1, num_weeks + 1)]
+
+
+def missing_weeks(conn, weeks):
+    """
+    Semanas sem nenhum registro em clients_usage, com uma única consulta
+    (faixa em idx_clients_usage_start_day).
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco local
+        weeks (list): Inícios de semana (datetime)
+
+    Returns:
+        list: Inícios de semana ainda não carregados, na ordem recebida
+    """
+    if not weeks:
+        return []
+
+    days = {week: (week - _EPOCH).days for week in weeks}
+    rows = conn.execute(
+        "SELECT DISTINCT start_day FROM clients_usage WHERE start_day BETWEEN ? AND ?",
+        (min(days.values()), max(days.values()))
+    ).fetchall()
+    loaded = {row[0] for row in rows}
+    return [week for week in weeks if days[week] not in loaded]
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+
+class BackfillEngine:
+    """
+    Carrega semanas de clients_usage com consultas simultâneas à SP
+    (no máximo `workers`, limitadas também pelo semáforo do processo) e
+    um único escritor: a thread que chama run() grava cada semana assim
+    que chega, em sua própria transação.
+
+    A fila entre consultas e escritor é limitada: se a gravação atrasar,
+    as consultas aguardam, e a memória fica restrita a poucas semanas.
+    """
+
+    def __init__(self, sql_connection=None, workers=BACKFILL_WORKERS, progress=None):
+        """
+        Args:
+            sql_connection (DatabaseConnection, opcional): Conexão com o SQL Server (padrão: get_db_connection())
+            workers (int): Semanas consultadas simultaneamente
+            progress (callable, opcional): progress(concluídas, total, resultado da semana, eta em segundos)
+        """
+        self.sql_connection = sql_connection
+        self.workers = max(workers, 1)
+        self.progress = progress
+
+    def _fetch(self, week_start):
+        week_end = week_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
+        with _sql_server_slots:
+            return self.sql_connection.execute_stored_procedure_range_df(
+                "sp_VehicleAccessReport", week_start, week_end, split='week', max_workers=1
+            )
+
+    def _fetch_into(self, week_start, results):
+        try:
+            results.put((week_start, self._fetch(week_start), None))
+        except Exception as e:
+            results.put((week_start, None, e))
+
+    def run(self, weeks):
+        """
+        Busca e grava as semanas informadas.
+
+        Args:
+            weeks (list): Inícios de semana (datetime, segunda-feira 00:00)
+
+        Returns:
+            dict: Contadores (weeks, succeeded, failed, records_inserted, duplicates_ignored, elapsed)
+        """
+        summary = {"weeks": len(weeks), "succeeded": 0, "failed": 0,
+                   "records_inserted": 0, "duplicates_ignored": 0, "elapsed": 0.0}
+        if not weeks:
+            return summary
+
+        if self.sql_connection is None:
+            self.sql_connection = get_db_connection()
+        if not self.sql_connection:
+            trace("Falha na conexão com o banco de dados principal.", color="red")
+            summary["failed"] = len(weeks)
+            return summary
+
+        db_handler = get_db_handler()
+        results = queue.Queue(maxsize=self.workers * 2)
+        started = time.monotonic()
+
+        trace(f"Carga histórica: {len(weeks)} semanas, {self.workers} consultas simultâneas")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill') as executor:
+            for week_start in weeks:
+                executor.submit(self._fetch_into, week_start, results)
+
+            for done in range(1, len(weeks) + 1):
+                week_start, dashboard_df, error = results.get()
+                label = week_start.strftime('%Y-%m-%d')
+
+                result = None
+                if error is None and dashboard_df is None:
+                    error = "falha na consulta à stored procedure"
+                if error is None:
+                    try:
+                        result = store_week(db_handler, week_start, dashboard_df)
+                    except Exception as e:
+                        error = e
+
+                if error is None:
+                    summary["succeeded"] += 1
+                    summary["records_inserted"] += result.get("records_inserted", 0)
+                    summary["duplicates_ignored"] += result.get("duplicates_ignored", 0)
+                else:
+                    if isinstance(error, Exception):
+                        report_exception(error)
+                    summary["failed"] += 1
+
+                elapsed = time.monotonic() - started
+                eta = elapsed / done * (len(weeks) - done)
+                if error is None:
+                    trace(f"[{done}/{len(weeks)}] Semana de {label}: {result.get('records_inserted', 0)} inseridos "
+                          f"- decorrido {_format_duration(elapsed)}, restante ~{_format_duration(eta)}")
+                else:
+                    trace(f"[{done}/{len(weeks)}] Semana de {label}: erro ({error}) "
+                          f"- decorrido {_format_duration(elapsed)}, restante ~{_format_duration(eta)}", color="red")
+
+                if self.progress is not None:
+                    self.progress(done, len(weeks), result, eta)
+
+        summary["elapsed"] = time.monotonic() - started
+        trace(f"Carga histórica concluída em {_format_duration(summary['elapsed'])}: "
+              f"{summary['succeeded']} semanas gravadas, {summary['failed']} com erro, "
+              f"{summary['records_inserted']} registros inseridos", color="green")
+        return summary
+
+
+def backfill_weeks(num_weeks, workers=BACKFILL_WORKERS, progress=None):
+    """
+    Carrega as últimas `num_weeks` semanas completas que ainda não têm registros em clients_usage.
+
+    Returns:
+        dict: Contadores de BackfillEngine.run, mais `skipped` (semanas já carregadas)
+    """
+    weeks = recent_weeks(num_weeks)
+    pending = missing_weeks(get_db_handler().conn, weeks)
+    trace(f"Semanas já carregadas: {len(weeks) - len(pending)}; pendentes: {len(pending)}")
+
+    summary = BackfillEngine(workers=workers, progress=progress).run(pending)
+    summary["skipped"] = len(weeks) - len(pending)
+    return summary
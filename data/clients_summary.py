@@ -0,0 +1,80 @@
+# data/clients_summary.py
+# Resumo materializado de clients_usage por classificação (new_classification) e semana,
+# lido pela seção Clients Utilization em vez de agregar clients_usage a cada renderização
+
+from data.local_db_handler import LAST_12_MONTHS_START_DAY_SQL
+
+
+# Linhas de clients_usage agregadas por classificação do EJA e início da semana
+_SUMMARY_SELECT = """
+    SELECT
+        e.new_classification,
+        c.start_day,
+        CAST(strftime('%Y', c.start_day * 86400, 'unixepoch') AS INTEGER),
+        CAST(strftime('%m', c.start_day * 86400, 'unixepoch') AS INTEGER),
+        SUM(c.hours),
+        COUNT(*)
+    FROM clients_usage c
+    INNER JOIN eja e ON c.classification = e.eja_code
+    WHERE e.new_classification IS NOT NULL
+    AND e.new_classification != ''
+    {filter}
+    GROUP BY e.new_classification, c.start_day
+"""
+
+_SUMMARY_INSERT = """
+    INSERT INTO clients_usage_summary (classification, start_day, year, month, minutes, records)
+"""
+
+
+def refresh_clients_usage_summary(conn, start_dates=None):
+    """
+    Recalcula o resumo a partir de clients_usage.
+
+    Não faz commit: roda na transação de quem alterou clients_usage ou eja.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco local
+        start_dates (iterable, opcional): Inícios de semana ('YYYY-MM-DD') alterados;
+                                          None recalcula todo o resumo (ex.: EJAs alterados)
+    """
+    if start_dates is None:
+        conn.execute("DELETE FROM clients_usage_summary")
+        conn.execute(_SUMMARY_INSERT + _SUMMARY_SELECT.format(filter=''))
+        return
+
+    start_dates = sorted(set(start_dates))
+    if not start_dates:
+        return
+
+    days = ', '.join(["CAST(strftime('%s', ?) AS INTEGER) / 86400"] * len(start_dates))
+    conn.execute(f"DELETE FROM clients_usage_summary WHERE start_day IN ({days})", start_dates)
+    conn.execute(
+        _SUMMARY_INSERT + _SUMMARY_SELECT.format(filter=f"AND c.start_day IN ({days})"),
+        start_dates
+    )
+
+
+def get_classification_totals(conn, last_12_months=False):
+    """
+    Totais por classificação lidos do resumo.
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco local
+        last_12_months (bool): Apenas semanas iniciadas nos últimos 12 meses
+
+    Returns:
+        list: Tuplas (classificação, registros, minutos), da maior para a menor
+    """
+    where = f"WHERE start_day >= {LAST_12_MONTHS_START_DAY_SQL}" if last_12_months else ""
+    cursor = conn.execute(f"""
+        SELECT classification, SUM(records) as records, SUM(minutes) as minutes
+        FROM clients_usage_summary
+        {where}
+        GROUP BY classification
+        ORDER BY minutes DESC
+    """)
+    try:
+        return [tuple(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
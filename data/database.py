@@ -2,7 +2,14 @@
 # Funções para conexão com banco de dados SQL Server
 from data.simplified_processor import get_simplified_processor, get_clients_historical_processor
 from utils.tracer import *
-from data.db_connection import DatabaseReader
+from data.db_connection import DatabaseReader, VEHICLE_ACCESS_DTYPES
+from data.result_cache import get_result_cache, ttl_for_period, DASHBOARD_CACHE_NAMESPACE, USAGE_CUBE_CACHE_NAMESPACE
+from data.access_mirror import read_from_mirror
+from data.usage_cube import read_usage_cube, build_usage_cube, is_current_period, get_running_usage_cube
+from data.eja_catalog import get_eja_catalog
+from data.monthly_usage import get_period_totals
+from data.query_control import QueryCancelled
+from utils.durations import parse_hhmm, hours_from_hhmm
 import os
 import sys
 import numpy as np
@@ -15,199 +22,128 @@ from data.simplified_processor import get_simplified_processor, get_clients_hist
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 
-class ReportGenerator:
-    def __init__(self, dashboard_df=None, db_handler=None):
-        """
-        Inicializa o gerador de relatórios.
-
-        Args:
-            dashboard_df (DataFrame, opcional): DataFrame com os dados do dashboard
-            eja_df (DataFrame, opcional): DataFrame com os dados de EJA
-            dashboard_file (str, opcional): Caminho para o arquivo dashboard_ford.csv
-            eja_file (str, opcional): Caminho para o arquivo eja_simplificado.csv
-        """
-        # Armazenar referência para o DataFrame do dashboard
-        self.dashboard_df = dashboard_df
-
-        # Obter o gerenciador de banco local
-        if db_handler is None:
-            from data.local_db_handler import get_db_handler
-            self.db_handler = get_db_handler()
-        else:
-            self.db_handler = db_handler
-
-    def _preparar_dataframes(self):
-        """Prepara os DataFrames para processamento, convertendo tipos de dados."""
-        # Garantir tipos numéricos para as colunas de códigos
-        self.eja_df['EJA CODE'] = pd.to_numeric(self.eja_df['EJA CODE'], errors='coerce')
-        self.dashboard_df['EJA'] = pd.to_numeric(self.dashboard_df['EJA'], errors='coerce')
-
-    @staticmethod
-    def converter_tempo_para_horas(tempo_str):
-        """Converte uma string de tempo no formato HH:MM para horas decimais."""
-        try:
-            if pd.isna(tempo_str) or tempo_str == "":
-                return 0.0
+def get_db_connection():
+    """
+    Estabelece uma conexão com o banco de dados SQL Server.
+    """
+    try:
+        return DatabaseReader()
+    except Exception as e:
+        print(f"Erro ao conectar ao banco de dados: {e}")
+        return None
 
-            horas, minutos = map(int, tempo_str.split(':'))
-            return horas + (minutos / 60.0)
-        except Exception as e:
-            print(f"Erro ao converter tempo: {e}")
-            return 0.0
 
-    def format_datetime(self, total_horas):
-        # Converter para o formato HH:MM
-        horas_inteiras = int(total_horas)  # Parte inteira das horas
-        minutos = int((total_horas - horas_inteiras) * 60)  # Parte decimal convertida para minutos
+VEHICLE_ACCESS_PROCEDURE = "sp_VehicleAccessReport"
 
-        # Formatar como HH:MM
-        return f"{horas_inteiras:02d}:{minutos:02d}"
 
-    def gerar_relatorio_eja(self, classificacao, top_n=7):
-        if self.dashboard_df is None:
-            return {"error": "DataFrame do dashboard não inicializado"}
+def fetch_vehicle_access_report(start_date, end_date, cancel_token=None):
+    """
+    Retorna o DataFrame da sp_VehicleAccessReport para o período informado,
+    compartilhado entre todos os chamadores através do cache de resultados.
+    Períodos cobertos pelo espelho local são lidos do SQLite; os demais
+    consultam a SP diretamente.
 
-        dashboard_copy = self.dashboard_df.copy()
-        dashboard_copy['HorasDecimais'] = dashboard_copy['StayTime'].apply(self.converter_tempo_para_horas)
+    Args:
+        start_date (str): Data inicial no formato YYYY-MM-DD
+        end_date (str): Data final no formato YYYY-MM-DD
+        cancel_token (CancelToken, opcional): Cancelamento/tempo limite (callbacks)
 
-        # Converter para float para garantir a compatibilidade de tipos
-        total_horas_geral = float(dashboard_copy['HorasDecimais'].sum())
+    Returns:
+        DataFrame: Resultado da SP (somente leitura) ou None em caso de falha
 
-        # print(f"Tipo de dados da coluna EJA: {dashboard_copy['EJA'].dtype}")
-        # print("Primeiros 5 valores da coluna EJA:")
-        # print(dashboard_copy['EJA'].head(5))
-        # print("Exemplos de tipos de itens individuais na coluna EJA:")
-        # for i, item in enumerate(dashboard_copy['EJA'].head(5)):
-        #     print(f"  Item {i}: {item} (tipo: {type(item)})")
+    Raises:
+        QueryCancelled: Se a consulta for cancelada ou exceder o tempo limite
+    """
+    start_date_formatted = f"{start_date} 00:00:00.000"
+    end_date_formatted = f"{end_date} 23:59:59.999"
 
-        # Consultar os EJAs do banco SQLite pela classificação
-        try:
-            # Obter os EJA codes para a classificação especificada
-            self.db_handler.cursor.execute(
-                "SELECT id, eja_code, title FROM eja WHERE new_classification = ?",
-                (classificacao,)
-            )
-            eja_records = self.db_handler.cursor.fetchall()
-
-            if not eja_records:
-                return {"error": f"Nenhum registro encontrado com a classificação '{classificacao}'"}
-
-            # Criar um dicionário para mapear código EJA para título
-            eja_titles = {str(row['eja_code']): row['title'] for row in eja_records}
-
-            # Lista de EJA codes que pertencem à classificação desejada
-            eja_codes_da_classificacao = list(eja_titles.keys())
-
-            print(dashboard_copy['EJA'])
-            # Filtrar registros do dashboard que têm EJA correspondente na classificação
-            # dashboard_filtrado = dashboard_copy[dashboard_copy['EJA'].isin(eja_codes_da_classificacao)].copy()
-            dashboard_copy['EJA_str'] = dashboard_copy['EJA'].astype(str)
-            dashboard_filtrado = dashboard_copy[dashboard_copy['EJA_str'].isin(eja_codes_da_classificacao)].copy()
-            if len(dashboard_filtrado) == 0:
-                # Verificar se há EJAs dessa classificação no dashboard mas não cadastrados
-                all_ejas_in_dashboard = set(dashboard_copy['EJA_str'].unique())
-                registered_ejas = set(eja_codes_da_classificacao)
-
-                # EJAs não cadastrados que poderiam pertencer a esta classificação
-                unregistered_ejas = all_ejas_in_dashboard - registered_ejas
-
-                error_msg = f"Nenhum registro no dashboard corresponde à classificação '{classificacao}'"
-                if unregistered_ejas:
-                    error_msg += f". EJAs não cadastrados encontrados: {', '.join(sorted(unregistered_ejas))}"
-
-                return {"error": error_msg}
-
-            # Agrupar por EJA e somar as horas
-            # horas_por_eja = dashboard_filtrado.groupby('EJA')['HorasDecimais'].sum().reset_index()
-            horas_por_eja = dashboard_filtrado.groupby('EJA_str')['HorasDecimais'].sum().reset_index()
-            horas_por_eja = horas_por_eja.rename(columns={'EJA_str': 'EJA'})
-
-            # Ordenar por horas (decrescente)
-            horas_por_eja = horas_por_eja.sort_values('HorasDecimais', ascending=False)
-
-            # Calcular o total de horas
-            total_horas = self.format_datetime(horas_por_eja['HorasDecimais'].sum())
-            _total_horas = float(horas_por_eja['HorasDecimais'].sum())
-
-            # Pegar os top_n itens com mais horas
-            top_itens = horas_por_eja.head(top_n)
-
-            # Calcular a porcentagem em relação ao total
-            porcentagem = (_total_horas / total_horas_geral) * 100 if total_horas_geral > 0 else 0
-
-            # Criar lista de resultados com título do EJA
-            resultado_top = []
-            for _, row in top_itens.iterrows():
-                eja_code = row['EJA']
-                # Obter o título do dicionário criado anteriormente
-                titulo = eja_titles.get(eja_code, "Título não encontrado")
-
-                resultado_top.append({
-                    "EJA_CODE": int(eja_code) if pd.notna(eja_code) else None,
-                    "TITLE": titulo,
-                    "HORAS": self.format_datetime(row['HorasDecimais']),
-                    "HORAS_DECIMAL": row['HorasDecimais']
-                })
+    def _load():
+        df = read_from_mirror(start_date, end_date)
+        if df is not None:
+            return df
 
-            # Montar o resultado final
-            resultado = {
-                "classificacao": classificacao,
-                "total_horas": total_horas,
-                "total_horas_decimal": _total_horas,
-                "porcentagem": f"{porcentagem:.1f}%",
-                "porcentagem_decimal": porcentagem,
-                "top_itens": resultado_top
-            }
+        sql = get_db_connection()
+        if not sql:
+            return None
+        trace(f"Consultando {VEHICLE_ACCESS_PROCEDURE} para o período: {start_date} até {end_date}")
+        return sql.execute_stored_procedure_range_df(VEHICLE_ACCESS_PROCEDURE, start_date, end_date,
+                                                     split='week', dtypes=VEHICLE_ACCESS_DTYPES,
+                                                     cancel_token=cancel_token)
 
-            return resultado
+    key = (VEHICLE_ACCESS_PROCEDURE, start_date_formatted, end_date_formatted)
+    return get_result_cache().get_or_load(key, _load, ttl=ttl_for_period(end_date), cancel_token=cancel_token)
 
-        except Exception as e:
-            print(f"Erro ao gerar relatório EJA: {str(e)}")
-            return {"error": f"Erro ao processar dados: {str(e)}"}
 
-    def gerar_relatorio_tracks(self, top_n=6):
-        try:
-            dashboard_copy = self.dashboard_df.copy()
+def fetch_usage_cube(start_date, end_date, cancel_token=None):
+    """
+    Retorna o cubo de utilização do período (data/usage_cube.py), base de
+    todas as visões do dashboard e das análises de EJA e de veículos.
+    Períodos cobertos pelo espelho local são lidos do cubo no SQLite; nos
+    demais o cubo é montado a partir do resultado da SP. Para o período
+    corrente, a SP é consultada apenas a partir da última atualização.
 
-            # Verificar se há dados disponíveis
-            if dashboard_copy is None or dashboard_copy.empty or 'StayTime' not in dashboard_copy.columns:
-                return {}  # Retornar dicionário vazio se não houver dados
+    Args:
+        start_date (str): Data inicial no formato YYYY-MM-DD
+        end_date (str): Data final no formato YYYY-MM-DD
+        cancel_token (CancelToken, opcional): Cancelamento/tempo limite (callbacks)
 
-            dashboard_copy['HorasDecimais'] = dashboard_copy['StayTime'].apply(self.converter_tempo_para_horas)
+    Returns:
+        DataFrame: Cubo de utilização (somente leitura) ou None em caso de falha
 
-            # Verificar se há horas registradas
-            if dashboard_copy['HorasDecimais'].sum() == 0:
-                return {}  # Retornar dicionário vazio se o total de horas for zero
+    Raises:
+        QueryCancelled: Se a consulta for cancelada ou exceder o tempo limite
+    """
+    def _fetch_events(since, until):
+        sql = get_db_connection()
+        if not sql:
+            return None
+        trace(f"Consultando {VEHICLE_ACCESS_PROCEDURE} para o período: {since} até {until}")
+        return sql.execute_stored_procedure_range_df(VEHICLE_ACCESS_PROCEDURE, since, until,
+                                                     split='week', dtypes=VEHICLE_ACCESS_DTYPES,
+                                                     cancel_token=cancel_token)
 
-            # Agrupar por LocalityName e somar as horas
-            tracks_horas = dashboard_copy.groupby('LocalityName')['HorasDecimais'].sum().to_dict()
+    def _load():
+        usage_cube = read_usage_cube(start_date, end_date)
+        if usage_cube is not None:
+            return usage_cube
 
-            # Verificar se há registros válidos
-            if not tracks_horas:
-                return {}
+        if is_current_period(start_date, end_date):
+            return get_running_usage_cube(start_date, end_date).refresh(_fetch_events)
 
-            tracks_horas_ordenado = dict(sorted(tracks_horas.items(), key=lambda item: item[1], reverse=True))
+        events = fetch_vehicle_access_report(start_date, end_date, cancel_token=cancel_token)
+        if events is None:
+            return None
+        return build_usage_cube(events)
 
-            for key, item in tracks_horas_ordenado.items():
-                formated_dte = self.format_datetime(item)
-                tracks_horas_ordenado[key] = formated_dte
+    key = (USAGE_CUBE_CACHE_NAMESPACE, start_date, end_date)
+    return get_result_cache().get_or_load(key, _load, ttl=ttl_for_period(end_date), cancel_token=cancel_token)
 
-            return tracks_horas_ordenado
 
-        except Exception:
-            print('Error converting tracks')
-            return {}  # Retornar dicionário vazio em caso de erro
+def add_period_totals(periodo_info, start_date, period_minutes=None):
+    """
+    Completa periodo_info com YTD, 12 meses e percentuais anuais
+    (data/monthly_usage.py: soma dos meses fechados gravados + o período).
 
+    Args:
+        periodo_info (dict): Informações do período (alterado no lugar)
+        start_date (str): Início do período ('YYYY-MM-DD...')
+        period_minutes (int, opcional): Minutos do período; padrão periodo_info['total_minutes']
 
-def get_db_connection():
-    """
-    Estabelece uma conexão com o banco de dados SQL Server.
+    Returns:
+        dict: periodo_info
     """
+    if period_minutes is None:
+        period_minutes = periodo_info.get('total_minutes', 0)
     try:
-        return DatabaseReader()
+        periodo_info.update(get_period_totals(start_date, period_minutes))
     except Exception as e:
-        print(f"Erro ao conectar ao banco de dados: {e}")
-        return None
+        report_exception(e)
+        trace(f"Erro ao calcular totais YTD: {str(e)}", color="red")
+        periodo_info.setdefault('total_hours_ytd', periodo_info.get('total_hours', '0:00'))
+        periodo_info.setdefault('ytd_utilization_percentage', '0%')
+        periodo_info.setdefault('ytd_availability_percentage', '0%')
+        periodo_info.setdefault('ytd_partial', True)
+    return periodo_info
 
 
 def load_real_data(start_date=None, end_date=None):
@@ -268,8 +204,10 @@ def load_real_data(start_date=None, end_date=None):
         # clients_utilization = process_clients_data(start_date, end_date)
 
         # Calcular horas totais
-        dashboard_df['HorasDecimais'] = dashboard_df['StayTime'].apply(report_gen.converter_tempo_para_horas)
+        dashboard_df['HorasDecimais'] = hours_from_hhmm(dashboard_df['StayTime'])
         total_horas = report_gen.format_datetime(dashboard_df['HorasDecimais'].sum())
+        periodo_totais = add_period_totals({'total_hours': total_horas},
+                                           start_date, int(round(dashboard_df['HorasDecimais'].sum() * 60)))
 
         # Extrair mês e ano das datas para exibição
         try:
@@ -285,9 +223,10 @@ def load_real_data(start_date=None, end_date=None):
             'current_month': display_month,
             'current_day': display_day,
             'total_hours': total_horas,
-            'total_hours_ytd': total_horas,  # Por enquanto, igual ao total do mês
-            'ytd_utilization_percentage': '82.5%',  # Placeholder
-            'ytd_availability_percentage': '88.2%',  # Placeholder
+            'total_hours_ytd': periodo_totais['total_hours_ytd'],
+            'total_hours_12m': periodo_totais.get('total_hours_12m'),
+            'ytd_utilization_percentage': periodo_totais['ytd_utilization_percentage'],
+            'ytd_availability_percentage': periodo_totais['ytd_availability_percentage'],
             'selected_date': start_date.split()[0] if isinstance(start_date, str) else None
         }
 
@@ -401,91 +340,80 @@ def process_real_data_for_dashboard(dashboard_df, report_gen, programs_data, oth
     return processed_data
 
 
-def load_dashboard_data(start_date=None, end_date=None):
+def load_dashboard_data(start_date=None, end_date=None, cancel_token=None):
     """
-    Versão corrigida que garante que os dados de clientes sejam carregados
+    Retorna os agregados do dashboard para o período, compartilhados pelo
+    cache de resultados (aquecido na inicialização por data/prefetch.py).
+
+    Returns:
+        tuple: (dfs, tracks_data, areas_data_df, periodo_info)
     """
-    try:
-        sql = get_db_connection()
+    # A versão do catálogo de EJAs na chave evita que um agregado montado
+    # durante uma edição de EJA seja armazenado e servido depois dela
+    key = (DASHBOARD_CACHE_NAMESPACE, start_date, end_date, get_eja_catalog().version)
+    result = get_result_cache().get_or_load(
+        key,
+        lambda: _build_dashboard_data(start_date, end_date, cancel_token),
+        ttl=ttl_for_period(end_date),
+        cancel_token=cancel_token
+    )
+
+    if result is None:
+        return create_empty_data_structure()
 
-        if not sql:
-            trace("Erro ao conectar ao banco de dados", color="red")
-            return create_empty_data_structure()
+    # Cópias rasas dos dicionários: os callbacks adicionam chaves a eles
+    dfs, tracks_data, areas_data_df, periodo_info = result
+    return dict(dfs), tracks_data, areas_data_df, dict(periodo_info)
 
-        # Formatar datas para a stored procedure
-        start_date_formatted = f"{start_date} 00:00:00.000"
-        end_date_formatted = f"{end_date} 23:59:59.999"
 
-        # Obter dados da SP
-        dashboard_df = sql.execute_stored_procedure_df("sp_VehicleAccessReport",
-                                                       [start_date_formatted, end_date_formatted])
+def _build_dashboard_data(start_date, end_date, cancel_token=None):
+    """
+    Versão corrigida que garante que os dados de clientes sejam carregados.
+    Retorna None se não houver dados (o resultado não é armazenado em cache).
+    """
+    try:
+        # Obter o cubo de utilização do período (compartilhado via cache de resultados)
+        usage_cube = fetch_usage_cube(start_date, end_date, cancel_token=cancel_token)
 
-        if dashboard_df is None or dashboard_df.empty:
+        if usage_cube is None or usage_cube.empty:
             trace("Nenhum dado retornado pela SP", color="yellow")
-            return create_empty_data_structure()
+            return None
 
         # Usar o processador simplificado
         from data.simplified_processor import get_simplified_processor
-        processor = get_simplified_processor(dashboard_df)
+        processor = get_simplified_processor(usage_cube=usage_cube)
         dfs, tracks_data, areas_data_df, periodo_info = processor.get_all_dashboard_data()
 
         print("=== DEBUG: Iniciando carregamento de dados historicos ===")
         try:
+            # Totais por classificação do resumo materializado de clients_usage
             from data.local_db_handler import get_db_handler
-            print("Handler do banco local obtido com sucesso")
-            
+            from data.clients_summary import get_classification_totals
+
             db_handler = get_db_handler()
-            
-            query = """
-                SELECT 
-                    e.new_classification as classification,
-                    SUM(c.hours) as total_minutes
-                FROM clients_usage c
-                INNER JOIN eja e ON c.classification = e.eja_code
-                WHERE e.new_classification IS NOT NULL 
-                AND e.new_classification != ''
-                GROUP BY e.new_classification
-                ORDER BY total_minutes DESC
-            """
-            
-            print("Executando query no banco local...")
-            cursor = db_handler.conn.cursor()
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            
-            print(f"Query executada. Retornou {len(rows)} linhas")
-            
-            if rows:
-                clients_data = []
-                for row in rows:
-                    classification = row[0]
-                    total_minutes = row[1]
-                    hours = total_minutes / 60.0
-                    
-                    print(f"  Processando: {classification} = {hours:.1f} horas")
-                    
-                    clients_data.append({
-                        'classification': classification,
-                        'hours': hours
-                    })
-                
-                import pandas as pd
-                dfs['customers_ytd'] = pd.DataFrame(clients_data)
-                print(f"DataFrame customers_ytd criado com {len(dfs['customers_ytd'])} registros")
-                print("Dados historicos carregados com sucesso")
-            else:
-                print("AVISO: Nenhuma linha retornada pela query")
-                dfs['customers_ytd'] = pd.DataFrame(columns=['classification', 'hours'])
+            try:
+                rows = get_classification_totals(db_handler.conn)
+            finally:
+                db_handler.close()
+
+            print(f"Resumo por classificação: {len(rows)} linhas")
+            dfs['customers_ytd'] = pd.DataFrame(
+                [{'classification': classification, 'hours': minutes / 60.0}
+                 for classification, _, minutes in rows],
+                columns=['classification', 'hours']
+            )
 
         except Exception as e:
             print(f"ERRO ao carregar dados historicos: {str(e)}")
             import traceback
             print(f"Traceback: {traceback.format_exc()}")
-            import pandas as pd
             dfs['customers_ytd'] = pd.DataFrame(columns=['classification', 'hours'])
 
         print("=== DEBUG: Fim do carregamento de dados historicos ===")
 
+        # YTD e 12 meses a partir dos totais mensais gravados
+        add_period_totals(periodo_info, start_date)
+
         # Adicionar informações do período
         try:
             from datetime import datetime
@@ -502,9 +430,11 @@ def load_dashboard_data(start_date=None, end_date=None):
 
         return dfs, tracks_data, areas_data_df, periodo_info
 
+    except QueryCancelled:
+        raise
     except Exception as e:
         trace(f"Erro no carregamento: {e}", color="red")
-        return create_empty_data_structure()
+        return None
 
 
 def create_empty_data_structure():
@@ -553,20 +483,13 @@ def process_areas_data(raw_data):
         # Verifique o tipo/formato de StayTime
         if pd.api.types.is_string_dtype(raw_data['StayTime']):
             # Se for string no formato HH:MM, converter para horas decimais
-            def convert_time(time_str):
-                try:
-                    hours, minutes = map(int, time_str.split(':'))
-                    return hours + (minutes / 60.0)
-                except (ValueError, AttributeError):
-                    return 0
-
-            raw_data['hours'] = raw_data['StayTime'].apply(convert_time)
+            raw_data['hours'] = hours_from_hhmm(raw_data['StayTime'])
         else:
             # Assumindo que está em minutos
             raw_data['hours'] = raw_data['StayTime'] / 60.0
 
     # Agrupar por VehicleDepartment e somar as horas (mantendo a precisão)
-    areas_df = raw_data.groupby('VehicleDepartment')['hours'].sum().reset_index()
+    areas_df = raw_data.groupby('VehicleDepartment', observed=True)['hours'].sum().reset_index()
 
     # Armazenar os valores decimais exatos para os cálculos
     areas_df['hours_exact'] = areas_df['hours']
@@ -618,33 +541,24 @@ def load_dashboard_data_simplified(start_date=None, end_date=None):
     Remove camadas desnecessárias de processamento
     """
     try:
-        # Obter conexão com o banco
-        sql = get_db_connection()
-
-        if not sql:
-            trace("Erro ao conectar ao banco de dados. Usando dados vazios.", color="red")
-            return create_empty_data_structure()
-
-        # Formatar datas para a stored procedure
-        start_date_formatted = f"{start_date} 00:00:00.000"
-        end_date_formatted = f"{end_date} 23:59:59.999"
-
         trace(f"Consultando SP para período: {start_date} até {end_date}")
 
-        # Obter dados da SP
-        dashboard_df = sql.execute_stored_procedure_df("sp_VehicleAccessReport",
-                                                       [start_date_formatted, end_date_formatted])
+        # Obter o cubo de utilização do período (compartilhado via cache de resultados)
+        usage_cube = fetch_usage_cube(start_date, end_date)
 
-        if dashboard_df is None or dashboard_df.empty:
+        if usage_cube is None or usage_cube.empty:
             trace("Nenhum dado retornado pela SP", color="yellow")
             return create_empty_data_structure()
 
-        trace(f"SP retornou {len(dashboard_df)} registros")
+        trace(f"Cubo de utilização com {len(usage_cube)} linhas")
 
         # Usar o processador simplificado
-        processor = get_simplified_processor(dashboard_df)
+        processor = get_simplified_processor(usage_cube=usage_cube)
         dfs, tracks_data, areas_data_df, periodo_info = processor.get_all_dashboard_data()
 
+        # YTD e 12 meses a partir dos totais mensais gravados
+        add_period_totals(periodo_info, start_date)
+
         # Adicionar informações do período
         try:
             display_date = datetime.strptime(start_date, '%Y-%m-%d')
@@ -724,19 +638,7 @@ class ReportGenerator:
     @staticmethod
     def converter_tempo_para_horas(tempo_str):
         """Mantido para compatibilidade com código existente"""
-        if pd.isna(tempo_str) or not tempo_str or ':' not in str(tempo_str):
-            return 0.0
-
-        try:
-            parts = str(tempo_str).split(':')
-            if len(parts) != 2:
-                return 0.0
-
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            return hours + (minutes / 60.0)
-        except (ValueError, TypeError):
-            return 0.0
+        return parse_hhmm(tempo_str) / 60.0
 
     def format_datetime(self, total_horas):
         """Mantido para compatibilidade"""
@@ -819,15 +721,11 @@ class ReportGenerator:
         try:
             tracks_data = self.processor.get_tracks_data()
 
-            # Ordenar por tempo (convertendo de volta para comparação)
+            # Ordenar por tempo (minutos)
             sorted_tracks = {}
             for track, info in tracks_data.items():
-                time_str = info['track_time']
-                # Converter para minutos para ordenação
-                if ':' in time_str:
-                    hours, minutes = map(int, time_str.split(':'))
-                    total_minutes = hours * 60 + minutes
-                    sorted_tracks[track] = (total_minutes, info)
+                total_minutes = info.get('track_minutes', parse_hhmm(info['track_time']))
+                sorted_tracks[track] = (total_minutes, info)
 
             # Ordenar e pegar top N
             sorted_items = sorted(sorted_tracks.items(), key=lambda x: x[1][0], reverse=True)[:top_n]
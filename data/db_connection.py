@@ -3,19 +3,54 @@
 # Desenvolvido por: Raphael Pires
 # Última Revisão: 09/08/2023
 
+import math
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import pyodbc
 import configparser
 import sys
 import os
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+from contextlib import contextmanager, nullcontext
 from utils.helpers import is_running_in_docker
+from utils.tracer import trace, report_exception
+from data.query_control import QueryCancelled
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
 
+# Configuração do pool de conexões (ver .env)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+DB_POOL_IDLE_TIMEOUT = float(os.environ.get('DB_POOL_IDLE_TIMEOUT', '300'))
+DB_POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', '3600'))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '30'))
+
+# Linhas por lote no fetchmany (cursor.arraysize)
+DB_FETCH_ARRAYSIZE = int(os.environ.get('DB_FETCH_ARRAYSIZE', '5000'))
+
+# Consultas divididas por período: workers simultâneos e tentativas por sub-período
+DB_RANGE_WORKERS = int(os.environ.get('DB_RANGE_WORKERS', '4'))
+DB_RANGE_RETRIES = int(os.environ.get('DB_RANGE_RETRIES', '2'))
+
+# Tipos finais das colunas da sp_VehicleAccessReport
+VEHICLE_ACCESS_DTYPES = {
+    'LocalityName': 'category',
+    'VehicleDepartment': 'category',
+    'VehicleCompany': 'category',
+    'Vehicle': 'category',
+    'EJA': 'Int64',
+    'VehicleEntranceTime': 'datetime64[ns]',
+    'VehicleExitTime': 'datetime64[ns]',
+}
+
+
 def get_appropriate_driver():
     if is_running_in_docker():
         return "FreeTDS"  # Ou "ODBC Driver 17 for SQL Server" se instalado no container
@@ -23,6 +58,169 @@ def get_appropriate_driver():
         return "{SQL Server}"  # Driver padrão no Windows
 
 
+class PoolTimeoutError(Exception):
+    """Nenhuma conexão ficou disponível no pool dentro do tempo limite."""
+
+
+class _PooledConnection:
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    Pool limitado e thread-safe de conexões pyodbc.
+
+    - No máximo `max_size` conexões em uso ao mesmo tempo (checkout bloqueia até `timeout`)
+    - Conexões ociosas há mais de `idle_timeout` segundos são fechadas
+    - Conexões com mais de `max_lifetime` segundos são recicladas
+    - Conexões ociosas há mais de `ping_after` segundos são validadas (SELECT 1) no checkout
+    """
+
+    def __init__(self, connect, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 idle_timeout=DB_POOL_IDLE_TIMEOUT, max_lifetime=DB_POOL_MAX_LIFETIME,
+                 ping_after=DB_POOL_PING_AFTER):
+        self._connect = connect
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    @staticmethod
+    def _close_raw(pooled):
+        try:
+            pooled.raw.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, pooled, now):
+        return (self.max_lifetime and now - pooled.created_at > self.max_lifetime) or \
+               (self.idle_timeout and now - pooled.last_used > self.idle_timeout)
+
+    def _is_healthy(self, pooled):
+        try:
+            cursor = pooled.raw.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            trace(f"Conexão do pool descartada no health check: {str(e)}", color="yellow")
+            return False
+
+    def evict_idle(self):
+        """Fecha conexões ociosas expiradas."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [p for p in self._idle if self._is_expired(p, now)]
+            self._idle = [p for p in self._idle if not self._is_expired(p, now)]
+        for pooled in expired:
+            self._close_raw(pooled)
+
+    def _wait_slot(self, cancel_token):
+        if cancel_token is None:
+            return self._slots.acquire(timeout=self.timeout)
+
+        # Aguardar em fatias curtas para respeitar o cancelamento
+        deadline = time.monotonic() + self.timeout
+        while True:
+            cancel_token.check()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self._slots.acquire(timeout=min(0.1, remaining)):
+                return True
+
+    def acquire(self, cancel_token=None):
+        """Obtém uma conexão do pool (ou cria uma nova dentro do limite)."""
+        if not self._wait_slot(cancel_token):
+            raise PoolTimeoutError(f"Nenhuma conexão disponível após {self.timeout}s (pool de {self.max_size})")
+
+        try:
+            self.evict_idle()
+            while True:
+                with self._lock:
+                    pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    return _PooledConnection(self._connect())
+                if time.monotonic() - pooled.last_used < self.ping_after or self._is_healthy(pooled):
+                    return pooled
+                self._close_raw(pooled)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, pooled, discard=False):
+        """Devolve a conexão ao pool; conexões descartadas ou expiradas são fechadas."""
+        try:
+            now = time.monotonic()
+            if not discard:
+                try:
+                    pooled.raw.rollback()
+                except Exception:
+                    discard = True
+            if discard or (self.max_lifetime and now - pooled.created_at > self.max_lifetime):
+                self._close_raw(pooled)
+            else:
+                pooled.last_used = now
+                with self._lock:
+                    self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, cancel_token=None):
+        """
+        Context manager que empresta uma conexão e a devolve ao final.
+        Conexões com erro ou consulta cancelada são descartadas.
+        """
+        pooled = self.acquire(cancel_token)
+        discard = False
+        try:
+            yield pooled.raw
+        except (pyodbc.Error, QueryCancelled):
+            discard = True
+            raise
+        finally:
+            self.release(pooled, discard=discard)
+
+    def close_all(self):
+        """Fecha todas as conexões ociosas."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._close_raw(pooled)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(key, connect):
+    """Retorna o pool do processo para a configuração `key`, criando-o na primeira chamada."""
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(connect)
+                _pools[key] = pool
+                trace(f"Pool de conexões criado: Servidor={key[1]}, DB={key[2]}, Driver={key[0]}, "
+                      f"Tamanho={pool.max_size}")
+    return pool
+
+
 class DatabaseReader:
     def __init__(self):
         # Usar valores fixos para usuário e senha, ou obter do arquivo de configuração
@@ -36,10 +234,11 @@ class DatabaseReader:
         # Obter o driver ODBC especificado nas variáveis de ambiente ou usar o padrão
         # self.driver = get_appropriate_driver()
 
-        self.lock = threading.Lock()
-
-        # Validar a configuração
-        print(f"Configuração do banco carregada: Servidor={self.server}, DB={self.database}, Driver={self.driver}")
+        # Pool compartilhado por todas as instâncias com a mesma configuração
+        self.pool = get_connection_pool(
+            (self.driver, self.server, self.database, self.username, self.port),
+            self._create_connection
+        )
 
     def _create_connection(self):
         try:
@@ -82,52 +281,59 @@ class DatabaseReader:
             raise Exception(error_msg)
 
     def _execute_query(self, query):
-        connection = self._create_connection()
-        cursor = connection.cursor()
-
         try:
-            cursor.execute(query)
-            connection.commit()
-            return True
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute(query)
+                    connection.commit()
+                    return True
+                except Exception as e:
+                    print(f"Error executing query: {str(e)}")
+                    connection.rollback()
+                    return False
+                finally:
+                    cursor.close()
         except Exception as e:
-            print(f"Error executing query: {str(e)}")
-            connection.rollback()
+            report_exception(e)
+            trace(f"Erro ao executar consulta (pool de conexões): {str(e)}", color="red")
             return False
-        finally:
-            cursor.close()
-            connection.close()
 
     def read_data(self, query):
-        with self.lock:
-            connection = self._create_connection()
-            cursor = connection.cursor()
-
-            try:
-                cursor.execute(query)
-                result = cursor.fetchall()
-            except Exception as e:
-                result = None
-                print(f"Error executing query: {str(e)}")
-            finally:
-                cursor.close()
-                connection.close()
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute(query)
+                    result = cursor.fetchall()
+                except Exception as e:
+                    result = None
+                    print(f"Error executing query: {str(e)}")
+                finally:
+                    cursor.close()
+        except Exception as e:
+            result = None
+            report_exception(e)
+            trace(f"Erro ao executar consulta (pool de conexões): {str(e)}", color="red")
 
         return result
 
     def read_single_row(self, query):
-        with self.lock:
-            connection = self._create_connection()
-            cursor = connection.cursor()
-
-            try:
-                cursor.execute(query)
-                result = cursor.fetchone()
-            except Exception as e:
-                result = None
-                print(f"Error executing query: {str(e)}")
-            finally:
-                cursor.close()
-                connection.close()
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute(query)
+                    result = cursor.fetchone()
+                except Exception as e:
+                    result = None
+                    print(f"Error executing query: {str(e)}")
+                finally:
+                    cursor.close()
+        except Exception as e:
+            result = None
+            report_exception(e)
+            trace(f"Erro ao executar consulta (pool de conexões): {str(e)}", color="red")
 
         return result
 
@@ -138,62 +344,298 @@ class DatabaseReader:
         return self._execute_query(query)
 
     def execute_procedure(self, procedure_name, params=None):
-        with self.lock:
-            connection = self._create_connection()
-            cursor = connection.cursor()
-
-            try:
-                if params:
-                    sp_script = f"EXEC {procedure_name} {', '.join(['?'] * len(params))}"
-                    cursor.execute(sp_script, params)
-                else:
-                    cursor.execute(f"EXEC {procedure_name}")
-
-                # Captura o valor retornado pela stored procedure
-                result = cursor.fetchall()
-
-                connection.commit()
-
-            except Exception as e:
-                print(f"Error executing procedure: {str(e)}")
-                connection.rollback()
-                return None
-            finally:
-                cursor.close()
-                connection.close()
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    if params:
+                        sp_script = f"EXEC {procedure_name} {', '.join(['?'] * len(params))}"
+                        cursor.execute(sp_script, params)
+                    else:
+                        cursor.execute(f"EXEC {procedure_name}")
+
+                    # Captura o valor retornado pela stored procedure
+                    result = cursor.fetchall()
+
+                    connection.commit()
+
+                except Exception as e:
+                    print(f"Error executing procedure: {str(e)}")
+                    connection.rollback()
+                    return None
+                finally:
+                    cursor.close()
+        except Exception as e:
+            report_exception(e)
+            trace(f"Erro ao executar procedure (pool de conexões): {str(e)}", color="red")
+            return None
 
         return result
 
-    def execute_stored_procedure_df(self, procedure_name, params=None):
-        with self.lock:
-            connection = self._create_connection()
-            cursor = connection.cursor()
+    def _execute_sp_cursor(self, cursor, procedure_name, params):
+        # Construir a string de chamada da stored procedure
+        if params:
+            sp_script = f"EXEC {procedure_name} {', '.join(['?'] * len(params))}"
+            cursor.execute(sp_script, params)
+        else:
+            cursor.execute(f"EXEC {procedure_name}")
+
+    def _iter_typed_chunks(self, procedure_name, params, dtypes, arraysize, chunksize, cancel_token=None):
+        """
+        Executa a SP e produz DataFrames tipados a cada `chunksize` linhas,
+        lendo o cursor em lotes de `arraysize` com fetchmany.
+
+        Com `cancel_token`, o tempo restante vira o timeout da consulta no
+        servidor, o cursor é interrompido ao cancelar e o cancelamento é
+        verificado entre os lotes.
+        """
+        with self.pool.connection(cancel_token) as connection:
+            if cancel_token is not None and cancel_token.remaining() is not None:
+                connection.timeout = max(1, int(math.ceil(cancel_token.remaining())))
 
+            cursor = connection.cursor()
             try:
-                # Construir a string de chamada da stored procedure
-                if params:
-                    sp_script = f"EXEC {procedure_name} {', '.join(['?'] * len(params))}"
-                    cursor.execute(sp_script, params)
-                else:
-                    cursor.execute(f"EXEC {procedure_name}")
-
-                # Obter os resultados e nomes das colunas
-                columns = [column[0] for column in cursor.description]
-                results = cursor.fetchall()
-
-                # Converter para DataFrame
-                df = pd.DataFrame.from_records(results, columns=columns)
-
-            except Exception as e:
-                print(f"Error executing procedure: {str(e)}")
-                connection.rollback()
-                return None
+                with (cancel_token.watch(cursor) if cancel_token is not None else nullcontext()):
+                    cursor.arraysize = arraysize
+                    self._execute_sp_cursor(cursor, procedure_name, params)
+
+                    columns = [column[0] for column in cursor.description]
+                    builders = [_ColumnBuilder((dtypes or {}).get(name)) for name in columns]
+                    buffered = 0
+
+                    while True:
+                        if cancel_token is not None:
+                            cancel_token.check()
+
+                        rows = cursor.fetchmany(arraysize)
+                        if not rows:
+                            break
+
+                        # Transpor o lote e converter cada coluna para o tipo final
+                        for builder, values in zip(builders, zip(*rows)):
+                            builder.append(values)
+                        buffered += len(rows)
+                        del rows
+
+                        if chunksize and buffered >= chunksize:
+                            yield _build_frame(columns, builders)
+                            buffered = 0
+
+                    if buffered or not chunksize:
+                        yield _build_frame(columns, builders)
+            except pyodbc.Error as e:
+                # Erro provocado pelo cancelamento/timeout: sinalizar como cancelamento
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise QueryCancelled(str(e)) from e
+                raise
             finally:
                 cursor.close()
-                connection.close()
+                if cancel_token is not None:
+                    connection.timeout = 0
+
+    def execute_stored_procedure_df(self, procedure_name, params=None, dtypes=None, arraysize=None, chunksize=None,
+                                    cancel_token=None):
+        """
+        Executa uma stored procedure e retorna o resultado como DataFrame.
+
+        Os dados são lidos em lotes (fetchmany) e convertidos coluna a coluna, sem
+        materializar a lista completa de linhas do pyodbc.
+
+        Args:
+            procedure_name (str): Nome da stored procedure
+            params (list, opcional): Parâmetros da SP
+            dtypes (dict, opcional): Tipo final por coluna ('category', 'Int64', 'datetime64[ns]');
+                                     colunas ausentes têm o tipo inferido
+            arraysize (int, opcional): Linhas por fetchmany (padrão DB_FETCH_ARRAYSIZE)
+            chunksize (int, opcional): Se informado, retorna um iterador de DataFrames
+                                       com até ~chunksize linhas cada
+            cancel_token (CancelToken, opcional): Cancelamento/tempo limite da consulta
+
+        Returns:
+            DataFrame | iterator: Resultado da SP, ou None em caso de erro (modo DataFrame)
+
+        Raises:
+            QueryCancelled: Se a consulta for cancelada ou exceder o tempo limite
+        """
+        arraysize = arraysize or DB_FETCH_ARRAYSIZE
+
+        if chunksize:
+            return self._iter_typed_chunks(procedure_name, params, dtypes, arraysize, chunksize, cancel_token)
+
+        try:
+            df = None
+            for chunk in self._iter_typed_chunks(procedure_name, params, dtypes, arraysize, None, cancel_token):
+                df = chunk
+        except QueryCancelled:
+            raise
+        except Exception as e:
+            report_exception(e)
+            trace(f"Erro ao executar procedure {procedure_name}: {str(e)}", color="red")
+            return None
 
         return df
 
+    def execute_stored_procedure_range_df(self, procedure_name, start, end, split='day', dtypes=None,
+                                          max_workers=None, retries=None, cancel_token=None):
+        """
+        Executa uma SP de período ([início, fim]) dividindo o intervalo em
+        sub-períodos consultados em paralelo e concatenados em ordem.
+
+        Args:
+            procedure_name (str): Nome da stored procedure (parâmetros: início, fim)
+            start (str | datetime): Início ('YYYY-MM-DD' = 00:00:00)
+            end (str | datetime): Fim ('YYYY-MM-DD' = 23:59:59.999)
+            split (str): 'day' ou 'week' (semanas iniciando na segunda-feira)
+            dtypes (dict, opcional): Tipos finais por coluna (ver execute_stored_procedure_df)
+            max_workers (int, opcional): Consultas simultâneas (padrão DB_RANGE_WORKERS,
+                                         limitado ao tamanho do pool)
+            retries (int, opcional): Novas tentativas por sub-período (padrão DB_RANGE_RETRIES)
+            cancel_token (CancelToken, opcional): Cancela todos os sub-períodos em andamento
+
+        Returns:
+            DataFrame: Resultado completo, ou None se algum sub-período falhar
+
+        Raises:
+            QueryCancelled: Se a consulta for cancelada ou exceder o tempo limite
+        """
+        ranges = split_date_range(start, end, split)
+        if not ranges:
+            return None
+
+        retries = DB_RANGE_RETRIES if retries is None else retries
+        workers = min(max_workers or DB_RANGE_WORKERS, self.pool.max_size, len(ranges))
+
+        def fetch(sub_range):
+            params = [_format_sp_datetime(sub_range[0]), _format_sp_datetime(sub_range[1])]
+            for attempt in range(retries + 1):
+                df = self.execute_stored_procedure_df(procedure_name, params, dtypes=dtypes,
+                                                      cancel_token=cancel_token)
+                if df is not None:
+                    return df
+                if cancel_token is not None:
+                    cancel_token.check()
+                if attempt < retries:
+                    trace(f"Falha em {procedure_name} {params[0]} - {params[1]}; "
+                          f"nova tentativa ({attempt + 1}/{retries})", color="yellow")
+                    delay = 0.5 * 2 ** attempt
+                    if cancel_token is None:
+                        time.sleep(delay)
+                    elif cancel_token.wait(delay):
+                        cancel_token.check()
+            return None
+
+        if workers <= 1:
+            frames = [fetch(sub_range) for sub_range in ranges]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sp-range') as executor:
+                frames = list(executor.map(fetch, ranges))
+
+        if any(frame is None for frame in frames):
+            print(f"Error executing procedure: {procedure_name} falhou em ao menos um sub-período")
+            return None
+
+        return _concat_frames(frames)
+
+
+def split_date_range(start, end, split='day'):
+    """
+    Divide [start, end] em sub-períodos contíguos alinhados ao dia ou à semana ISO.
+
+    Returns:
+        list: Pares (início, fim) de datetime; o fim de cada par é inclusivo
+    """
+    if isinstance(start, str):
+        start = datetime.strptime(start[:10], '%Y-%m-%d')
+    if isinstance(end, str):
+        end = datetime.strptime(end[:10], '%Y-%m-%d') + timedelta(days=1) - timedelta(milliseconds=1)
+
+    if split not in ('day', 'week'):
+        raise ValueError(f"Divisão de período inválida: {split}")
+
+    ranges = []
+    current = start
+    while current <= end:
+        boundary = datetime.combine(current.date(), datetime.min.time()) + timedelta(days=1)
+        if split == 'week':
+            boundary += timedelta(days=6 - current.weekday())
+        sub_end = min(boundary - timedelta(milliseconds=1), end)
+        ranges.append((current, sub_end))
+        current = boundary
+    return ranges
+
+
+def _format_sp_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S.') + f"{value.microsecond // 1000:03d}"
+
+
+def _concat_frames(frames):
+    """Concatena DataFrames preservando colunas categóricas (união das categorias)."""
+    if len(frames) == 1:
+        return frames[0]
+
+    columns = frames[0].columns
+    data = {}
+    for name in columns:
+        parts = [frame[name] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            data[name] = union_categoricals([part.array for part in parts])
+        else:
+            data[name] = pd.concat(parts, ignore_index=True).array
+    return pd.DataFrame(data, columns=columns, copy=False)
+
+
+class _ColumnBuilder:
+    """Acumula os lotes de uma coluna já convertidos para o tipo final."""
+
+    def __init__(self, dtype=None):
+        self.dtype = dtype
+        self._chunks = []
+        # Categorias acumuladas entre lotes (valor -> código)
+        self._categories = {} if dtype == 'category' else None
+
+    def append(self, values):
+        if self.dtype == 'category':
+            # Fatorar o lote e traduzir os códigos locais para as categorias acumuladas
+            local_codes, uniques = pd.factorize(np.array(values, dtype=object))
+            categories = self._categories
+            lookup = np.fromiter((categories.setdefault(value, len(categories)) for value in uniques),
+                                 dtype=np.int32, count=len(uniques))
+            codes = np.full(len(local_codes), -1, dtype=np.int32)
+            valid = local_codes >= 0
+            codes[valid] = lookup[local_codes[valid]]
+            self._chunks.append(codes)
+        elif self.dtype == 'Int64':
+            numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+            numbers = numbers.where(numbers == np.floor(numbers))
+            mask = numbers.isna().to_numpy()
+            self._chunks.append((numbers.fillna(0).to_numpy(dtype=np.int64), mask))
+        elif self.dtype and self.dtype.startswith('datetime64'):
+            self._chunks.append(pd.to_datetime(pd.Series(values, dtype=object), errors='coerce').to_numpy(self.dtype))
+        else:
+            self._chunks.append(np.array(values, dtype=object))
+
+    def build(self):
+        """Retorna a coluna completa dos lotes acumulados e esvazia o buffer."""
+        chunks, self._chunks = self._chunks, []
+
+        if self.dtype == 'category':
+            codes = np.concatenate(chunks) if chunks else np.array([], dtype=np.int32)
+            return pd.Categorical.from_codes(codes, categories=list(self._categories))
+        if self.dtype == 'Int64':
+            if not chunks:
+                return pd.array([], dtype='Int64')
+            return pd.arrays.IntegerArray(np.concatenate([values for values, _ in chunks]),
+                                          np.concatenate([mask for _, mask in chunks]))
+        if self.dtype and self.dtype.startswith('datetime64'):
+            return np.concatenate(chunks) if chunks else np.array([], dtype=self.dtype)
+
+        values = np.concatenate(chunks) if chunks else np.array([], dtype=object)
+        return pd.Series(values, dtype=object, copy=False).infer_objects().to_numpy()
+
+
+def _build_frame(columns, builders):
+    return pd.DataFrame({name: builder.build() for name, builder in zip(columns, builders)}, columns=columns, copy=False)
+
 
 # Função auxiliar para obter uma instância da conexão
 def get_db_connection():
@@ -210,5 +652,5 @@ if __name__ == '__main__':
     start_date = '2024-01-01 00:00:33.220'
     end_date = '2024-01-31 23:59:59.220'
 
-    ret = sql.execute_stored_procedure_df('sp_VehicleAccessReport', [start_date, end_date])
+    ret = sql.execute_stored_procedure_df('sp_VehicleAccessReport', [start_date, end_date], dtypes=VEHICLE_ACCESS_DTYPES)
     print(ret)
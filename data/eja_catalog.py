@@ -0,0 +1,288 @@
+# data/eja_catalog.py
+# Catálogo de EJAs em memória, compartilhado pelo processo
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.tracer import trace, report_exception
+
+
+class EJASnapshot:
+    """
+    Estado imutável do catálogo em uma versão.
+
+    Attributes:
+        version (int): Versão do catálogo que gerou o snapshot
+        records (tuple): Registros (dict) ordenados por eja_code
+        codes (ndarray): Códigos EJA ordenados (int64), alinhados a `records`
+        titles (ndarray): Títulos alinhados a `codes`
+        classifications (ndarray): new_classification alinhada a `codes`
+        class_names (list): Classificações distintas (preenchidas)
+        class_index (ndarray): Posição em `class_names` alinhada a `codes` (-1 sem classificação)
+        by_code (dict): eja_code (int) -> registro
+        by_id (dict): id -> registro
+        classification_by_code (dict): eja_code (int) -> new_classification (apenas preenchidas)
+    """
+
+    def __init__(self, records, version):
+        self.version = version
+        self.records = tuple(sorted(records, key=lambda record: record['eja_code']))
+        self.codes = np.array([record['eja_code'] for record in self.records], dtype=np.int64)
+        self.titles = np.array([record.get('title') for record in self.records], dtype=object)
+        self.classifications = np.array([record.get('new_classification') or '' for record in self.records],
+                                        dtype=object)
+        self.by_code = {record['eja_code']: record for record in self.records}
+        self.by_id = {record.get('id'): record for record in self.records}
+        self.classification_by_code = {
+            record['eja_code']: record['new_classification']
+            for record in self.records if record.get('new_classification')
+        }
+        self.class_names = list(dict.fromkeys(self.classification_by_code.values()))
+        class_positions = {name: position for position, name in enumerate(self.class_names)}
+        self.class_index = np.array([class_positions.get(name, -1) for name in self.classifications],
+                                    dtype=np.int64)
+
+    def __len__(self):
+        return len(self.records)
+
+    def classification_names(self):
+        """Classificações distintas, na ordem em que aparecem no catálogo."""
+        return list(self.class_names)
+
+    def positions(self, codes):
+        """
+        Localiza códigos EJA no catálogo por busca binária (searchsorted).
+
+        Args:
+            codes (Series | array-like): Códigos EJA inteiros (nulos permitidos)
+
+        Returns:
+            ndarray: Posição de cada código em `codes` do catálogo, -1 se não cadastrado
+        """
+        values = eja_codes(codes).to_numpy(dtype=np.int64, na_value=-1)
+        if len(self.codes) == 0:
+            return np.full(len(values), -1, dtype=np.int64)
+
+        found = np.searchsorted(self.codes, values)
+        found[found == len(self.codes)] = 0
+        return np.where(self.codes[found] == values, found, -1)
+
+    def codes_for_classification(self, classification):
+        """Códigos EJA (int64, ordenados) de uma classificação."""
+        if classification not in self.class_names:
+            return np.array([], dtype=np.int64)
+        return self.codes[self.class_index == self.class_names.index(classification)]
+
+    def titles_for(self, codes, default='EJA {code}'):
+        """Títulos dos códigos informados; `default` formatado para os não cadastrados."""
+        found = self.positions(codes)
+        return [self.titles[position] if position >= 0 else default.format(code=code)
+                for code, position in zip(codes, found)]
+
+
+class EJACatalog:
+    """
+    Catálogo de EJAs carregado uma única vez do SQLite e mantido em memória.
+
+    As escritas do LocalDatabaseHandler (add/update/delete/importação) atualizam
+    o catálogo após o commit. Cada alteração incrementa `version`, que pode
+    compor chaves de caches derivados do catálogo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def _load_records(self):
+        from data.local_db_handler import get_db_handler
+
+        db_handler = get_db_handler()
+        try:
+            return db_handler.get_all_ejas()
+        finally:
+            db_handler.close()
+
+    def snapshot(self):
+        """Retorna o snapshot atual, carregando do SQLite se necessário."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None:
+                try:
+                    records = self._load_records()
+                except Exception as e:
+                    report_exception(e)
+                    trace(f"Erro ao carregar catálogo de EJAs: {str(e)}", color="red")
+                    return EJASnapshot([], self._version)
+                self._snapshot = EJASnapshot(records, self._version)
+                trace(f"Catálogo de EJAs carregado: {len(self._snapshot)} registros (versão {self._version})")
+            return self._snapshot
+
+    # =================== Consultas ===================
+
+    def get_all_ejas(self):
+        """Lista de EJAs ordenada por código (cópias, podem ser alteradas pelo chamador)."""
+        return [dict(record) for record in self.snapshot().records]
+
+    def get_eja_by_code(self, eja_code):
+        record = self.snapshot().by_code.get(eja_code)
+        return dict(record) if record else None
+
+    def get_all_classifications(self):
+        return self.snapshot().classification_names()
+
+    # =================== Atualização (write-through) ===================
+
+    def _replace(self, records):
+        self._version += 1
+        self._snapshot = EJASnapshot(records, self._version)
+
+    def upsert(self, record):
+        """Inclui ou substitui (pelo id) um registro após commit no SQLite."""
+        if not record:
+            return
+        with self._lock:
+            if self._snapshot is None:
+                self._version += 1
+                return
+            records = [r for r in self._snapshot.records
+                       if r.get('id') != record.get('id') and r['eja_code'] != record['eja_code']]
+            records.append(dict(record))
+            self._replace(records)
+
+    def remove(self, eja_id):
+        """Remove um registro (pelo id) após commit no SQLite."""
+        with self._lock:
+            if self._snapshot is None:
+                self._version += 1
+                return
+            self._replace([r for r in self._snapshot.records if r.get('id') != eja_id])
+
+    def invalidate(self):
+        """Descarta o catálogo; o próximo acesso recarrega do SQLite."""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+
+def eja_codes(values):
+    """
+    Normaliza uma coluna EJA para inteiro anulável (Int64).
+    Colunas já inteiras (ingestão da SP/espelho) são retornadas sem cópia.
+
+    Args:
+        values (Series | array-like): Códigos EJA
+
+    Returns:
+        Series: Códigos Int64 (valores não numéricos ou não inteiros viram <NA>)
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series if isinstance(series.dtype, pd.Int64Dtype) else series.astype('Int64')
+    if not pd.api.types.is_float_dtype(series.dtype):
+        series = pd.to_numeric(series.astype('string').str.strip(), errors='coerce')
+
+    # Sem arredondar: 832.6 não é o EJA 833
+    return series.where(series % 1 == 0).astype('Int64')
+
+
+# Textos tratados como EJA não informado
+_BLANK_EJA_TEXTS = ('', 'nan', 'none', 'null')
+
+
+def _clean_vehicles(values):
+    """Veículo sem espaços nas bordas; ausentes e textos vazios/'nan'/'none'/'null' viram 'N/A'."""
+    codes, uniques = pd.factorize(values.astype(object), use_na_sentinel=True)
+    cleaned = [str(value).strip() for value in uniques]
+    cleaned = [value if value and value.lower() not in ('nan', 'none', 'null') else 'N/A'
+               for value in cleaned]
+    lookup = np.array(cleaned + ['N/A'], dtype=object)
+    return lookup[codes]
+
+
+def _group_problems(frame, key, limit):
+    """Soma horas e eventos por `key`, com até `limit` veículos distintos (ordem de aparição)."""
+    totals = frame.groupby(key, sort=False).agg(total_hours=('hours', 'sum'), event_count=('hours', 'size'))
+    vehicles = (
+        frame[frame['Vehicle'].notna()]
+        .drop_duplicates([key, 'Vehicle'])
+        .groupby(key, sort=False)
+        .head(limit)
+        .groupby(key, sort=False)['Vehicle']
+        .agg(lambda names: [str(name) for name in names])
+    )
+    return [
+        {'identifier': identifier, 'total_hours': float(total_hours),
+         'event_count': int(event_count), 'vehicles': vehicles.get(identifier, [])}
+        for identifier, total_hours, event_count in totals.itertuples(name=None)
+    ]
+
+
+def find_missing_ejas(events, known_codes):
+    """
+    Eventos sem EJA informado (agrupados por veículo) e com EJA não
+    cadastrado (agrupados por código). Função de módulo, pode rodar no
+    pool de agregação.
+
+    Args:
+        events (DataFrame): Colunas EJA, Vehicle e StayTime da SP
+        known_codes (ndarray): Códigos EJA cadastrados (EJASnapshot.codes)
+
+    Returns:
+        dict: 'eja_vazio' e 'eja_nao_cadastrado', listas de
+              {identifier, total_hours, event_count, vehicles}
+    """
+    from utils.durations import hours_from_hhmm
+
+    codes = eja_codes(events['EJA'])
+    no_code = codes.isna().to_numpy(dtype=bool)
+    frame = pd.DataFrame({
+        'Vehicle': events['Vehicle'].astype(object).to_numpy(),
+        'vehicle_clean': _clean_vehicles(events['Vehicle']),
+        'hours': hours_from_hhmm(events['StayTime']).to_numpy(),
+    })
+
+    # Sem código: vazio apenas se nulo ou texto em branco; 'ABC', '12-A' e 832.6 são
+    # códigos não cadastrados, identificados pelo próprio texto
+    text = events['EJA'][no_code].astype('string').str.strip()
+    blank = (text.isna() | text.str.lower().isin(_BLANK_EJA_TEXTS)).to_numpy(dtype=bool)
+    empty = no_code.copy()
+    empty[no_code] = blank
+    invalid = no_code & ~empty
+
+    code_values = codes.to_numpy(dtype='float64', na_value=np.nan)
+    unknown = ~no_code & ~np.isin(code_values, np.asarray(known_codes, dtype='float64'))
+
+    identifiers = np.empty(len(frame), dtype=object)
+    identifiers[unknown] = code_values[unknown].astype(np.int64).astype(str)
+    identifiers[invalid] = text[~blank].to_numpy(dtype=object)
+    problems = unknown | invalid
+    unregistered = _group_problems(frame[problems].assign(identifier=identifiers[problems]), 'identifier', 3)
+
+    return {
+        'eja_vazio': _group_problems(frame[empty], 'vehicle_clean', 2),
+        'eja_nao_cadastrado': unregistered,
+    }
+
+
+_eja_catalog = None
+_eja_catalog_lock = threading.Lock()
+
+
+def get_eja_catalog():
+    """Retorna a instância única do catálogo de EJAs."""
+    global _eja_catalog
+    if _eja_catalog is None:
+        with _eja_catalog_lock:
+            if _eja_catalog is None:
+                _eja_catalog = EJACatalog()
+    return _eja_catalog
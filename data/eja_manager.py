@@ -1,11 +1,13 @@
 # data/eja_manager.py
 import os
+import threading
 import pandas as pd
 from utils.tracer import trace, report_exception
 from datetime import datetime
 
 # Importar o gerenciador de banco de dados SQLite
 from data.local_db_handler import LocalDatabaseHandler, get_db_handler
+from data.eja_catalog import get_eja_catalog
 
 
 class EJAManager:
@@ -15,23 +17,30 @@ class EJAManager:
 
     def __init__(self):
         """Inicializa o gerenciador de EJAs."""
-        try:
-            # Inicializar o gerenciador de banco de dados SQLite
-            self.db_handler = LocalDatabaseHandler()
-            self.use_sqlite = True
-            trace("Gerenciador de EJAs inicializado com SQLite", color="green")
-        except Exception as e:
-            report_exception(e)
-            trace(f"Erro ao inicializar gerenciador de EJAs: {str(e)}", color="red")
+        # Conexão SQLite aberta sob demanda: consultas ao catálogo usam o cache em memória
+        self._db_handler = None
+        self.use_sqlite = True
+
+    @property
+    def db_handler(self):
+        if self._db_handler is None:
+            try:
+                self._db_handler = LocalDatabaseHandler()
+                trace("Gerenciador de EJAs inicializado com SQLite", color="green")
+            except Exception as e:
+                report_exception(e)
+                trace(f"Erro ao inicializar gerenciador de EJAs: {str(e)}", color="red")
+                raise
+        return self._db_handler
 
     def get_all_ejas(self):
         """
-        Retorna todos os EJAs.
+        Retorna todos os EJAs (a partir do catálogo em memória).
 
         Returns:
             list: Lista de dicionários com os dados dos EJAs
         """
-        return self.db_handler.get_all_ejas()
+        return get_eja_catalog().get_all_ejas()
 
     def search_ejas(self, search_term=None, eja_code=None, classification=None):
         """
@@ -81,7 +90,7 @@ class EJAManager:
         """
         try:
             eja_code = int(eja_code)
-            return self.db_handler.get_eja_by_code(eja_code)
+            return get_eja_catalog().get_eja_by_code(eja_code)
         except (ValueError, TypeError):
             trace(f"Código de EJA inválido: {eja_code}", color="yellow")
             return None
@@ -180,7 +189,7 @@ class EJAManager:
         Returns:
             list: Lista de classificações
         """
-        return self.db_handler.get_all_classifications()
+        return get_eja_catalog().get_all_classifications()
 
     # =================== Métodos para importação/exportação CSV ===================
 
@@ -250,7 +259,16 @@ class EJAManager:
             return f"Erro ao exportar: {str(e)}"
 
 
+_eja_manager = None
+_eja_manager_lock = threading.Lock()
+
+
 # Função auxiliar para obter uma instância do gerenciador de EJAs
 def get_eja_manager():
-    """Retorna uma instância do gerenciador de EJAs."""
-    return EJAManager()
+    """Retorna a instância única do gerenciador de EJAs (conexão SQLite por thread)."""
+    global _eja_manager
+    if _eja_manager is None:
+        with _eja_manager_lock:
+            if _eja_manager is None:
+                _eja_manager = EJAManager()
+    return _eja_manager
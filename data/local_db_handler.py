@@ -1,14 +1,194 @@
 # data/local_db_handler.py
 import os
 import sqlite3
+import threading
+import itertools
+from contextlib import closing, contextmanager
 import pandas as pd
 from utils.tracer import trace, report_exception
+from data.result_cache import invalidate_dashboard_cache
+from data.eja_catalog import get_eja_catalog
+from data.migrations import apply_migrations
 from datetime import datetime
 
 
+# Ajustes das conexões SQLite
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+# Cache de páginas por conexão (KiB)
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', '65536'))
+# Janela de leitura mapeada em memória (bytes); 0 desativa
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+# Conexões ociosas mantidas no pool por arquivo
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', '8'))
+
+# Primeiro clients_usage.start_day (dias desde 1970-01-01, ver data/migrations.py) dos
+# últimos 12 meses: equivale a datetime(start_date) >= datetime('now', '-12 months')
+LAST_12_MONTHS_START_DAY_SQL = "((CAST(strftime('%s', 'now', '-12 months') AS INTEGER) + 86399) / 86400)"
+
+_migrated_paths = set()
+_migration_lock = threading.Lock()
+
+
+def _open_connection(db_path):
+    """Abre uma conexão SQLite em modo WAL com os ajustes de desempenho."""
+    # check_same_thread=False: a conexão volta ao pool e é reutilizada por outra thread
+    conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row  # Para acessar colunas pelo nome
+    # WAL: leitores não esperam pelas escritas (processador semanal, espelho de acessos)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+class _SQLiteConnectionPool:
+    """
+    Pool thread-safe de conexões SQLite já configuradas, por arquivo.
+
+    - checkout nunca bloqueia: sem conexão ociosa, abre uma nova (o número de
+      conexões em uso é o número de threads usando o banco)
+    - release guarda no máximo `max_idle` conexões ociosas por arquivo e fecha
+      as excedentes
+    """
+
+    def __init__(self, max_idle=SQLITE_POOL_SIZE):
+        self.max_idle = max(0, int(max_idle))
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def checkout(self, db_path):
+        with self._lock:
+            idle = self._idle.get(db_path)
+            if idle:
+                return idle.pop()
+        return _open_connection(db_path)
+
+    def release(self, db_path, conn):
+        try:
+            # Transação esquecida pela thread anterior não passa para a próxima
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._close(conn)
+            return
+
+        with self._lock:
+            idle = self._idle.setdefault(db_path, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_connection_pool = _SQLiteConnectionPool()
+
+
+class _ThreadConnections(dict):
+    """Conexões da thread ({db_path: conn}); voltam ao pool quando a thread termina."""
+
+    def release(self):
+        for db_path, conn in list(self.items()):
+            _connection_pool.release(db_path, conn)
+        self.clear()
+
+    def __del__(self):
+        try:
+            self.release()
+        except Exception:
+            pass
+
+
+_thread_connections = threading.local()
+
+
+def get_sqlite_connection(db_path):
+    """
+    Retorna a conexão da thread atual para o banco (uma por thread e arquivo).
+    A conexão vem do pool, é reaproveitada por todos os gerenciadores da
+    thread e volta ao pool quando a thread termina (threads por requisição
+    do servidor não reabrem a conexão nem repetem os PRAGMAs).
+
+    Args:
+        db_path (str): Caminho do arquivo SQLite
+
+    Returns:
+        sqlite3.Connection: Conexão da thread
+    """
+    connections = getattr(_thread_connections, 'connections', None)
+    if connections is None:
+        connections = _thread_connections.connections = _ThreadConnections()
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = _connection_pool.checkout(db_path)
+    return conn
+
+
+def close_thread_connections():
+    """Devolve ao pool as conexões SQLite da thread atual (threads de longa duração, ao encerrar)."""
+    connections = getattr(_thread_connections, 'connections', None)
+    if connections is not None:
+        connections.release()
+
+
+_savepoint_ids = itertools.count(1)
+
+
+@contextmanager
+def sqlite_transaction(conn):
+    """
+    Transação de escrita explícita: BEGIN IMMEDIATE e, ao sair do bloco,
+    COMMIT (ou ROLLBACK em caso de exceção).
+
+    A conexão é compartilhada pelos gerenciadores da thread: se já houver uma
+    transação aberta, o bloco vira um SAVEPOINT; uma exceção desfaz apenas o
+    bloco, e o commit fica com quem abriu a transação externa.
+
+    Args:
+        conn (sqlite3.Connection): Conexão da thread
+
+    Yields:
+        sqlite3.Connection: A mesma conexão
+    """
+    if conn.in_transaction:
+        savepoint = f"sp_{next(_savepoint_ids)}"
+        conn.execute(f"SAVEPOINT {savepoint}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+            raise
+        conn.execute(f"RELEASE {savepoint}")
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
 class LocalDatabaseHandler:
     """
     Classe simplificada para gerenciar o banco de dados SQLite local do dashboard.
+
+    `conn` é resolvida na thread que a usa (get_sqlite_connection) e cada
+    operação abre e fecha o próprio cursor, de modo que a mesma instância pode
+    ser compartilhada entre callbacks.
     """
 
     def __init__(self, db_path=None):
@@ -21,125 +201,81 @@ class LocalDatabaseHandler:
 
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
 
-        db_exists = os.path.exists(self.db_path)
-
-        self.conn = None
-        self.cursor = None
+        self._local = threading.local()
+        self._closed = True
         self.connect()
+        self._ensure_schema()
 
-        if not db_exists:
-            self.create_tables()
+    @property
+    def conn(self):
+        """Conexão da thread atual (None após close)."""
+        if self._closed:
+            return None
+        return get_sqlite_connection(self.db_path)
+
+    @property
+    def cursor(self):
+        """Cursor deste gerenciador na thread atual (compatibilidade; prefira closing(conn.cursor()))."""
+        conn = self.conn
+        if conn is None:
+            return None
+
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None or getattr(self._local, 'conn', None) is not conn:
+            cursor = self._local.cursor = conn.cursor()
+            self._local.conn = conn
+        return cursor
+
+    def _ensure_schema(self):
+        """Aplica as migrações pendentes (uma vez por arquivo no processo)."""
+        if self.db_path in _migrated_paths:
+            return
+        with _migration_lock:
+            if self.db_path in _migrated_paths:
+                return
+            try:
+                apply_migrations(self.conn)
+                _migrated_paths.add(self.db_path)
+            except Exception as e:
+                report_exception(e)
+                trace(f"Erro ao aplicar migrações do SQLite: {str(e)}", color="red")
 
     def connect(self):
         """Estabelece conexão com o banco de dados SQLite."""
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.conn.row_factory = sqlite3.Row  # Para acessar colunas pelo nome
-            self.cursor = self.conn.cursor()
+            get_sqlite_connection(self.db_path)
+            self._closed = False
             return True
         except Exception as e:
             report_exception(e)
             trace(f"Erro ao conectar ao banco de dados SQLite: {str(e)}", color="red")
             return False
 
+    def transaction(self):
+        """Transação de escrita na conexão da thread (ver sqlite_transaction)."""
+        return sqlite_transaction(self.conn)
+
     def close(self):
-        """Fecha a conexão com o banco de dados."""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
-            self.cursor = None
+        """
+        Libera o gerenciador. A conexão da thread é compartilhada com os
+        demais gerenciadores e continua aberta, sem commit nem rollback: cada
+        escrita delimita a própria transação (transaction()).
+        """
+        if self._closed:
+            return
 
-    def create_tables(self):
-        try:
-            # Criar a tabela EJA
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS eja (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                eja_code INTEGER NOT NULL UNIQUE,
-                title TEXT NOT NULL,
-                new_classification TEXT,
-                classification TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-
-            # Criar a tabela tracks
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tracks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ponto TEXT,
-                pista TEXT,
-                track TEXT
-            )
-            ''')
-
-            # Criar a tabela Utilization(%)
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS usage_percentage (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                year INTEGER NOT NULL,
-                month INTEGER NOT NULL,
-                value REAL NOT NULL
-            )
-            ''')
-
-            # Criar a tabela Tracks Availability(%)
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tracks_availability (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                year INTEGER NOT NULL,
-                month INTEGER NOT NULL,
-                value REAL NOT NULL
-            )
-            ''')
-
-            # Tabela clients_usage para armazenar utilização semanal
-            self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients_usage (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                week_number INTEGER NOT NULL,
-                year INTEGER NOT NULL,
-                start_date TEXT NOT NULL,
-                end_date TEXT NOT NULL,
-                client_name TEXT NOT NULL,
-                classification TEXT NOT NULL,
-                hours REAL NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                entry_time TEXT NOT NULL,
-                exit_time TEXT NOT NULL,
-                UNIQUE (client_name, entry_time, exit_time) ON CONFLICT IGNORE
-            )
-            ''')
-
-            # Criar índices para melhorar a performance
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_eja_code ON eja (eja_code)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_eja_title ON eja (title)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_eja_class ON eja (new_classification)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_track_pista ON tracks (pista)')
-
-            # Índices para a tabela clients_usage
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_week ON clients_usage (week_number, year)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_date ON clients_usage (start_date, end_date)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_client ON clients_usage (client_name)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_class ON clients_usage (classification)')
-            self.cursor.execute('CREATE UNIQUE INDEX idx_clients_usage_unique ON clients_usage (client_name, entry_time, exit_time)')
-
-            # Commit para salvar as alterações
-            self.conn.commit()
-            trace("Tabelas criadas com sucesso no SQLite.", color="green")
-            return True
-        except Exception as e:
-            report_exception(e)
-            trace(f"Erro ao criar tabelas no SQLite: {str(e)}", color="red")
-            self.conn.rollback()
-            return False
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is not None:
+            cursor.close()
+            self._local.cursor = None
+        self._closed = True
 
     def select(self, script):
         """Retorna todos os EJAs do banco de dados."""
         try:
-            self.cursor.execute(script)
-            return self.cursor.fetchone()
+            with closing(self.conn.cursor()) as cursor:
+                cursor.execute(script)
+                return cursor.fetchone()
         except Exception as e:
             report_exception(e)
             trace(f"Erro ao fazer select: {str(e)}", color="red")
@@ -181,8 +317,9 @@ class LocalDatabaseHandler:
 
             query += " GROUP BY client_name, classification ORDER BY total_hours DESC"
 
-            self.cursor.execute(query, params)
-            rows = self.cursor.fetchall()
+            with closing(self.conn.cursor()) as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
 
             if not rows:
                 return pd.DataFrame()
@@ -200,11 +337,17 @@ class LocalDatabaseHandler:
 
     # =================== Métodos para gerenciamento de EJAs ===================
 
+    def _refresh_clients_summary(self):
+        """Recalcula o resumo por classificação na transação da alteração de EJAs."""
+        from data.clients_summary import refresh_clients_usage_summary
+        refresh_clients_usage_summary(self.conn)
+
     def get_all_ejas(self):
         """Retorna todos os EJAs do banco de dados."""
         try:
-            self.cursor.execute("SELECT * FROM eja ORDER BY eja_code")
-            rows = self.cursor.fetchall()
+            with closing(self.conn.cursor()) as cursor:
+                cursor.execute("SELECT * FROM eja ORDER BY eja_code")
+                rows = cursor.fetchall()
             return [dict(row) for row in rows]
         except Exception as e:
             report_exception(e)
@@ -214,8 +357,9 @@ class LocalDatabaseHandler:
     def get_eja_by_id(self, eja_id):
         """Busca um EJA pelo ID."""
         try:
-            self.cursor.execute("SELECT * FROM eja WHERE id = ?", (eja_id,))
-            row = self.cursor.fetchone()
+            with closing(self.conn.cursor()) as cursor:
+                cursor.execute("SELECT * FROM eja WHERE id = ?", (eja_id,))
+                row = cursor.fetchone()
             return dict(row) if row else None
         except Exception as e:
             report_exception(e)
@@ -225,8 +369,9 @@ class LocalDatabaseHandler:
     def get_eja_by_code(self, eja_code):
         """Busca um EJA pelo código."""
         try:
-            self.cursor.execute("SELECT * FROM eja WHERE eja_code = ?", (eja_code,))
-            row = self.cursor.fetchone()
+            with closing(self.conn.cursor()) as cursor:
+                cursor.execute("SELECT * FROM eja WHERE eja_code = ?", (eja_code,))
+                row = cursor.fetchone()
             return dict(row) if row else None
         except Exception as e:
             report_exception(e)
@@ -253,8 +398,9 @@ class LocalDatabaseHandler:
 
             query += " ORDER BY eja_code"
 
-            self.cursor.execute(query, params)
-            rows = self.cursor.fetchall()
+            with closing(self.conn.cursor()) as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
             ret = [dict(row) for row in rows]
             trace(f"Search result: {ret}")
             return ret
@@ -276,26 +422,28 @@ class LocalDatabaseHandler:
             if existing_eja:
                 return {"error": f"EJA CODE {eja_code} já existe"}
 
-            # Inserir o novo EJA
-            self.cursor.execute("""
-                INSERT INTO eja (eja_code, title, new_classification, classification)
-                VALUES (?, ?, ?, ?)
-            """, (
-                eja_data['eja_code'],
-                eja_data['title'],
-                eja_data.get('new_classification', ''),
-                eja_data.get('classification', '')
-            ))
-
-            # Commit para salvar as alterações
-            self.conn.commit()
+            # Inserir o novo EJA (com o resumo por classificação, na mesma transação)
+            with self.transaction():
+                with closing(self.conn.cursor()) as cursor:
+                    cursor.execute("""
+                        INSERT INTO eja (eja_code, title, new_classification, classification)
+                        VALUES (?, ?, ?, ?)
+                    """, (
+                        eja_data['eja_code'],
+                        eja_data['title'],
+                        eja_data.get('new_classification', ''),
+                        eja_data.get('classification', '')
+                    ))
+                self._refresh_clients_summary()
+            invalidate_dashboard_cache()
 
             # Retornar o registro recém-inserido
-            return self.get_eja_by_code(eja_data['eja_code'])
+            inserted = self.get_eja_by_code(eja_data['eja_code'])
+            get_eja_catalog().upsert(inserted)
+            return inserted
         except Exception as e:
             report_exception(e)
             trace(f"Erro ao adicionar EJA: {str(e)}", color="red")
-            self.conn.rollback()
             return {"error": str(e)}
 
     def update_eja(self, eja_id, eja_data):
@@ -333,15 +481,20 @@ class LocalDatabaseHandler:
             values.append(eja_id)
 
             # Executar a query
-            self.cursor.execute(query, values)
-            self.conn.commit()
+            with self.transaction():
+                with closing(self.conn.cursor()) as cursor:
+                    cursor.execute(query, values)
+                if 'eja_code' in eja_data or 'new_classification' in eja_data:
+                    self._refresh_clients_summary()
+            invalidate_dashboard_cache()
 
             # Retornar o registro atualizado
-            return self.get_eja_by_id(eja_id)
+            updated = self.get_eja_by_id(eja_id)
+            get_eja_catalog().upsert(updated)
+            return updated
         except Exception as e:
             report_exception(e)
             trace(f"Erro ao atualizar EJA: {str(e)}", color="red")
-            self.conn.rollback()
             return {"error": str(e)}
 
     def delete_eja(self, eja_id):
@@ -353,20 +506,24 @@ class LocalDatabaseHandler:
                 return False
 
             # Remover o EJA
-            self.cursor.execute("DELETE FROM eja WHERE id = ?", (eja_id,))
-            self.conn.commit()
+            with self.transaction():
+                with closing(self.conn.cursor()) as cursor:
+                    cursor.execute("DELETE FROM eja WHERE id = ?", (eja_id,))
+                self._refresh_clients_summary()
+            invalidate_dashboard_cache()
+            get_eja_catalog().remove(eja_id)
             return True
         except Exception as e:
             report_exception(e)
             trace(f"Erro ao remover EJA: {str(e)}", color="red")
-            self.conn.rollback()
             return False
 
     def get_all_classifications(self):
         """Retorna todas as classificações únicas disponíveis."""
         try:
-            self.cursor.execute("SELECT DISTINCT new_classification FROM eja WHERE new_classification IS NOT NULL AND new_classification != ''")
-            rows = self.cursor.fetchall()
+            with closing(self.conn.cursor()) as cursor:
+                cursor.execute("SELECT DISTINCT new_classification FROM eja WHERE new_classification IS NOT NULL AND new_classification != ''")
+                rows = cursor.fetchall()
             return [row['new_classification'] for row in rows]
         except Exception as e:
             report_exception(e)
@@ -375,6 +532,41 @@ class LocalDatabaseHandler:
 
     # =================== Métodos para importação/exportação de CSV ===================
 
+    @staticmethod
+    def _prepare_eja_import(df):
+        """
+        Valida e normaliza as linhas do CSV de EJAs de uma vez (sem iterar linhas).
+
+        Linhas sem EJA CODE inteiro ou sem TITLE são ignoradas; códigos
+        repetidos mantêm a última ocorrência, como a importação linha a linha.
+
+        Returns:
+            tuple: (DataFrame eja_code/title/new_classification/classification, linhas ignoradas;
+                    textos ausentes como None)
+        """
+        codes = pd.to_numeric(df['EJA CODE'], errors='coerce')
+        titles = df['TITLE'].astype('string')
+
+        def text_column(name):
+            # Coluna ausente grava ''; célula vazia continua NULL, como na importação linha a linha
+            if name not in df.columns:
+                return pd.Series('', index=df.index, dtype='string')
+            return df[name].astype('string')
+
+        records = pd.DataFrame({
+            'eja_code': codes,
+            'title': titles,
+            'new_classification': text_column('NEW CLASSIFICATION'),
+            'classification': text_column('CLASSIFICATION'),
+        })
+
+        valid = codes.notna() & (codes == codes.round()) & titles.str.strip().fillna('').ne('')
+        records = records[valid.to_numpy(dtype=bool)].drop_duplicates('eja_code', keep='last')
+        records = records.astype({'eja_code': 'int64', 'title': object,
+                                  'new_classification': object, 'classification': object})
+        records = records.where(records.notna(), None)
+        return records, len(df) - len(records)
+
     def import_ejas_from_csv(self, file_path, overwrite=True):
         """
         Importa EJAs de um arquivo CSV para o banco de dados.
@@ -400,77 +592,44 @@ class LocalDatabaseHandler:
             if missing_cols:
                 return {"error": f"Colunas obrigatórias ausentes: {', '.join(missing_cols)}"}
 
-            # Garantir que os números são numéricos
-            df['EJA CODE'] = pd.to_numeric(df['EJA CODE'], errors='coerce')
+            records, skipped = self._prepare_eja_import(df)
+            rows = list(zip(records['eja_code'].tolist(), records['title'].tolist(),
+                            records['new_classification'].tolist(), records['classification'].tolist()))
 
-            # Iniciar transação
-            self.cursor.execute("BEGIN TRANSACTION")
-
-            try:
+            # Gravar tudo (e o resumo por classificação) em uma única transação
+            with self.transaction():
                 if overwrite:
                     # Limpar a tabela se estiver substituindo todos os registros
-                    self.cursor.execute("DELETE FROM eja")
-
-                    # Inserir todos os registros
-                    for _, row in df.iterrows():
-                        self.cursor.execute("""
+                    with closing(self.conn.cursor()) as cursor:
+                        cursor.execute("DELETE FROM eja")
+                        cursor.executemany("""
                             INSERT INTO eja (eja_code, title, new_classification, classification)
                             VALUES (?, ?, ?, ?)
-                        """, (
-                            int(row['EJA CODE']),
-                            row['TITLE'],
-                            row['NEW CLASSIFICATION'] if 'NEW CLASSIFICATION' in df.columns else '',
-                            row['CLASSIFICATION'] if 'CLASSIFICATION' in df.columns else ''
-                        ))
+                        """, rows)
 
                     result = {
                         "status": "success",
-                        "message": f"Importação concluída: {len(df)} registros importados",
-                        "imported": len(df),
+                        "message": f"Importação concluída: {len(rows)} registros importados, {skipped} ignorados",
+                        "imported": len(rows),
                         "updated": 0,
-                        "skipped": 0
+                        "skipped": skipped
                     }
                 else:
-                    # Atualizar apenas os existentes ou adicionar novos
-                    updated = 0
-                    added = 0
-                    skipped = 0
-
-                    for _, row in df.iterrows():
-                        eja_code = int(row['EJA CODE'])
-
-                        # Verificar se já existe
-                        self.cursor.execute("SELECT id FROM eja WHERE eja_code = ?", (eja_code,))
-                        existing = self.cursor.fetchone()
-
-                        if existing:
-                            # Atualizar existente
-                            self.cursor.execute("""
-                                UPDATE eja SET
-                                    title = ?,
-                                    new_classification = ?,
-                                    classification = ?,
-                                    updated_at = CURRENT_TIMESTAMP
-                                WHERE eja_code = ?
-                            """, (
-                                row['TITLE'],
-                                row['NEW CLASSIFICATION'] if 'NEW CLASSIFICATION' in df.columns else '',
-                                row['CLASSIFICATION'] if 'CLASSIFICATION' in df.columns else '',
-                                eja_code
-                            ))
-                            updated += 1
-                        else:
-                            # Adicionar novo
-                            self.cursor.execute("""
-                                INSERT INTO eja (eja_code, title, new_classification, classification)
-                                VALUES (?, ?, ?, ?)
-                            """, (
-                                eja_code,
-                                row['TITLE'],
-                                row['NEW CLASSIFICATION'] if 'NEW CLASSIFICATION' in df.columns else '',
-                                row['CLASSIFICATION'] if 'CLASSIFICATION' in df.columns else ''
-                            ))
-                            added += 1
+                    # Atualizar os existentes e adicionar novos (contagem por conjunto de códigos)
+                    existing_codes = pd.read_sql_query("SELECT eja_code FROM eja", self.conn)['eja_code']
+                    updated = int(records['eja_code'].isin(existing_codes).sum())
+                    added = len(records) - updated
+
+                    with closing(self.conn.cursor()) as cursor:
+                        cursor.executemany("""
+                            INSERT INTO eja (eja_code, title, new_classification, classification)
+                            VALUES (?, ?, ?, ?)
+                            ON CONFLICT(eja_code) DO UPDATE SET
+                                title = excluded.title,
+                                new_classification = excluded.new_classification,
+                                classification = excluded.classification,
+                                updated_at = CURRENT_TIMESTAMP
+                        """, rows)
 
                     result = {
                         "status": "success",
@@ -480,14 +639,11 @@ class LocalDatabaseHandler:
                         "skipped": skipped
                     }
 
-                # Commit para salvar as alterações
-                self.conn.commit()
-                return result
+                self._refresh_clients_summary()
 
-            except Exception:
-                # Rollback em caso de erro dentro da transação
-                self.conn.rollback()
-                raise
+            invalidate_dashboard_cache()
+            get_eja_catalog().invalidate()
+            return result
 
         except pd.errors.EmptyDataError:
             return {"error": "O arquivo CSV está vazio"}
@@ -518,18 +674,19 @@ class LocalDatabaseHandler:
                 file_path = os.path.join(export_dir, f"eja_export_{timestamp}.csv")
 
             # Consultar todos os EJAs
-            self.cursor.execute("""
-                SELECT
-                    id as 'Nº',
-                    eja_code as 'EJA CODE',
-                    title as 'TITLE',
-                    new_classification as 'NEW CLASSIFICATION',
-                    classification as 'CLASSIFICATION'
-                FROM eja
-                ORDER BY eja_code
-            """)
-
-            rows = self.cursor.fetchall()
+            with closing(self.conn.cursor()) as cursor:
+                cursor.execute("""
+                    SELECT
+                        id as 'Nº',
+                        eja_code as 'EJA CODE',
+                        title as 'TITLE',
+                        new_classification as 'NEW CLASSIFICATION',
+                        classification as 'CLASSIFICATION'
+                    FROM eja
+                    ORDER BY eja_code
+                """)
+
+                rows = cursor.fetchall()
 
             # Converter para DataFrame
             df = pd.DataFrame([dict(row) for row in rows])
@@ -0,0 +1,322 @@
+# data/migrations.py
+# Migrações versionadas do banco SQLite local (PRAGMA user_version)
+#
+# Cada migração é aplicada uma única vez, em ordem, dentro de uma transação.
+# As migrações são idempotentes (IF NOT EXISTS / verificação de colunas): bancos
+# criados antes do versionamento (user_version = 0) passam por todas sem erro.
+# Alterações de esquema novas entram como uma nova função no fim de MIGRATIONS.
+
+from utils.tracer import trace
+
+
+def _create_base_schema(conn):
+    """Tabelas originais do dashboard (antes em LocalDatabaseHandler.create_tables)."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS eja (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        eja_code INTEGER NOT NULL UNIQUE,
+        title TEXT NOT NULL,
+        new_classification TEXT,
+        classification TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS tracks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ponto TEXT,
+        pista TEXT,
+        track TEXT
+    )
+    ''')
+
+    # Utilization(%)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS usage_percentage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        value REAL NOT NULL
+    )
+    ''')
+
+    # Tracks Availability(%)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS tracks_availability (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        value REAL NOT NULL
+    )
+    ''')
+
+    # Utilização semanal por cliente
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS clients_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        week_number INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        client_name TEXT NOT NULL,
+        classification TEXT NOT NULL,
+        hours REAL NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        entry_time TEXT NOT NULL,
+        exit_time TEXT NOT NULL,
+        UNIQUE (client_name, entry_time, exit_time) ON CONFLICT IGNORE
+    )
+    ''')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_eja_code ON eja (eja_code)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_eja_title ON eja (title)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_eja_class ON eja (new_classification)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_track_pista ON tracks (pista)')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_week ON clients_usage (week_number, year)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_date ON clients_usage (start_date, end_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_client ON clients_usage (client_name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_class ON clients_usage (classification)')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_usage_unique '
+                 'ON clients_usage (client_name, entry_time, exit_time)')
+
+
+def _create_access_mirror(conn):
+    """Espelho dos eventos da sp_VehicleAccessReport, estado da sincronização e cubo de utilização."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS access_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vehicle TEXT NOT NULL DEFAULT '',
+        locality_name TEXT NOT NULL DEFAULT '',
+        entry_time TEXT NOT NULL,
+        exit_time TEXT,
+        vehicle_department TEXT,
+        vehicle_company TEXT,
+        eja INTEGER,
+        stay_time TEXT,
+        synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (vehicle, locality_name, entry_time)
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_access_events_entry ON access_events (entry_time)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_access_events_exit ON access_events (exit_time)')
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS access_sync_state (
+        name TEXT PRIMARY KEY,
+        coverage_start TEXT NOT NULL,
+        synced_until TEXT NOT NULL,
+        watermark TEXT,
+        last_sync TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS usage_cube (
+        day TEXT NOT NULL,
+        eja INTEGER,
+        locality_name TEXT,
+        vehicle_department TEXT,
+        vehicle TEXT,
+        vehicle_company TEXT,
+        has_exit INTEGER NOT NULL,
+        minutes INTEGER NOT NULL,
+        events INTEGER NOT NULL,
+        first_entry TEXT
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_usage_cube_day ON usage_cube (day)')
+
+
+def _create_monthly_usage(conn):
+    """Totais mensais fechados (YTD e 12 meses)."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS monthly_usage (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        minutes INTEGER NOT NULL,
+        events INTEGER NOT NULL,
+        closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (year, month)
+    )
+    ''')
+
+
+def _add_clients_usage_start_day(conn):
+    """
+    clients_usage.start_day: início da semana como inteiro (dias desde
+    1970-01-01), mantido por trigger, com índices de cobertura por período.
+    """
+    start_day = "CAST(strftime('%s', {column}) AS INTEGER) / 86400"
+
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(clients_usage)")}
+    if 'start_day' not in columns:
+        conn.execute("ALTER TABLE clients_usage ADD COLUMN start_day INTEGER")
+        conn.execute(f"UPDATE clients_usage SET start_day = {start_day.format(column='start_date')}")
+
+    new_start_day = start_day.format(column='NEW.start_date')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_clients_usage_start_day_insert
+    AFTER INSERT ON clients_usage
+    BEGIN
+        UPDATE clients_usage SET start_day = {new_start_day} WHERE id = NEW.id;
+    END
+    ''')
+    conn.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_clients_usage_start_day_update
+    AFTER UPDATE OF start_date ON clients_usage
+    BEGIN
+        UPDATE clients_usage SET start_day = {new_start_day} WHERE id = NEW.id;
+    END
+    ''')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_start_day '
+                 'ON clients_usage (start_day, classification, hours)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_start_week '
+                 'ON clients_usage (start_day, year, week_number)')
+
+
+def _create_clients_usage_summary(conn):
+    """Resumo de clients_usage por classificação e semana (mantido por data/clients_summary.py)."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS clients_usage_summary (
+        classification TEXT NOT NULL,
+        start_day INTEGER,
+        year INTEGER,
+        month INTEGER,
+        minutes REAL NOT NULL,
+        records INTEGER NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_summary_day '
+                 'ON clients_usage_summary (start_day, classification, minutes, records)')
+
+    conn.execute("DELETE FROM clients_usage_summary")
+    conn.execute('''
+    INSERT INTO clients_usage_summary (classification, start_day, year, month, minutes, records)
+    SELECT
+        e.new_classification,
+        c.start_day,
+        CAST(strftime('%Y', c.start_day * 86400, 'unixepoch') AS INTEGER),
+        CAST(strftime('%m', c.start_day * 86400, 'unixepoch') AS INTEGER),
+        SUM(c.hours),
+        COUNT(*)
+    FROM clients_usage c
+    INNER JOIN eja e ON c.classification = e.eja_code
+    WHERE e.new_classification IS NOT NULL
+    AND e.new_classification != ''
+    GROUP BY e.new_classification, c.start_day
+    ''')
+
+
+def _create_ingestion_state(conn):
+    """Checkpoint das cargas de clients_usage por intervalo (uma linha por carga)."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS ingestion_state (
+        name TEXT PRIMARY KEY,
+        range_start TEXT NOT NULL,
+        range_end TEXT NOT NULL,
+        next_week TEXT NOT NULL,
+        weeks_done INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+def _create_scheduled_jobs(conn):
+    """Estado dos jobs agendados (data/scheduler.py), com a concessão (lease) de execução."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS scheduled_jobs (
+        name TEXT PRIMARY KEY,
+        schedule TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'idle',
+        next_run TEXT NOT NULL,
+        last_run TEXT,
+        last_success TEXT,
+        last_error TEXT,
+        last_duration REAL,
+        run_count INTEGER NOT NULL DEFAULT 0,
+        lease_owner TEXT,
+        lease_until TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+
+def _add_usage_cube_indexes(conn):
+    """
+    Índices do cubo de utilização por período: cobertura dos totais diários
+    (query_daily_totals) e busca por EJA no período. O índice só por `day`
+    fica redundante (prefixo de ambos) e é removido.
+    """
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_usage_cube_day_totals '
+                 'ON usage_cube (day, has_exit, minutes, events)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_usage_cube_day_eja ON usage_cube (day, eja)')
+    conn.execute('DROP INDEX IF EXISTS idx_usage_cube_day')
+
+
+# (versão, descrição, tabelas reindexadas após a migração, função)
+MIGRATIONS = [
+    (1, "Esquema base", [], _create_base_schema),
+    (2, "Espelho de acessos e cubo de utilização", [], _create_access_mirror),
+    (3, "Totais mensais", [], _create_monthly_usage),
+    (4, "clients_usage.start_day e índices de cobertura", ['clients_usage'], _add_clients_usage_start_day),
+    (5, "Resumo de clients_usage por classificação", [], _create_clients_usage_summary),
+    (6, "Checkpoint das cargas por intervalo", [], _create_ingestion_state),
+    (7, "Jobs agendados", [], _create_scheduled_jobs),
+    (8, "Índices de cobertura do cubo de utilização", [], _add_usage_cube_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(conn):
+    """
+    Aplica as migrações pendentes, cada uma em sua transação (BEGIN IMMEDIATE:
+    outro processo iniciando ao mesmo tempo espera e encontra a versão já
+    atualizada). Ao final, reconstrói os índices das tabelas alteradas e
+    atualiza as estatísticas do planejador (ANALYZE).
+
+    Args:
+        conn (sqlite3.Connection): Conexão com o banco local
+
+    Returns:
+        int: Versão do esquema após as migrações
+    """
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+
+    if conn.in_transaction:
+        conn.commit()
+
+    applied = []
+    for version, description, tables, migrate in MIGRATIONS:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            migrate(conn)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, tables))
+        trace(f"Migração {version} aplicada: {description}", color="green")
+
+    if applied:
+        for table in dict.fromkeys(table for _, tables in applied for table in tables):
+            conn.execute(f'REINDEX {table}')
+        conn.execute('ANALYZE')
+        conn.commit()
+        trace(f"Esquema do SQLite na versão {SCHEMA_VERSION}", color="green")
+
+    return get_schema_version(conn)
@@ -0,0 +1,296 @@
+# data/monthly_usage.py
+# Totais mensais persistidos (um registro por mês fechado): base do YTD e da janela de 12 meses
+
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from utils.tracer import trace, report_exception
+from utils.durations import format_minutes
+from data.local_db_handler import get_db_handler
+from data.access_mirror import OPEN_EVENT_MAX_AGE_DAYS, get_access_mirror, resync_start
+from data.result_cache import invalidate_dashboard_cache
+from data.usage_cube import USAGE_CUBE_STATE, read_usage_cube, query_daily_totals
+
+
+# Um mês só é gravado após esse prazo do seu término: até lá o espelho
+# ainda re-consulta eventos abertos (saídas tardias) do mês
+MONTH_CLOSE_DELAY = timedelta(days=OPEN_EVENT_MAX_AGE_DAYS)
+
+# Meses fechados mantidos pela execução em segundo plano (YTD + 12 meses)
+MONTHLY_USAGE_BACKFILL_MONTHS = 13
+
+
+def _shift_month(year, month, delta):
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def _month_period(year, month):
+    """Período do mês ('YYYY-MM-DD', 'YYYY-MM-DD')."""
+    next_year, next_month = _shift_month(year, month, 1)
+    last_day = datetime(next_year, next_month, 1) - timedelta(days=1)
+    return f"{year}-{month:02d}-01", last_day.strftime('%Y-%m-%d')
+
+
+class MonthlyUsageStore:
+    """
+    Guarda no SQLite o total de minutos de cada mês fechado, calculado uma
+    única vez a partir do cubo de utilização. YTD e 12 meses passam a ser
+    a soma de poucos registros, sem reconsultar os eventos.
+
+    Meses ainda não fechados têm os totais diários mantidos em memória e
+    atualizados de forma incremental conforme o espelho avança.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        # {(ano, mês): (estado do espelho na leitura, {dia: (minutos, eventos)})}
+        self._open_months = {}
+
+    @staticmethod
+    def is_closed(year, month, now=None):
+        """Indica se o mês já pode ser gravado (terminou há mais de MONTH_CLOSE_DELAY)."""
+        now = now or datetime.now()
+        next_year, next_month = _shift_month(year, month, 1)
+        return datetime(next_year, next_month, 1) + MONTH_CLOSE_DELAY <= now
+
+    def get_minutes(self, months):
+        """
+        Lê os totais gravados.
+
+        Args:
+            months (iterable): Pares (ano, mês)
+
+        Returns:
+            dict: {(ano, mês): minutos} apenas para os meses gravados
+        """
+        months = sorted(set(months))
+        if not months:
+            return {}
+
+        first, last = months[0], months[-1]
+        db_handler = get_db_handler()
+        try:
+            with closing(db_handler.conn.cursor()) as cursor:
+                cursor.execute("""
+                    SELECT year, month, minutes FROM monthly_usage
+                    WHERE (year * 100 + month) BETWEEN ? AND ?
+                """, (first[0] * 100 + first[1], last[0] * 100 + last[1]))
+                rows = cursor.fetchall()
+        finally:
+            db_handler.close()
+
+        wanted = set(months)
+        return {(row[0], row[1]): row[2] for row in rows if (row[0], row[1]) in wanted}
+
+    def _compute_month(self, year, month, allow_remote=False):
+        """Total (minutos, eventos) do mês a partir do cubo; None se indisponível."""
+        start_date, end_date = _month_period(year, month)
+        usage_cube = read_usage_cube(start_date, end_date)
+        if usage_cube is None and allow_remote:
+            from data.database import fetch_usage_cube
+            usage_cube = fetch_usage_cube(start_date, end_date)
+        if usage_cube is None:
+            return None
+
+        # Mesmo critério do total do dashboard: apenas eventos com VehicleExitTime
+        closed = usage_cube[usage_cube['HasExit'].to_numpy(dtype=bool)]
+        return int(closed['minutes'].sum()), int(closed['events'].sum())
+
+    def _open_month_total(self, year, month):
+        """
+        Minutos de um mês ainda não fechado. Os totais diários ficam em memória:
+        enquanto o espelho não sincroniza, nada é relido; depois de uma
+        sincronização, apenas os dias que ela pode ter regravado (resync_start)
+        são relidos do cubo.
+
+        Returns:
+            int: Minutos do mês, ou None se o cubo local não cobre o mês
+        """
+        start_date, end_date = _month_period(year, month)
+        mirror = get_access_mirror()
+        state = mirror.get_state()
+        if state is None or not mirror.covers(start_date, end_date, state=mirror.get_state(USAGE_CUBE_STATE)):
+            return None
+
+        with self._open_lock:
+            cached = self._open_months.get((year, month))
+            if cached is not None and cached[0] == state:
+                return sum(minutes for minutes, _ in cached[1].values())
+
+            refresh_from = start_date
+            days = {}
+            if cached is not None:
+                refresh_from = max(start_date, resync_start(cached[0]).strftime('%Y-%m-%d'))
+                days = {day: totals for day, totals in cached[1].items() if day < refresh_from}
+
+            db_handler = get_db_handler()
+            try:
+                days.update(query_daily_totals(db_handler.conn, refresh_from, end_date))
+            finally:
+                db_handler.close()
+
+            self._open_months[(year, month)] = (state, days)
+            return sum(minutes for minutes, _ in days.values())
+
+    def close_month(self, year, month, allow_remote=False):
+        """
+        Calcula o total do mês e o grava se o mês estiver fechado.
+
+        Returns:
+            int: Minutos do mês, ou None se o cubo do mês não estiver disponível
+        """
+        result = self._compute_month(year, month, allow_remote=allow_remote)
+        if result is None:
+            return None
+
+        minutes, events = result
+        if self.is_closed(year, month):
+            db_handler = get_db_handler()
+            try:
+                with db_handler.transaction():
+                    db_handler.conn.execute("""
+                        INSERT INTO monthly_usage (year, month, minutes, events, closed_at)
+                        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                        ON CONFLICT(year, month) DO UPDATE SET
+                            minutes = excluded.minutes,
+                            events = excluded.events,
+                            closed_at = CURRENT_TIMESTAMP
+                    """, (year, month, minutes, events))
+            finally:
+                db_handler.close()
+        return minutes
+
+    def month_totals(self, months):
+        """
+        Minutos de cada mês: gravados; meses fechados ainda sem registro são
+        calculados do cubo local e gravados (uma única vez); meses abertos vêm
+        dos totais incrementais em memória. Meses sem cubo local ficam de fora
+        (preenchidos pela execução em segundo plano).
+
+        Returns:
+            tuple: ({(ano, mês): minutos}, lista de (ano, mês) indisponíveis)
+        """
+        months = set(months)
+        totals = self.get_minutes(months)
+
+        unavailable = []
+        for year, month in sorted(months - set(totals)):
+            if self.is_closed(year, month):
+                minutes = self.close_month(year, month)
+                with self._open_lock:
+                    self._open_months.pop((year, month), None)
+            else:
+                minutes = self._open_month_total(year, month)
+
+            if minutes is not None:
+                totals[(year, month)] = minutes
+            else:
+                unavailable.append((year, month))
+        return totals, unavailable
+
+    def backfill(self, count=MONTHLY_USAGE_BACKFILL_MONTHS, now=None):
+        """
+        Grava os `count` últimos meses fechados que ainda não têm registro
+        (consulta a SP quando o cubo local não cobre o mês).
+
+        Returns:
+            dict: Quantidade de meses gravados
+        """
+        with self._lock:
+            now = now or datetime.now()
+            year, month = now.year, now.month
+            months = []
+            while len(months) < count:
+                year, month = _shift_month(year, month, -1)
+                if self.is_closed(year, month, now=now):
+                    months.append((year, month))
+
+            stored = self.get_minutes(months)
+            written = 0
+            for year, month in sorted(set(months) - set(stored)):
+                try:
+                    if self.close_month(year, month, allow_remote=True) is not None:
+                        written += 1
+                except Exception as e:
+                    report_exception(e)
+                    trace(f"Erro ao gravar total de {year}-{month:02d}: {str(e)}", color="red")
+
+            if written:
+                # Agregados em cache podem ter sido montados com YTD parcial
+                invalidate_dashboard_cache()
+                trace(f"Totais mensais gravados: {written} meses", color="green")
+            return {"status": "success", "months_written": written}
+
+
+def _average_percentage(table, year, last_month):
+    """Média dos percentuais mensais gravados (usage_percentage / tracks_availability) no ano até o mês."""
+    db_handler = get_db_handler()
+    try:
+        with closing(db_handler.conn.cursor()) as cursor:
+            cursor.execute(f"SELECT AVG(value) FROM {table} WHERE year = ? AND month <= ?", (year, last_month))
+            value = cursor.fetchone()[0]
+    except Exception as e:
+        report_exception(e)
+        value = None
+    finally:
+        db_handler.close()
+    return f"{value:.1f}%" if value is not None else "0%"
+
+
+def get_period_totals(start_date, period_minutes):
+    """
+    YTD e 12 meses do período selecionado: soma dos meses fechados
+    gravados mais os minutos do próprio período.
+
+    Args:
+        start_date (str): Início do período ('YYYY-MM-DD...')
+        period_minutes (int): Minutos do período selecionado
+
+    Returns:
+        dict: total_hours_ytd, total_hours_12m, ytd_utilization_percentage,
+              ytd_availability_percentage, e ytd_partial / rolling_partial
+              (True se algum mês não estava disponível localmente)
+    """
+    start = datetime.strptime(start_date[:10], '%Y-%m-%d')
+    ytd_months = [(start.year, month) for month in range(1, start.month)]
+    rolling_months = [_shift_month(start.year, start.month, -offset) for offset in range(11, 0, -1)]
+
+    totals, unavailable = get_monthly_usage_store().month_totals(ytd_months + rolling_months)
+    if unavailable:
+        trace(f"Totais indisponíveis localmente: {', '.join(f'{y}-{m:02d}' for y, m in unavailable)}",
+              color="yellow")
+    ytd_minutes = period_minutes + sum(totals.get(month, 0) for month in ytd_months)
+    rolling_minutes = period_minutes + sum(totals.get(month, 0) for month in rolling_months)
+
+    return {
+        'total_hours_ytd': format_minutes(ytd_minutes),
+        'total_hours_12m': format_minutes(rolling_minutes),
+        'total_minutes_ytd': ytd_minutes,
+        'total_minutes_12m': rolling_minutes,
+        'ytd_utilization_percentage': _average_percentage('usage_percentage', start.year, start.month),
+        'ytd_availability_percentage': _average_percentage('tracks_availability', start.year, start.month),
+        'ytd_partial': any(month in unavailable for month in ytd_months),
+        'rolling_partial': any(month in unavailable for month in rolling_months),
+    }
+
+
+_monthly_usage_store = None
+_monthly_usage_store_lock = threading.Lock()
+
+
+def get_monthly_usage_store():
+    """Retorna a instância única dos totais mensais."""
+    global _monthly_usage_store
+    if _monthly_usage_store is None:
+        with _monthly_usage_store_lock:
+            if _monthly_usage_store is None:
+                _monthly_usage_store = MonthlyUsageStore()
+    return _monthly_usage_store
+
+
+def backfill_monthly_usage():
+    """Grava os meses fechados pendentes (usado na inicialização e na execução noturna)."""
+    return get_monthly_usage_store().backfill()
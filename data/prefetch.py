@@ -0,0 +1,109 @@
+# data/prefetch.py
+# Aquecimento do cache do dashboard para os meses mais acessados
+
+import os
+import time
+from datetime import datetime, timedelta
+
+from utils.tracer import trace, report_exception
+
+
+PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', 'true').lower() == 'true'
+# Horário (HH:MM) da execução noturna
+PREFETCH_NIGHTLY_TIME = os.environ.get('PREFETCH_NIGHTLY_TIME', '03:00')
+
+
+def _month_period(year, month):
+    """Retorna o período do mês no formato do seletor de meses ('YYYY-MM-DD', 'YYYY-MM-DD')."""
+    first_day = datetime(year, month, 1)
+    next_month = datetime(year + (month // 12), month % 12 + 1, 1)
+    last_day = (next_month - timedelta(days=1)).day
+    return first_day.strftime('%Y-%m-%d'), f"{year}-{month:02d}-{last_day}"
+
+
+def get_prefetch_periods(reference=None):
+    """
+    Meses aquecidos: mês atual, mês anterior e o mesmo mês do ano anterior.
+
+    Returns:
+        list: Pares (start_date, end_date)
+    """
+    reference = reference or datetime.now()
+    previous = reference.replace(day=1) - timedelta(days=1)
+
+    return [
+        _month_period(reference.year, reference.month),
+        _month_period(previous.year, previous.month),
+        _month_period(reference.year - 1, reference.month),
+    ]
+
+
+def prefetch_dashboard_data(periods=None):
+    """
+    Calcula os agregados do dashboard dos períodos e os deixa no cache de resultados.
+
+    Returns:
+        dict: Quantidade de períodos aquecidos
+    """
+    from data.database import load_dashboard_data
+
+    periods = periods or get_prefetch_periods()
+    warmed = 0
+    for start_date, end_date in periods:
+        started = time.monotonic()
+        try:
+            load_dashboard_data(start_date, end_date)
+            warmed += 1
+            trace(f"Prefetch {start_date} até {end_date} concluído em {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            report_exception(e)
+            trace(f"Erro no prefetch de {start_date} até {end_date}: {str(e)}", color="red")
+
+    return {"status": "success", "periods_warmed": warmed}
+
+
+def _backfill_monthly_usage():
+    try:
+        from data.monthly_usage import backfill_monthly_usage
+        backfill_monthly_usage()
+    except Exception as e:
+        report_exception(e)
+
+
+def nightly_maintenance():
+    """
+    Job agendado (um processo por vez): grava os totais mensais fechados,
+    usados no YTD dos agregados. O espelho de acessos tem o próprio job
+    (access_mirror_sync).
+    """
+    _backfill_monthly_usage()
+
+
+def start_prefetch():
+    """
+    Agenda a manutenção noturna e o aquecimento do cache (na inicialização e,
+    depois, diariamente no horário configurado). O aquecimento roda em todos
+    os processos, pois o cache de resultados é de cada processo.
+
+    Ambos aguardam a sincronização do espelho de acessos (access_mirror_sync)
+    terminar: na inicialização, leem o espelho já atualizado em vez de
+    consultar a SP junto com a carga. Rodam na thread do agendador, com
+    prioridade de CPU reduzida.
+
+    Returns:
+        Job: O job de aquecimento (None se desativado)
+    """
+    if not PREFETCH_ENABLED:
+        return None
+
+    from data.scheduler import Job, schedule_job
+    from data.access_mirror import ACCESS_MIRROR_JOB_NAME
+
+    # Registrados nesta ordem: no mesmo processo, os totais mensais são gravados antes do aquecimento
+    schedule_job(Job('nightly_maintenance', nightly_maintenance, at=PREFETCH_NIGHTLY_TIME, run_on_start=True,
+                     after=ACCESS_MIRROR_JOB_NAME))
+    job = schedule_job(Job('dashboard_prefetch', prefetch_dashboard_data, at=PREFETCH_NIGHTLY_TIME,
+                           exclusive=False, run_on_start=True, after=ACCESS_MIRROR_JOB_NAME))
+    if job is not None:
+        trace(f"Prefetch do dashboard agendado (na inicialização e diariamente às {PREFETCH_NIGHTLY_TIME})")
+    return job
@@ -0,0 +1,152 @@
+# data/query_control.py
+# Cancelamento cooperativo e tempo limite das consultas disparadas por callbacks
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.tracer import trace
+
+
+# Tempo limite (segundos) das consultas interativas; 0 desativa
+DB_INTERACTIVE_TIMEOUT = float(os.environ.get('DB_INTERACTIVE_TIMEOUT', '60'))
+
+
+class QueryCancelled(Exception):
+    """Consulta cancelada (substituída por uma requisição mais nova ou tempo limite excedido)."""
+    pass
+
+
+class CancelToken:
+    """
+    Sinal de cancelamento compartilhado por todas as consultas de uma requisição.
+    Cursores registrados com `watch` são interrompidos (cursor.cancel) ao cancelar.
+    """
+
+    def __init__(self, timeout=None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._cursors = set()
+        self.reason = None
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set() or self.expired
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self):
+        """Segundos até o tempo limite, ou None se não houver limite."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason="cancelada"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            cursors = list(self._cursors)
+
+        for cursor in cursors:
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+
+    def check(self):
+        """Lança QueryCancelled se o token foi cancelado ou expirou."""
+        if self._event.is_set():
+            raise QueryCancelled(f"Consulta {self.reason}")
+        if self.expired:
+            raise QueryCancelled("Consulta excedeu o tempo limite")
+
+    def wait(self, timeout):
+        """Aguarda até `timeout` segundos pelo cancelamento; retorna True se cancelado."""
+        return self._event.wait(timeout)
+
+    @contextmanager
+    def watch(self, cursor):
+        """Registra o cursor para ser interrompido caso o token seja cancelado."""
+        with self._lock:
+            self._cursors.add(cursor)
+            cancelled = self._event.is_set()
+        try:
+            if cancelled:
+                self.check()
+            yield cursor
+        finally:
+            with self._lock:
+                self._cursors.discard(cursor)
+
+
+_active_tokens = {}
+_active_tokens_lock = threading.Lock()
+
+
+def _session_key(session_id):
+    """Identifica a sessão: id do navegador (dcc.Store) ou, na falta dele, o IP da requisição."""
+    if session_id:
+        return session_id
+    try:
+        from flask import request
+        return request.remote_addr
+    except Exception:
+        return None
+
+
+def supersede(session_id, output_id, timeout=None):
+    """
+    Cria o token da requisição atual de (sessão, saída), cancelando a anterior
+    que ainda estiver em andamento.
+    """
+    timeout = DB_INTERACTIVE_TIMEOUT if timeout is None else timeout
+    token = CancelToken(timeout=timeout)
+    session = _session_key(session_id)
+    if session is None:
+        return token
+
+    key = (session, output_id)
+    with _active_tokens_lock:
+        previous = _active_tokens.get(key)
+        _active_tokens[key] = token
+
+    if previous is not None:
+        trace(f"Consulta anterior de '{output_id}' substituída por uma nova requisição", color="yellow")
+        previous.cancel("substituída por uma nova requisição")
+    return token
+
+
+def release(session_id, output_id, token):
+    """Remove o token do registro se ele ainda for o ativo para (sessão, saída)."""
+    session = _session_key(session_id)
+    if session is None:
+        return
+    key = (session, output_id)
+    with _active_tokens_lock:
+        if _active_tokens.get(key) is token:
+            del _active_tokens[key]
+
+
+def active_interactive_queries():
+    """Quantidade de consultas interativas (callbacks) em andamento no processo."""
+    with _active_tokens_lock:
+        return sum(1 for token in _active_tokens.values() if not token.cancelled)
+
+
+@contextmanager
+def interactive_query(session_id, output_id, timeout=None):
+    """
+    Context manager para callbacks: fornece um CancelToken que substitui a
+    requisição anterior da mesma sessão para a mesma saída.
+    """
+    token = supersede(session_id, output_id, timeout=timeout)
+    try:
+        yield token
+    finally:
+        release(session_id, output_id, token)
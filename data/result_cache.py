@@ -0,0 +1,232 @@
+# data/result_cache.py
+# Cache de resultados compartilhado pelo processo (DataFrames das stored procedures)
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+
+from utils.tracer import trace
+from data.query_control import QueryCancelled
+
+
+# Orçamento de memória e TTL configuráveis via variáveis de ambiente
+RESULT_CACHE_MAX_MB = float(os.environ.get('RESULT_CACHE_MAX_MB', '512'))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '64'))
+RESULT_CACHE_CURRENT_TTL = float(os.environ.get('RESULT_CACHE_CURRENT_TTL', '120'))
+
+# Chaves dos agregados do dashboard: (DASHBOARD_CACHE_NAMESPACE, início, fim, versão do catálogo de EJAs)
+DASHBOARD_CACHE_NAMESPACE = 'dashboard'
+# Chaves do cubo de utilização: (USAGE_CUBE_CACHE_NAMESPACE, início, fim)
+USAGE_CUBE_CACHE_NAMESPACE = 'usage_cube'
+
+
+def _estimate_size(value):
+    """Estima o tamanho em bytes de um valor armazenado no cache."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(_estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_estimate_size(item) for item in value.values())
+    return 256
+
+
+def ttl_for_period(end_date):
+    """
+    Define o TTL de um período: meses fechados não expiram (None),
+    o período que inclui o dia de hoje recebe um TTL curto.
+
+    Args:
+        end_date (str | datetime): Fim do período ('YYYY-MM-DD...' ou datetime)
+    """
+    try:
+        if isinstance(end_date, str):
+            end_dt = datetime.strptime(end_date[:10], '%Y-%m-%d')
+        else:
+            end_dt = end_date
+        if end_dt.date() < datetime.now().date():
+            return None
+    except (ValueError, TypeError, AttributeError):
+        pass
+    return RESULT_CACHE_CURRENT_TTL
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'size', 'expires_at')
+
+    def __init__(self, value, size, expires_at):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class _Flight:
+    """Carga em andamento para uma chave (single-flight)."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """
+    Cache LRU com TTL, orçamento de memória e de-duplicação de cargas
+    concorrentes (single-flight). Todos os chamadores de uma mesma chave
+    recebem o mesmo objeto, que deve ser tratado como somente leitura.
+    """
+
+    def __init__(self, max_bytes=None, max_entries=None):
+        self.max_bytes = int((max_bytes if max_bytes is not None else RESULT_CACHE_MAX_MB * 1024 * 1024))
+        self.max_entries = max_entries if max_entries is not None else RESULT_CACHE_MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _evict_expired(self, now):
+        expired = [key for key, entry in self._entries.items()
+                   if entry.expires_at is not None and entry.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _store(self, key, value, ttl):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            trace(f"Resultado de {size / 1048576:.1f} MB excede o orçamento do cache; não armazenado: {key}", color="yellow")
+            return
+
+        now = time.monotonic()
+        self._remove(key)
+        self._evict_expired(now)
+
+        # Evicção LRU até caber no orçamento
+        while self._entries and (self._bytes + size > self.max_bytes or len(self._entries) >= self.max_entries):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+
+        expires_at = now + ttl if ttl is not None else None
+        self._entries[key] = _CacheEntry(value, size, expires_at)
+        self._bytes += size
+
+    def get(self, key):
+        """Retorna o valor em cache ou None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def put(self, key, value, ttl=None):
+        """Armazena um valor com TTL opcional (None = sem expiração)."""
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_load(self, key, loader, ttl=None, cancel_token=None):
+        """
+        Retorna o valor da chave, carregando-o com `loader()` se necessário.
+        Chamadas concorrentes para a mesma chave aguardam uma única carga.
+        Valores None (falha na carga) não são armazenados.
+
+        Se a carga em andamento for cancelada por quem a iniciou, os demais
+        chamadores tentam novamente (um deles assume a carga). `cancel_token`
+        interrompe a espera do próprio chamador.
+        """
+        while True:
+            if cancel_token is not None:
+                cancel_token.check()
+
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and (entry.expires_at is None or entry.expires_at > time.monotonic()):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+
+                flight = self._flights.get(key)
+                is_leader = flight is None
+                if is_leader:
+                    flight = _Flight()
+                    self._flights[key] = flight
+                    self.misses += 1
+
+            if not is_leader:
+                if cancel_token is None:
+                    flight.event.wait()
+                else:
+                    while not flight.event.wait(0.1):
+                        cancel_token.check()
+
+                if isinstance(flight.error, QueryCancelled):
+                    continue
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+
+            try:
+                value = loader()
+                flight.value = value
+                with self._lock:
+                    if value is not None:
+                        self._store(key, value, ttl)
+                return value
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+                flight.event.set()
+
+    def invalidate(self, predicate=None):
+        """Remove entradas; sem predicado, limpa todo o cache."""
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for key in [k for k in self._entries if predicate(k)]:
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Retorna a instância única do cache de resultados do processo."""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache()
+    return _result_cache
+
+
+def invalidate_dashboard_cache():
+    """Descarta os agregados do dashboard (após alterações nas tabelas locais)."""
+    get_result_cache().invalidate(lambda key: key[0] == DASHBOARD_CACHE_NAMESPACE)
@@ -0,0 +1,369 @@
+# data/scheduler.py
+# Agendador de jobs em segundo plano (carga de clients_usage, manutenção e aquecimento do cache)
+
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from utils.tracer import trace, report_exception
+from utils.helpers import lower_thread_priority
+from data.local_db_handler import get_db_handler
+from data.query_control import active_interactive_queries
+
+
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+# Intervalo (segundos) entre verificações de jobs pendentes
+SCHEDULER_POLL_INTERVAL = float(os.environ.get('SCHEDULER_POLL_INTERVAL', '30'))
+# Tempo máximo (segundos) que um job pendente aguarda o fim das consultas interativas
+SCHEDULER_MAX_DEFER = float(os.environ.get('SCHEDULER_MAX_DEFER', '300'))
+# Nova tentativa (segundos) após falha, se antes da próxima execução normal
+SCHEDULER_RETRY_DELAY = float(os.environ.get('SCHEDULER_RETRY_DELAY', '900'))
+# Duração (segundos) da concessão de execução; renovada enquanto o job roda
+SCHEDULER_LEASE_SECONDS = float(os.environ.get('SCHEDULER_LEASE_SECONDS', '600'))
+
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _format_time(value):
+    return value.strftime(_TIME_FORMAT) if value else None
+
+
+def _parse_time(value):
+    return datetime.strptime(value, _TIME_FORMAT) if value else None
+
+
+class Job:
+    """
+    Tarefa periódica: a cada `every` segundos, ou diariamente no horário `at`
+    ('HH:MM'), opcionalmente apenas no dia da semana `weekday` (0 = segunda).
+
+    Jobs exclusivos (padrão) têm o estado gravado em scheduled_jobs e rodam
+    em um único processo por vez (concessão no SQLite). Jobs não exclusivos
+    rodam em todos os processos (ex.: aquecimento do cache do próprio
+    processo) e mantêm o estado em memória.
+
+    Attributes:
+        catch_up (bool): A função recebe o início da última execução bem-sucedida
+                         (None na primeira), para cobrir o período perdido
+        run_on_start (bool): Executar assim que registrado (jobs exclusivos: apenas
+                             na primeira vez; depois vale o estado gravado)
+        after (str): Job exclusivo registrado no mesmo agendador que precisa ter
+                     executado ao menos uma vez (em qualquer processo), e não estar
+                     em andamento, antes deste rodar
+    """
+
+    def __init__(self, name, func, every=None, at=None, weekday=None, exclusive=True,
+                 catch_up=False, run_on_start=False, lease=SCHEDULER_LEASE_SECONDS, after=None):
+        if (every is None) == (at is None):
+            raise ValueError("Informe 'every' ou 'at'")
+        self.name = name
+        self.func = func
+        self.every = every
+        self.at = at
+        self.weekday = weekday
+        self.exclusive = exclusive
+        self.catch_up = catch_up
+        self.run_on_start = run_on_start
+        self.lease = lease
+        self.after = after
+
+    @property
+    def schedule(self):
+        """Descrição do agendamento (gravada; uma alteração reprograma o job)."""
+        if self.every is not None:
+            return f"every {self.every:g}s"
+        if self.weekday is not None:
+            return f"weekday {self.weekday} at {self.at}"
+        return f"daily at {self.at}"
+
+    def next_after(self, now):
+        """Próxima execução estritamente depois de `now`."""
+        if self.every is not None:
+            return now + timedelta(seconds=self.every)
+
+        hour, minute = (int(part) for part in self.at.split(':'))
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if self.weekday is None:
+            return next_run if next_run > now else next_run + timedelta(days=1)
+
+        next_run += timedelta(days=(self.weekday - now.weekday()) % 7)
+        return next_run if next_run > now else next_run + timedelta(weeks=1)
+
+
+class JobScheduler:
+    """
+    Executa os jobs registrados em uma thread de baixa prioridade.
+
+    - Estado persistido (status, última execução, próxima execução) em scheduled_jobs.
+    - Execuções perdidas durante uma parada: o job vencido roda uma única vez
+      na inicialização (jobs com catch_up recebem a última execução bem-sucedida).
+    - Vários processos: a execução exige a concessão do job, obtida com um
+      UPDATE atômico no SQLite; a concessão é renovada enquanto o job roda e
+      expira se o processo morrer.
+    - Prioridade: a thread roda com prioridade mínima (nice no Linux,
+      THREAD_PRIORITY_LOWEST no Windows) e um job vencido aguarda (até
+      SCHEDULER_MAX_DEFER) enquanto houver consultas interativas em andamento.
+      As consultas interativas são contadas no próprio processo: um agendador
+      em processo separado (scripts/schedule_weekly_process.py) não enxerga as
+      do dashboard e não adia os jobs; nesse caso vale apenas a prioridade.
+    """
+
+    def __init__(self, poll_interval=SCHEDULER_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._jobs = {}
+        self._local_next = {}
+        self._deferred_since = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._db_handler = get_db_handler()
+
+    @property
+    def conn(self):
+        return self._db_handler.conn
+
+    # =================== Registro ===================
+
+    def add_job(self, job):
+        """Registra (ou substitui) um job; jobs exclusivos ganham sua linha em scheduled_jobs."""
+        now = datetime.now()
+        first_run = now if job.run_on_start else job.next_after(now)
+
+        if job.exclusive:
+            # Linha existente com o mesmo agendamento mantém a próxima execução (execução perdida)
+            with self._db_handler.transaction():
+                self.conn.execute("""
+                    INSERT INTO scheduled_jobs (name, schedule, next_run) VALUES (?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET
+                        schedule = excluded.schedule,
+                        next_run = excluded.next_run,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE scheduled_jobs.schedule != excluded.schedule
+                """, (job.name, job.schedule, _format_time(first_run)))
+
+        with self._lock:
+            self._jobs[job.name] = job
+            if not job.exclusive:
+                self._local_next[job.name] = first_run
+
+        trace(f"Job '{job.name}' registrado ({job.schedule})")
+        return job
+
+    def get_job_states(self):
+        """Estado gravado dos jobs exclusivos (lista de dicts)."""
+        rows = self.conn.execute("SELECT * FROM scheduled_jobs ORDER BY name").fetchall()
+        return [dict(row) for row in rows]
+
+    # =================== Execução ===================
+
+    def _dependency_done(self, job, now):
+        """Indica se o job de que `job` depende (job.after) já executou e não está em andamento."""
+        with self._lock:
+            registered = job.after in self._jobs
+        if job.after is None or not registered:
+            return True
+        row = self.conn.execute("SELECT last_run, lease_until FROM scheduled_jobs WHERE name = ?",
+                                (job.after,)).fetchone()
+        if row is None:
+            return True
+        running = row['lease_until'] is not None and _parse_time(row['lease_until']) > now
+        return row['last_run'] is not None and not running
+
+    def _is_due(self, job, now):
+        if not job.exclusive:
+            due = self._local_next[job.name] <= now
+        else:
+            row = self.conn.execute("SELECT next_run FROM scheduled_jobs WHERE name = ?", (job.name,)).fetchone()
+            due = row is not None and _parse_time(row['next_run']) <= now
+        return due and self._dependency_done(job, now)
+
+    def _acquire(self, job, now, force=False):
+        """Obtém a concessão do job (UPDATE atômico); False se outro processo a detém ou não está vencido."""
+        due = "" if force else "AND next_run <= ?"
+        params = [self.owner, _format_time(now + timedelta(seconds=job.lease)), job.name]
+        if not force:
+            params.append(_format_time(now))
+        params += [_format_time(now), self.owner]
+
+        with self._db_handler.transaction():
+            cursor = self.conn.execute(f"""
+                UPDATE scheduled_jobs
+                SET status = 'running', lease_owner = ?, lease_until = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE name = ? {due}
+                AND (lease_until IS NULL OR lease_until < ? OR lease_owner = ?)
+            """, params)
+        return cursor.rowcount == 1
+
+    def _keep_lease(self, job, finished):
+        """Renova a concessão periodicamente até `finished` (thread auxiliar)."""
+        interval = max(job.lease / 3, 1)
+        while not finished.wait(interval):
+            try:
+                conn = self._db_handler.conn
+                with self._db_handler.transaction():
+                    conn.execute(
+                        "UPDATE scheduled_jobs SET lease_until = ? WHERE name = ? AND lease_owner = ?",
+                        (_format_time(datetime.now() + timedelta(seconds=job.lease)), job.name, self.owner)
+                    )
+            except Exception as e:
+                report_exception(e)
+
+    def _finish(self, job, started, error):
+        now = datetime.now()
+        next_run = job.next_after(now)
+        if error is not None:
+            next_run = min(next_run, now + timedelta(seconds=SCHEDULER_RETRY_DELAY))
+
+        if not job.exclusive:
+            with self._lock:
+                self._local_next[job.name] = next_run
+            return
+
+        with self._db_handler.transaction():
+            self.conn.execute("""
+                UPDATE scheduled_jobs SET
+                    status = ?,
+                    next_run = ?,
+                    last_run = ?,
+                    last_success = CASE WHEN ? IS NULL THEN ? ELSE last_success END,
+                    last_error = ?,
+                    last_duration = ?,
+                    run_count = run_count + 1,
+                    lease_owner = NULL,
+                    lease_until = NULL,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE name = ? AND lease_owner = ?
+            """, (
+                'error' if error is not None else 'success', _format_time(next_run), _format_time(started),
+                error, _format_time(started), error, (now - started).total_seconds(), job.name, self.owner
+            ))
+
+    def _execute(self, job, force=False):
+        """Executa o job se obtiver a concessão. Returns: True se executou."""
+        started = datetime.now()
+        last_success = None
+
+        if job.exclusive:
+            if not self._acquire(job, started, force=force):
+                return False
+            row = self.conn.execute("SELECT last_success FROM scheduled_jobs WHERE name = ?",
+                                    (job.name,)).fetchone()
+            last_success = _parse_time(row['last_success'])
+
+        trace(f"Job '{job.name}' iniciado")
+        finished = threading.Event()
+        if job.exclusive:
+            threading.Thread(target=self._keep_lease, args=(job, finished),
+                             name=f'job-lease-{job.name}', daemon=True).start()
+
+        error = None
+        try:
+            if job.catch_up:
+                job.func(last_success)
+            else:
+                job.func()
+        except Exception as e:
+            report_exception(e)
+            error = str(e) or type(e).__name__
+            if self.conn.in_transaction:
+                self.conn.rollback()
+        finally:
+            finished.set()
+
+        self._finish(job, started, error)
+        elapsed = (datetime.now() - started).total_seconds()
+        if error is None:
+            trace(f"Job '{job.name}' concluído em {elapsed:.1f}s", color="green")
+        else:
+            trace(f"Job '{job.name}' falhou após {elapsed:.1f}s: {error}", color="red")
+        return True
+
+    def run_now(self, name):
+        """Executa um job imediatamente, fora do agendamento (respeita a concessão)."""
+        with self._lock:
+            job = self._jobs[name]
+        return self._execute(job, force=True)
+
+    def run_pending(self):
+        """
+        Executa os jobs vencidos, na ordem de registro.
+
+        Returns:
+            list: Nomes dos jobs executados
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+
+        executed = []
+        for job in jobs:
+            if self._stop.is_set():
+                break
+            now = datetime.now()
+            if not self._is_due(job, now):
+                continue
+
+            # Consultas interativas em andamento têm prioridade (adiamento limitado)
+            if active_interactive_queries():
+                deferred_since = self._deferred_since.setdefault(job.name, now)
+                if (now - deferred_since).total_seconds() < SCHEDULER_MAX_DEFER:
+                    continue
+            self._deferred_since.pop(job.name, None)
+
+            if self._execute(job):
+                executed.append(job.name)
+        return executed
+
+    def _loop(self):
+        lower_thread_priority()
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                report_exception(e)
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """Inicia a thread do agendador (uma única vez)."""
+        with self._lock:
+            if self._thread is not None:
+                return self._thread
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='job-scheduler', daemon=True)
+            self._thread.start()
+        trace(f"Agendador de jobs iniciado (verificação a cada {self.poll_interval:g}s)", color="green")
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self):
+        """Aguarda a thread do agendador (processo dedicado ao agendador)."""
+        while self._thread is not None and self._thread.is_alive():
+            self._thread.join(1)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Retorna a instância única do agendador do processo."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = JobScheduler()
+    return _scheduler
+
+
+def schedule_job(job):
+    """Registra o job no agendador do processo e inicia o agendador. Returns: Job (None se desativado)."""
+    if not SCHEDULER_ENABLED:
+        return None
+    scheduler = get_scheduler()
+    scheduler.add_job(job)
+    scheduler.start()
+    return job
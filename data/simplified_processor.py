@@ -1,11 +1,16 @@
 # data/simplified_processor.py
 # Processador simplificado para dados da SP - substitui o ReportGenerator complexo
 
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from contextlib import closing
 from utils.tracer import trace, report_exception
-from data.local_db_handler import get_db_handler
-from data.eja_manager import get_eja_manager
+from utils.durations import minutes_from_hhmm, format_minutes
+from data.local_db_handler import get_db_handler, LAST_12_MONTHS_START_DAY_SQL
+from data.eja_catalog import EJASnapshot, get_eja_catalog
+from data.usage_cube import build_usage_cube
+from data.clients_summary import get_classification_totals
 
 
 class SimplifiedDataProcessor:
@@ -14,82 +19,79 @@ class SimplifiedDataProcessor:
     eliminando camadas desnecessárias de complexidade.
     """
 
-    def __init__(self, dashboard_df):
-        self.raw_df = dashboard_df.copy() if dashboard_df is not None else pd.DataFrame()
-        self.eja_manager = get_eja_manager()
-
-        # Cache de EJAs para lookup rápido
-        self._eja_cache = {}
+    # Dimensões do cubo usadas pelos agregados (as demais não são mantidas no frame filtrado)
+    VALID_COLUMNS = ['EJA', 'LocalityName', 'VehicleDepartment']
+
+    # Nome da coluna de título por classificação (EXTERNAL SALES e demais: 'company')
+    CLASSIFICATION_KEYS = {
+        'PROGRAMS': 'program',
+        'OTHER SKILL TEAMS': 'team',
+        'INTERNAL USERS': 'department',
+        'EXTERNAL SALES': 'company',
+    }
+
+    def __init__(self, dashboard_df=None, usage_cube=None):
+        # Os DataFrames de entrada são compartilhados (cache de resultados): somente leitura.
+        # Sem cubo pronto (data/usage_cube.py), ele é montado a partir dos eventos da SP.
+        self.raw_df = dashboard_df if dashboard_df is not None else pd.DataFrame()
+        self._usage_cube = usage_cube
+        self._valid_df = None
+        self._classification_df = None
+        # Snapshot do catálogo de EJAs (códigos inteiros ordenados, lookup por searchsorted)
+        self._catalog = None
         self._load_eja_cache()
 
     def _load_eja_cache(self):
-        """Carrega EJAs em cache para lookup rápido - CORRIGIDO"""
+        """Fixa o snapshot do catálogo de EJAs usado por este processador"""
         try:
-            all_ejas = self.eja_manager.get_all_ejas()
-
-            # CORREÇÃO: Garantir que as chaves sejam strings consistentes
-            self._eja_cache = {}
-            for eja in all_ejas:
-                eja_code = str(eja['eja_code']).strip()  # Sempre string, sem espaços
-                self._eja_cache[eja_code] = eja
+            self._catalog = get_eja_catalog().snapshot()
 
-            trace(f"Cache de EJAs carregado: {len(self._eja_cache)} registros")
+            trace(f"Cache de EJAs carregado: {len(self._catalog)} registros")
 
             # DEBUG: Verificar se os EJAs problemáticos estão no cache
-            expected_ejas = ['832', '35', '36', '23', '6', '8', '12', '1']
+            expected_ejas = [832, 35, 36, 23, 6, 8, 12, 1]
             print(f"Verificando EJAs críticos no cache:")
             for eja in expected_ejas:
-                if eja in self._eja_cache:
-                    print(f"  ✅ EJA {eja}: {self._eja_cache[eja]['title']}")
+                if eja in self._catalog.by_code:
+                    print(f"  ✅ EJA {eja}: {self._catalog.by_code[eja]['title']}")
                 else:
                     print(f"  ❌ EJA {eja}: NÃO ENCONTRADO no cache")
 
         except Exception as e:
             trace(f"Erro ao carregar cache de EJAs: {e}", color="red")
-            self._eja_cache = {}
-
-    def _safe_time_to_hours(self, time_str):
-        """
-        Conversão segura e consistente de HH:MM para horas decimais
-        Mantém logs para diagnóstico quando necessário
-        """
-        if pd.isna(time_str) or not time_str or ':' not in str(time_str):
-            return 0.0
-
-        try:
-            parts = str(time_str).split(':')
-            if len(parts) != 2:
-                return 0.0
-
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            return hours + (minutes / 60.0)
-        except (ValueError, TypeError):
-            return 0.0
+            self._catalog = EJASnapshot([], 0)
 
     def _filter_valid_data(self):
         """
         Aplica filtros básicos para dados válidos
         Equivale aos filtros da sua consulta SQL
+
+        O frame filtrado é montado uma única vez por processador e reutilizado
+        por todos os agregados; deve ser tratado como somente leitura.
         """
-        if self.raw_df.empty:
+        if self._valid_df is None:
+            self._valid_df = self._build_valid_data()
+        return self._valid_df
+
+    def _get_usage_cube(self):
+        if self._usage_cube is None:
+            self._usage_cube = build_usage_cube(self.raw_df)
+        return self._usage_cube
+
+    def _build_valid_data(self):
+        usage_cube = self._get_usage_cube()
+        if usage_cube.empty:
             return pd.DataFrame()
 
-        # Filtros equivalentes à sua consulta SQL
-        filtered_df = self.raw_df[
-            self.raw_df['StayTime'].notna()
-            & (self.raw_df['StayTime'] != '')
-            & self.raw_df['StayTime'].str.contains(':', na=False)
-            & self.raw_df['VehicleExitTime'].notna()  # Equivale ao WHERE e.VehicleExitTime is not null
-        ].copy()
+        # Filtros equivalentes à sua consulta SQL: StayTime HH:MM (já aplicado no cubo)
+        # e WHERE e.VehicleExitTime is not null; linhas com 0 minutos são descartadas
+        mask = usage_cube['HasExit'].to_numpy(dtype=bool) & (usage_cube['minutes'].to_numpy() > 0)
 
-        # Adicionar coluna de horas decimais
-        filtered_df['HorasDecimais'] = filtered_df['StayTime'].apply(self._safe_time_to_hours)
+        filtered_df = usage_cube.loc[mask, self.VALID_COLUMNS].assign(
+            StayMinutes=usage_cube['minutes'][mask]
+        )
 
-        # Remover registros com 0 horas (dados inválidos)
-        filtered_df = filtered_df[filtered_df['HorasDecimais'] > 0]
-
-        trace(f"Dados filtrados: {len(filtered_df)} de {len(self.raw_df)} registros originais")
+        trace(f"Dados filtrados: {len(filtered_df)} de {len(usage_cube)} linhas do cubo de utilização")
         return filtered_df
 
     def get_programs_data(self, top_n=7):
@@ -108,77 +110,73 @@ class SimplifiedDataProcessor:
         """Dados para gráfico de External Sales"""
         return self._get_classification_data("EXTERNAL SALES", top_n)
 
-    def _get_classification_data(self, classification, top_n=7):
+    def _classification_minutes(self):
         """
-        Versão corrigida que garante consistência de tipos entre EJA e cache
+        Agrega os minutos por (classificação, EJA) em uma única passada:
+        cada EJA é localizado no catálogo por busca binária nos códigos inteiros
+        e o frame é agrupado pela classificação e pelo código.
+        Reutilizado por todas as classificações.
+
+        Returns:
+            Series: Minutos indexados por (classification, EJA)
         """
-        filtered_df = self._filter_valid_data()
+        if self._classification_df is None:
+            filtered_df = self._filter_valid_data()
+            catalog = self._catalog
+
+            if filtered_df.empty or not catalog.class_names:
+                self._classification_df = pd.Series(
+                    [], dtype='int64',
+                    index=pd.MultiIndex.from_arrays([[], []], names=['classification', 'EJA'])
+                )
+            else:
+                positions = catalog.positions(filtered_df['EJA'])
+                class_index = np.where(positions >= 0, catalog.class_index[positions], -1)
+                keep = class_index >= 0
+
+                classification = pd.Categorical.from_codes(class_index[keep], categories=catalog.class_names)
+                self._classification_df = (
+                    filtered_df['StayMinutes'][keep]
+                    .groupby([classification, catalog.codes[positions[keep]]], sort=False, observed=True)
+                    .sum()
+                    .rename_axis(['classification', 'EJA'])
+                )
+
+        return self._classification_df
+
+    def get_classification_totals(self):
+        """
+        Total de minutos por classificação (todos os EJAs, não apenas o top N).
 
-        if filtered_df.empty:
-            return pd.DataFrame(columns=['title', 'hours'])
+        Returns:
+            dict: {classificação: minutos}
+        """
+        grouped = self._classification_minutes()
+        if grouped.empty:
+            return {}
+        totals = grouped.groupby(level=0, sort=False, observed=True).sum()
+        return {str(key): int(value) for key, value in totals.items()}
 
-        # Obter EJAs desta classificação do cache
-        eja_codes = [
-            code for code, eja in self._eja_cache.items()
-            if eja.get('new_classification') == classification
-        ]
+    def _get_classification_data(self, classification, top_n=7):
+        """
+        Top N EJAs de uma classificação, a partir da agregação única
+        (_classification_minutes).
+        """
+        grouped = self._classification_minutes()
 
-        if not eja_codes:
-            trace(f"Nenhum EJA encontrado para classificação: {classification}")
+        if grouped.empty or classification not in grouped.index.get_level_values(0):
+            trace(f"Nenhum registro encontrado para classificação: {classification}")
             return pd.DataFrame(columns=['title', 'hours'])
 
-        # CORREÇÃO: Garantir que ambos estejam no mesmo tipo
-        # Converter tanto os dados quanto o cache para string para comparação
-        filtered_df['EJA_str'] = filtered_df['EJA'].astype(str).str.strip()
-        eja_codes_str = [str(code).strip() for code in eja_codes]
-
-        # DEBUG para PROGRAMS
-        if classification == "PROGRAMS":
-            print(f"\n=== DEBUG CORREÇÃO DE TIPOS ===")
-            print(f"EJAs no cache (originais): {eja_codes[:5]}...")
-            print(f"EJAs no cache (como string): {eja_codes_str[:5]}...")
-            print(f"EJAs nos dados (únicos): {sorted(filtered_df['EJA_str'].unique())[:10]}...")
-            print(f"Intersecção encontrada: {set(eja_codes_str) & set(filtered_df['EJA_str'].unique())}")
-
-        # Filtrar dados por EJAs desta classificação
-        classification_df = filtered_df[filtered_df['EJA_str'].isin(eja_codes_str)]
-
-        if classification == "PROGRAMS":
-            print(f"Registros encontrados após correção: {len(classification_df)}")
-            if not classification_df.empty:
-                total_hours = classification_df['HorasDecimais'].sum()
-                print(f"Total de horas: {total_hours}")
-            print("=== FIM DEBUG CORREÇÃO ===\n")
-
-        if classification_df.empty:
-            return pd.DataFrame(columns=['title', 'hours'])
+        top = grouped.xs(classification, level=0).nlargest(top_n)
 
-        # Resto do código permanece igual...
-        grouped = classification_df.groupby('EJA_str')['HorasDecimais'].sum().reset_index()
-        grouped = grouped.sort_values('HorasDecimais', ascending=False).head(top_n)
-
-        # Adicionar títulos dos EJAs
-        result_data = []
-        for _, row in grouped.iterrows():
-            eja_code = row['EJA_str']
-            eja_info = self._eja_cache.get(eja_code, {})
-
-            # Nome da coluna depende do tipo de gráfico
-            if classification == "PROGRAMS":
-                key_name = 'program'
-            elif classification == "OTHER SKILL TEAMS":
-                key_name = 'team'
-            elif classification == "INTERNAL USERS":
-                key_name = 'department'
-            else:  # EXTERNAL SALES
-                key_name = 'company'
-
-            result_data.append({
-                key_name: eja_info.get('title', f'EJA {eja_code}'),
-                'hours': int(row['HorasDecimais'])
-            })
-
-        return pd.DataFrame(result_data)
+        # Nome da coluna depende do tipo de gráfico
+        key_name = self.CLASSIFICATION_KEYS.get(classification, 'company')
+
+        return pd.DataFrame({
+            key_name: self._catalog.titles_for(top.index),
+            'hours': (top.to_numpy() // 60).astype(int)
+        })
 
     def get_tracks_data(self):
         """
@@ -191,20 +189,15 @@ class SimplifiedDataProcessor:
             return {}
 
         # Agrupar por LocalityName
-        tracks_grouped = filtered_df.groupby('LocalityName')['HorasDecimais'].sum()
+        tracks_grouped = filtered_df.groupby('LocalityName', observed=True)['StayMinutes'].sum()
 
-        # Converter para o formato esperado
+        # Converter para o formato esperado (minutos + texto HH:MM para exibição)
         tracks_dict = {}
-        for locality, hours in tracks_grouped.items():
-            # Converter horas decimais de volta para HH:MM
-            total_minutes = int(hours * 60)
-            hours_part = total_minutes // 60
-            minutes_part = total_minutes % 60
-            time_formatted = f"{hours_part:02d}:{minutes_part:02d}"
-
+        for locality, total_minutes in tracks_grouped.items():
             tracks_dict[str(locality)] = {
                 'track_name': str(locality),
-                'track_time': time_formatted
+                'track_minutes': int(total_minutes),
+                'track_time': format_minutes(total_minutes)
             }
 
         return tracks_dict
@@ -219,33 +212,33 @@ class SimplifiedDataProcessor:
             return pd.DataFrame(columns=['area', 'hours'])
 
         # Agrupar por VehicleDepartment
-        areas_grouped = filtered_df.groupby('VehicleDepartment')['HorasDecimais'].sum().reset_index()
-        areas_grouped = areas_grouped.sort_values('HorasDecimais', ascending=False)
+        areas_grouped = filtered_df.groupby('VehicleDepartment', observed=True)['StayMinutes'].sum().reset_index()
+        areas_grouped = areas_grouped.sort_values('StayMinutes', ascending=False)
 
-        # Renomear colunas e converter para inteiro
-        areas_grouped = areas_grouped.rename(columns={
-            'VehicleDepartment': 'area',
-            'HorasDecimais': 'hours'
+        # Renomear colunas e converter para horas inteiras
+        areas_grouped = pd.DataFrame({
+            'area': areas_grouped['VehicleDepartment'].astype(str),
+            'hours': areas_grouped['StayMinutes'] // 60
         })
-        areas_grouped['hours'] = areas_grouped['hours'].astype(int)
 
         return areas_grouped
 
-    def get_total_hours_formatted(self):
+    def get_total_minutes(self):
         """
-        Retorna o total de horas no formato HH:MM
+        Retorna o total de minutos do período
         """
         filtered_df = self._filter_valid_data()
 
         if filtered_df.empty:
-            return "00:00"
+            return 0
 
-        total_hours = filtered_df['HorasDecimais'].sum()
-        total_minutes = int(total_hours * 60)
-        hours_part = total_minutes // 60
-        minutes_part = total_minutes % 60
+        return int(filtered_df['StayMinutes'].sum())
 
-        return f"{hours_part:02d}:{minutes_part:02d}"
+    def get_total_hours_formatted(self):
+        """
+        Retorna o total de horas no formato HH:MM
+        """
+        return format_minutes(self.get_total_minutes())
 
     def get_all_dashboard_data(self):
         """
@@ -253,7 +246,7 @@ class SimplifiedDataProcessor:
         no formato esperado pelos layouts existentes
         """
         try:
-            # Processar todos os dados de uma vez
+            # Processar todos os dados de uma vez (classificações: agregação única)
             programs_df = self.get_programs_data()
             other_skills_df = self.get_other_skills_data()
             internal_users_df = self.get_internal_users_data()
@@ -279,11 +272,11 @@ class SimplifiedDataProcessor:
             dfs['utilization'] = pd.DataFrame(columns=['month', 'utilization'])
             dfs['availability'] = pd.DataFrame(columns=['month', 'availability'])
 
+            # YTD, 12 meses e percentuais anuais dependem do período: ver data/monthly_usage.py
             return dfs, tracks_data, areas_data, {
                 'total_hours': total_hours,
-                'total_hours_ytd': total_hours,
-                'ytd_utilization_percentage': '0%',  # Virá do SQLite
-                'ytd_availability_percentage': '0%'   # Virá do SQLite
+                'total_minutes': self.get_total_minutes(),
+                'classification_minutes': self.get_classification_totals()
             }
 
         except Exception as e:
@@ -292,6 +285,14 @@ class SimplifiedDataProcessor:
             return {}, {}, pd.DataFrame(), {}
 
 
+# Semanas dos últimos 12 meses: faixa em start_day (índice de cobertura de clients_usage)
+WEEKS_COUNT_LAST_12_MONTHS = f"""
+    SELECT COUNT(DISTINCT year * 100 + week_number) as weeks_count
+    FROM clients_usage
+    WHERE start_day >= {LAST_12_MONTHS_START_DAY_SQL}
+"""
+
+
 # Função para histórico de 12 meses para "Clients Utilization"
 class ClientsHistoricalProcessor:
     """
@@ -309,45 +310,26 @@ class ClientsHistoricalProcessor:
         """
         try:
             # Verificar quantas semanas temos no SQLite
-            self.db_handler.cursor.execute("""
-                SELECT COUNT(DISTINCT year || '-' || week_number) as weeks_count
-                FROM clients_usage
-                WHERE datetime(start_date) >= datetime('now', '-12 months')
-            """)
-            weeks_count = self.db_handler.cursor.fetchone()[0]
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute(WEEKS_COUNT_LAST_12_MONTHS)
+                weeks_count = cursor.fetchone()[0]
 
             if weeks_count < 40:  # Menos de ~10 meses de dados
                 trace(f"Dados insuficientes no histórico: {weeks_count} semanas. Mínimo recomendado: 40")
                 return pd.DataFrame(columns=['classification', 'hours'])
 
-            # CORREÇÃO: Usar a mesma query da imagem - converter minutos para horas
-            self.db_handler.cursor.execute("""
-                SELECT
-                    e.new_classification as classification,
-                    ROUND(SUM(c.hours) / 60.0, 2) as total_horas
-                FROM clients_usage c
-                INNER JOIN eja e ON c.classification = e.eja_code
-                WHERE e.new_classification IS NOT NULL 
-                AND e.new_classification != ''
-                AND datetime(c.start_date) >= datetime('now', '-12 months')
-                GROUP BY e.new_classification
-                ORDER BY total_horas DESC
-            """)
-
-            rows = self.db_handler.cursor.fetchall()
+            # Totais por classificação do resumo materializado (minutos -> horas)
+            rows = get_classification_totals(self.db_handler.conn, last_12_months=True)
 
             if not rows:
                 return pd.DataFrame(columns=['classification', 'hours'])
 
             # Converter para DataFrame no formato esperado
             result_data = []
-            for row in rows:
-                classification = row[0]  # e.new_classification
-                total_horas = row[1]     # ROUND(SUM(c.hours) / 60.0, 2)
-
+            for classification, _, minutes in rows:
                 result_data.append({
                     'classification': classification,
-                    'hours': int(total_horas)  # Agora está em horas, não minutos
+                    'hours': int(round(minutes / 60.0, 2))  # Agora está em horas, não minutos
                 })
 
             df = pd.DataFrame(result_data)
@@ -362,22 +344,20 @@ class ClientsHistoricalProcessor:
         Verifica se é necessário processar dados históricos
         """
         try:
-            self.db_handler.cursor.execute("""
-                SELECT COUNT(DISTINCT year || '-' || week_number) as weeks_count
-                FROM clients_usage
-                WHERE datetime(start_date) >= datetime('now', '-12 months')
-            """)
-            weeks_count = self.db_handler.cursor.fetchone()[0]
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute(WEEKS_COUNT_LAST_12_MONTHS)
+                weeks_count = cursor.fetchone()[0]
             return weeks_count < 40
         except Exception:
             return True
 
 
-def get_simplified_processor(dashboard_df):
+def get_simplified_processor(dashboard_df=None, usage_cube=None):
     """
     Função factory para obter o processador simplificado
+    (a partir dos eventos da SP ou do cubo de utilização)
     """
-    return SimplifiedDataProcessor(dashboard_df)
+    return SimplifiedDataProcessor(dashboard_df, usage_cube=usage_cube)
 
 
 def get_clients_historical_processor():
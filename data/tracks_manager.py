@@ -1,4 +1,3 @@
-
 from .local_db_handler import LocalDatabaseHandler
 
 
@@ -6,13 +5,14 @@ def adjust_tracks_names(tracks_data: dict):
     local_db = LocalDatabaseHandler()
 
     try:
+        # Montar um novo dicionário: tracks_data pode vir do cache de resultados
+        adjusted = {}
         for key, item in tracks_data.items():
             track_name = local_db.select(f"select track from tracks where ponto = '{key}';")
-            tracks_data[key] = {
-                "track_name": track_name[0],
-                "track_time": item
-            }
+            track_info = dict(item) if isinstance(item, dict) else {"track_time": item}
+            track_info["track_name"] = track_name[0]
+            adjusted[key] = track_info
 
-        return tracks_data
+        return adjusted
     except Exception:
         print('errrorr')
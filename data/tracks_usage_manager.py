@@ -1,6 +1,10 @@
 # data/tracks_usage_manager.py
+import threading
+from contextlib import closing
+
 from utils.tracer import trace, report_exception
 from data.local_db_handler import get_db_handler
+from data.result_cache import invalidate_dashboard_cache
 
 
 class TracksUsageManager:
@@ -27,11 +31,12 @@ class TracksUsageManager:
             list: List of dictionaries with track availability data
         """
         try:
-            self.db_handler.cursor.execute("""
-                SELECT id, year, month, value FROM tracks_availability
-                ORDER BY year DESC, month DESC
-            """)
-            rows = self.db_handler.cursor.fetchall()
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute("""
+                    SELECT id, year, month, value FROM tracks_availability
+                    ORDER BY year DESC, month DESC
+                """)
+                rows = cursor.fetchall()
             return [dict(row) for row in rows]
         except Exception as e:
             report_exception(e)
@@ -63,8 +68,9 @@ class TracksUsageManager:
 
             query += " ORDER BY year DESC, month DESC"
 
-            self.db_handler.cursor.execute(query, params)
-            rows = self.db_handler.cursor.fetchall()
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
             return [dict(row) for row in rows]
         except Exception as e:
             report_exception(e)
@@ -82,11 +88,12 @@ class TracksUsageManager:
             dict: Track availability record or None if not found
         """
         try:
-            self.db_handler.cursor.execute(
-                "SELECT id, year, month, value FROM tracks_availability WHERE id = ?",
-                (track_id,)
-            )
-            row = self.db_handler.cursor.fetchone()
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute(
+                    "SELECT id, year, month, value FROM tracks_availability WHERE id = ?",
+                    (track_id,)
+                )
+                row = cursor.fetchone()
             return dict(row) if row else None
         except Exception as e:
             report_exception(e)
@@ -121,34 +128,36 @@ class TracksUsageManager:
                 return {"error": "Month must be between 1 and 12"}
 
             # Check if record for this year/month already exists
-            self.db_handler.cursor.execute(
-                "SELECT id FROM tracks_availability WHERE year = ? AND month = ?",
-                (year, month)
-            )
-            existing = self.db_handler.cursor.fetchone()
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute(
+                    "SELECT id FROM tracks_availability WHERE year = ? AND month = ?",
+                    (year, month)
+                )
+                existing = cursor.fetchone()
             if existing:
                 return {"error": f"Record for {year}-{month} already exists"}
 
             # Insert new record
-            self.db_handler.cursor.execute("""
-                INSERT INTO tracks_availability (year, month, value)
-                VALUES (?, ?, ?)
-            """, (year, month, value))
-
-            self.db_handler.conn.commit()
+            with self.db_handler.transaction():
+                with closing(self.db_handler.conn.cursor()) as cursor:
+                    cursor.execute("""
+                        INSERT INTO tracks_availability (year, month, value)
+                        VALUES (?, ?, ?)
+                    """, (year, month, value))
+            invalidate_dashboard_cache()
 
             # Get the inserted record
-            self.db_handler.cursor.execute(
-                "SELECT id FROM tracks_availability WHERE year = ? AND month = ?",
-                (year, month)
-            )
-            new_id = self.db_handler.cursor.fetchone()['id']
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute(
+                    "SELECT id FROM tracks_availability WHERE year = ? AND month = ?",
+                    (year, month)
+                )
+                new_id = cursor.fetchone()['id']
 
             return self.get_track_by_id(new_id)
         except Exception as e:
             report_exception(e)
             trace(f"Error adding track availability record: {str(e)}", color="red")
-            self.db_handler.conn.rollback()
             return {"error": str(e)}
 
     def update_track(self, track_id, track_data):
@@ -186,28 +195,29 @@ class TracksUsageManager:
 
             # Check if new year/month combination already exists in another record
             if existing_record['year'] != year or existing_record['month'] != month:
-                self.db_handler.cursor.execute(
-                    "SELECT id FROM tracks_availability WHERE year = ? AND month = ? AND id != ?",
-                    (year, month, track_id)
-                )
-                duplicate = self.db_handler.cursor.fetchone()
+                with closing(self.db_handler.conn.cursor()) as cursor:
+                    cursor.execute(
+                        "SELECT id FROM tracks_availability WHERE year = ? AND month = ? AND id != ?",
+                        (year, month, track_id)
+                    )
+                    duplicate = cursor.fetchone()
                 if duplicate:
                     return {"error": f"Another record for {year}-{month} already exists"}
 
             # Update record
-            self.db_handler.cursor.execute("""
-                UPDATE tracks_availability
-                SET year = ?, month = ?, value = ?
-                WHERE id = ?
-            """, (year, month, value, track_id))
-
-            self.db_handler.conn.commit()
+            with self.db_handler.transaction():
+                with closing(self.db_handler.conn.cursor()) as cursor:
+                    cursor.execute("""
+                        UPDATE tracks_availability
+                        SET year = ?, month = ?, value = ?
+                        WHERE id = ?
+                    """, (year, month, value, track_id))
+            invalidate_dashboard_cache()
 
             return self.get_track_by_id(track_id)
         except Exception as e:
             report_exception(e)
             trace(f"Error updating track availability record: {str(e)}", color="red")
-            self.db_handler.conn.rollback()
             return {"error": str(e)}
 
     def delete_track(self, track_id):
@@ -227,14 +237,15 @@ class TracksUsageManager:
                 return False
 
             # Delete record
-            self.db_handler.cursor.execute("DELETE FROM tracks_availability WHERE id = ?", (track_id,))
-            self.db_handler.conn.commit()
+            with self.db_handler.transaction():
+                with closing(self.db_handler.conn.cursor()) as cursor:
+                    cursor.execute("DELETE FROM tracks_availability WHERE id = ?", (track_id,))
+            invalidate_dashboard_cache()
 
             return True
         except Exception as e:
             report_exception(e)
             trace(f"Error deleting track availability record: {str(e)}", color="red")
-            self.db_handler.conn.rollback()
             return False
 
     # =================== Usage Percentage Methods ===================
@@ -247,11 +258,12 @@ class TracksUsageManager:
             list: List of dictionaries with usage percentage data
         """
         try:
-            self.db_handler.cursor.execute("""
-                SELECT id, year, month, value FROM usage_percentage
-                ORDER BY year DESC, month DESC
-            """)
-            rows = self.db_handler.cursor.fetchall()
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute("""
+                    SELECT id, year, month, value FROM usage_percentage
+                    ORDER BY year DESC, month DESC
+                """)
+                rows = cursor.fetchall()
             return [dict(row) for row in rows]
         except Exception as e:
             report_exception(e)
@@ -283,8 +295,9 @@ class TracksUsageManager:
 
             query += " ORDER BY year DESC, month DESC"
 
-            self.db_handler.cursor.execute(query, params)
-            rows = self.db_handler.cursor.fetchall()
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
             return [dict(row) for row in rows]
         except Exception as e:
             report_exception(e)
@@ -302,11 +315,12 @@ class TracksUsageManager:
             dict: Usage percentage record or None if not found
         """
         try:
-            self.db_handler.cursor.execute(
-                "SELECT id, year, month, value FROM usage_percentage WHERE id = ?",
-                (usage_id,)
-            )
-            row = self.db_handler.cursor.fetchone()
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute(
+                    "SELECT id, year, month, value FROM usage_percentage WHERE id = ?",
+                    (usage_id,)
+                )
+                row = cursor.fetchone()
             return dict(row) if row else None
         except Exception as e:
             report_exception(e)
@@ -341,34 +355,36 @@ class TracksUsageManager:
                 return {"error": "Month must be between 1 and 12"}
 
             # Check if record for this year/month already exists
-            self.db_handler.cursor.execute(
-                "SELECT id FROM usage_percentage WHERE year = ? AND month = ?",
-                (year, month)
-            )
-            existing = self.db_handler.cursor.fetchone()
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute(
+                    "SELECT id FROM usage_percentage WHERE year = ? AND month = ?",
+                    (year, month)
+                )
+                existing = cursor.fetchone()
             if existing:
                 return {"error": f"Record for {year}-{month} already exists"}
 
             # Insert new record
-            self.db_handler.cursor.execute("""
-                INSERT INTO usage_percentage (year, month, value)
-                VALUES (?, ?, ?)
-            """, (year, month, value))
-
-            self.db_handler.conn.commit()
+            with self.db_handler.transaction():
+                with closing(self.db_handler.conn.cursor()) as cursor:
+                    cursor.execute("""
+                        INSERT INTO usage_percentage (year, month, value)
+                        VALUES (?, ?, ?)
+                    """, (year, month, value))
+            invalidate_dashboard_cache()
 
             # Get the inserted record
-            self.db_handler.cursor.execute(
-                "SELECT id FROM usage_percentage WHERE year = ? AND month = ?",
-                (year, month)
-            )
-            new_id = self.db_handler.cursor.fetchone()['id']
+            with closing(self.db_handler.conn.cursor()) as cursor:
+                cursor.execute(
+                    "SELECT id FROM usage_percentage WHERE year = ? AND month = ?",
+                    (year, month)
+                )
+                new_id = cursor.fetchone()['id']
 
             return self.get_usage_by_id(new_id)
         except Exception as e:
             report_exception(e)
             trace(f"Error adding usage percentage record: {str(e)}", color="red")
-            self.db_handler.conn.rollback()
             return {"error": str(e)}
 
     def update_usage(self, usage_id, usage_data):
@@ -406,28 +422,29 @@ class TracksUsageManager:
 
             # Check if new year/month combination already exists in another record
             if existing_record['year'] != year or existing_record['month'] != month:
-                self.db_handler.cursor.execute(
-                    "SELECT id FROM usage_percentage WHERE year = ? AND month = ? AND id != ?",
-                    (year, month, usage_id)
-                )
-                duplicate = self.db_handler.cursor.fetchone()
+                with closing(self.db_handler.conn.cursor()) as cursor:
+                    cursor.execute(
+                        "SELECT id FROM usage_percentage WHERE year = ? AND month = ? AND id != ?",
+                        (year, month, usage_id)
+                    )
+                    duplicate = cursor.fetchone()
                 if duplicate:
                     return {"error": f"Another record for {year}-{month} already exists"}
 
             # Update record
-            self.db_handler.cursor.execute("""
-                UPDATE usage_percentage
-                SET year = ?, month = ?, value = ?
-                WHERE id = ?
-            """, (year, month, value, usage_id))
-
-            self.db_handler.conn.commit()
+            with self.db_handler.transaction():
+                with closing(self.db_handler.conn.cursor()) as cursor:
+                    cursor.execute("""
+                        UPDATE usage_percentage
+                        SET year = ?, month = ?, value = ?
+                        WHERE id = ?
+                    """, (year, month, value, usage_id))
+            invalidate_dashboard_cache()
 
             return self.get_usage_by_id(usage_id)
         except Exception as e:
             report_exception(e)
             trace(f"Error updating usage percentage record: {str(e)}", color="red")
-            self.db_handler.conn.rollback()
             return {"error": str(e)}
 
     def delete_usage(self, usage_id):
@@ -447,19 +464,28 @@ class TracksUsageManager:
                 return False
 
             # Delete record
-            self.db_handler.cursor.execute("DELETE FROM usage_percentage WHERE id = ?", (usage_id,))
-            self.db_handler.conn.commit()
+            with self.db_handler.transaction():
+                with closing(self.db_handler.conn.cursor()) as cursor:
+                    cursor.execute("DELETE FROM usage_percentage WHERE id = ?", (usage_id,))
+            invalidate_dashboard_cache()
 
             return True
         except Exception as e:
             report_exception(e)
             trace(f"Error deleting usage percentage record: {str(e)}", color="red")
-            self.db_handler.conn.rollback()
             return False
 
 # Function to get an instance of the manager
 
+_tracks_usage_manager = None
+_tracks_usage_manager_lock = threading.Lock()
+
 
 def get_tracks_usage_manager():
-    """Returns an instance of the TracksUsageManager"""
-    return TracksUsageManager()
+    """Returns the shared TracksUsageManager (one SQLite connection per thread)"""
+    global _tracks_usage_manager
+    if _tracks_usage_manager is None:
+        with _tracks_usage_manager_lock:
+            if _tracks_usage_manager is None:
+                _tracks_usage_manager = TracksUsageManager()
+    return _tracks_usage_manager
@@ -0,0 +1,313 @@
+# data/usage_cube.py
+# Cubo de utilização: eventos de acesso reduzidos a
+# (dia, EJA, pista, área, veículo, empresa) -> minutos, eventos
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from utils.tracer import trace, report_exception
+from utils.durations import minutes_from_hhmm
+from data.eja_catalog import eja_codes
+
+
+# Dimensões do cubo (nomes das colunas da SP) e medidas
+CUBE_DIMENSIONS = ['day', 'EJA', 'LocalityName', 'VehicleDepartment', 'Vehicle', 'VehicleCompany', 'HasExit']
+CUBE_MEASURES = ['minutes', 'events', 'first_entry']
+TEXT_DIMENSIONS = ['LocalityName', 'VehicleDepartment', 'Vehicle', 'VehicleCompany']
+
+# Coluna do cubo -> coluna local (tabela usage_cube)
+COLUMN_MAP = {
+    'day': 'day',
+    'EJA': 'eja',
+    'LocalityName': 'locality_name',
+    'VehicleDepartment': 'vehicle_department',
+    'Vehicle': 'vehicle',
+    'VehicleCompany': 'vehicle_company',
+    'HasExit': 'has_exit',
+    'minutes': 'minutes',
+    'events': 'events',
+    'first_entry': 'first_entry',
+}
+
+DAY_FORMAT = '%Y-%m-%d'
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+USAGE_CUBE_STATE = 'usage_cube'
+
+# Janela re-consultada antes da marca d'água do período corrente, para saídas tardias (horas)
+USAGE_CUBE_LOOKBACK_HOURS = float(os.environ.get('USAGE_CUBE_LOOKBACK_HOURS', '24'))
+
+
+def empty_usage_cube():
+    return pd.DataFrame({
+        'day': pd.Series(dtype='datetime64[ns]'),
+        'EJA': pd.Series(dtype='Int64'),
+        **{column: pd.Series(dtype='category') for column in TEXT_DIMENSIONS},
+        'HasExit': pd.Series(dtype=bool),
+        'minutes': pd.Series(dtype='int64'),
+        'events': pd.Series(dtype='int64'),
+        'first_entry': pd.Series(dtype='datetime64[ns]'),
+    })
+
+
+def build_usage_cube(events):
+    """
+    Reduz os eventos da sp_VehicleAccessReport ao cubo de utilização.
+
+    Apenas eventos com StayTime no formato HH:MM entram no cubo (os demais
+    não somam minutos em nenhuma visão). HasExit separa os eventos com
+    VehicleExitTime, exigido pelos agregados do dashboard.
+
+    Args:
+        events (DataFrame): Eventos no formato e tipos da SP
+
+    Returns:
+        DataFrame: Uma linha por combinação de dimensões, com minutos somados,
+                   quantidade de eventos e a primeira entrada
+    """
+    if events is None or events.empty:
+        return empty_usage_cube()
+
+    stay_time = events['StayTime']
+    valid = stay_time.str.contains(':', na=False).to_numpy(dtype=bool)
+    rows = events.loc[valid]
+    entry = pd.to_datetime(rows['VehicleEntranceTime'], errors='coerce')
+
+    frame = pd.DataFrame({
+        'day': entry.dt.normalize(),
+        'EJA': eja_codes(rows['EJA']),
+        **{column: rows[column].astype('category') for column in TEXT_DIMENSIONS},
+        'HasExit': rows['VehicleExitTime'].notna(),
+        'minutes': minutes_from_hhmm(stay_time[valid]),
+        'first_entry': entry,
+    })
+
+    cube = (
+        frame.groupby(CUBE_DIMENSIONS, dropna=False, observed=True, sort=False)
+        .agg(minutes=('minutes', 'sum'), events=('minutes', 'size'), first_entry=('first_entry', 'min'))
+        .reset_index()
+    )
+    for column in TEXT_DIMENSIONS:
+        cube[column] = cube[column].astype('category')
+    cube['EJA'] = cube['EJA'].astype('Int64')
+    return cube
+
+
+def replace_cube_days(conn, first_day, last_day, cube):
+    """
+    Substitui as linhas do cubo em [first_day, last_day] (YYYY-MM-DD).
+    Não faz commit: roda na transação da sincronização do espelho.
+    """
+    conn.execute("DELETE FROM usage_cube WHERE day BETWEEN ? AND ?", (first_day, last_day))
+    if cube.empty:
+        return 0
+
+    frame = cube.assign(
+        day=cube['day'].dt.strftime(DAY_FORMAT),
+        first_entry=cube['first_entry'].dt.strftime(TIME_FORMAT),
+        HasExit=cube['HasExit'].astype(int)
+    )[list(COLUMN_MAP)].rename(columns=COLUMN_MAP)
+
+    columns = list(frame.columns)
+    records = frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+    conn.executemany(
+        f"INSERT INTO usage_cube ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+        records
+    )
+    return len(frame)
+
+
+def query_usage_cube(conn, start_date, end_date):
+    """Lê as linhas do cubo no período (YYYY-MM-DD) com os tipos de build_usage_cube."""
+    local_columns = ', '.join(f"{local} AS {column}" for column, local in COLUMN_MAP.items())
+    df = pd.read_sql_query(
+        f"SELECT {local_columns} FROM usage_cube WHERE day BETWEEN ? AND ?",
+        conn,
+        params=(start_date, end_date)
+    )
+    if df.empty:
+        return empty_usage_cube()
+
+    df['day'] = pd.to_datetime(df['day'], format=DAY_FORMAT)
+    df['first_entry'] = pd.to_datetime(df['first_entry'], format=TIME_FORMAT, errors='coerce')
+    df['EJA'] = pd.to_numeric(df['EJA'], errors='coerce').astype('Int64')
+    df['HasExit'] = df['HasExit'].astype(bool)
+    for column in TEXT_DIMENSIONS:
+        df[column] = df[column].astype('category')
+    return df
+
+
+def query_daily_totals(conn, start_date, end_date):
+    """
+    Minutos e eventos com VehicleExitTime por dia no período (YYYY-MM-DD),
+    agregados no SQLite.
+
+    Returns:
+        dict: {dia (YYYY-MM-DD): (minutos, eventos)}
+    """
+    rows = conn.execute("""
+        SELECT day, SUM(minutes), SUM(events) FROM usage_cube
+        WHERE has_exit = 1 AND day BETWEEN ? AND ?
+        GROUP BY day
+    """, (start_date, end_date)).fetchall()
+    return {row[0]: (int(row[1]), int(row[2])) for row in rows}
+
+
+def read_usage_cube(start_date, end_date):
+    """
+    Lê o cubo do período do SQLite (apenas leitura local: a sincronização do
+    espelho, que atualiza o cubo, roda em segundo plano).
+
+    Returns:
+        DataFrame: Cubo do período, ou None se o cubo local não cobre o período
+    """
+    from data.access_mirror import ACCESS_MIRROR_ENABLED, get_access_mirror
+    from data.local_db_handler import get_db_handler
+
+    if not ACCESS_MIRROR_ENABLED:
+        return None
+
+    try:
+        mirror = get_access_mirror()
+        if not mirror.covers(start_date, end_date, state=mirror.get_state(USAGE_CUBE_STATE)):
+            return None
+
+        db_handler = get_db_handler()
+        try:
+            cube = query_usage_cube(db_handler.conn, start_date, end_date)
+        finally:
+            db_handler.close()
+
+        trace(f"Período {start_date} até {end_date} lido do cubo de utilização: {len(cube)} linhas")
+        return cube
+    except Exception as e:
+        report_exception(e)
+        trace(f"Erro ao ler cubo de utilização: {str(e)}", color="red")
+        return None
+
+
+# =================== Agregações sobre o cubo ===================
+
+def rollup(cube, by, closed_only=False):
+    """
+    Soma minutos e eventos do cubo pelas colunas informadas.
+
+    Args:
+        cube (DataFrame): Cubo de utilização
+        by (str | list): Dimensões do resultado
+        closed_only (bool): Considerar apenas eventos com VehicleExitTime
+
+    Returns:
+        DataFrame: Dimensões + minutes + events
+    """
+    if closed_only:
+        cube = cube[cube['HasExit'].to_numpy(dtype=bool)]
+    return cube.groupby(by, observed=True)[['minutes', 'events']].sum().reset_index()
+
+
+def rollup_with_first(cube, key, attribute):
+    """
+    Soma os minutos por `key` e acrescenta o primeiro valor não nulo de
+    `attribute` (pela primeira entrada), como GroupBy.first sobre os eventos.
+
+    Returns:
+        DataFrame: key + minutes + attribute
+    """
+    cube = cube[cube[key].notna()]
+    totals = cube.groupby(key, observed=True)['minutes'].sum()
+
+    firsts = (
+        cube[cube[attribute].notna()]
+        .sort_values('first_entry', kind='stable')
+        .drop_duplicates(key)
+        .set_index(key)[attribute]
+        .astype(object)
+    )
+    firsts.index = firsts.index.astype(object)
+
+    result = totals.reset_index()
+    result[key] = result[key].astype(object)
+    result[attribute] = result[key].map(firsts)
+    return result
+
+
+# =================== Período corrente (sem espelho local) ===================
+
+class RunningUsageCube:
+    """
+    Cubo de um período que inclui o dia de hoje, mantido em memória com uma
+    marca d'água. Cada atualização consulta apenas os dias a partir da marca
+    (menos USAGE_CUBE_LOOKBACK_HOURS, para saídas tardias) e substitui esses
+    dias no cubo; os dias anteriores são reaproveitados.
+    """
+
+    def __init__(self, start_date, end_date):
+        self.start_date = start_date
+        self.end_date = end_date
+        self._cube = None
+        self._watermark = None
+        self._lock = threading.Lock()
+
+    def refresh(self, fetch_events):
+        """
+        Atualiza o cubo a partir dos eventos novos.
+
+        Args:
+            fetch_events (callable): fetch_events(início, fim) com datas YYYY-MM-DD,
+                                     retorna os eventos da SP ou None em caso de falha
+
+        Returns:
+            DataFrame: Cubo do período (novo objeto a cada atualização) ou None em caso de falha
+        """
+        with self._lock:
+            now = datetime.now()
+            period_start = datetime.strptime(self.start_date, DAY_FORMAT)
+
+            if self._cube is None:
+                since = period_start
+            else:
+                since = (self._watermark - timedelta(hours=USAGE_CUBE_LOOKBACK_HOURS)).replace(
+                    hour=0, minute=0, second=0, microsecond=0)
+                since = max(since, period_start)
+
+            events = fetch_events(since.strftime(DAY_FORMAT), self.end_date)
+            if events is None:
+                return self._cube
+
+            fresh = build_usage_cube(events)
+            if self._cube is not None:
+                kept = self._cube[self._cube['day'] < pd.Timestamp(since)]
+                fresh = pd.concat([kept, fresh], ignore_index=True)
+                for column in TEXT_DIMENSIONS:
+                    fresh[column] = fresh[column].astype('category')
+
+            trace(f"Cubo do período corrente {self.start_date} até {self.end_date} "
+                  f"atualizado desde {since.date()}: {len(events)} eventos consultados")
+            self._cube = fresh
+            self._watermark = now
+            return fresh
+
+
+_running_cubes = {}
+_running_cubes_lock = threading.Lock()
+
+
+def is_current_period(start_date, end_date):
+    """Indica se o período (YYYY-MM-DD) inclui o dia de hoje."""
+    today = datetime.now().strftime(DAY_FORMAT)
+    return start_date[:10] <= today <= end_date[:10]
+
+
+def get_running_usage_cube(start_date, end_date):
+    """Retorna o cubo em memória do período corrente (um por período; períodos encerrados são descartados)."""
+    with _running_cubes_lock:
+        for key in [key for key in _running_cubes if not is_current_period(*key)]:
+            del _running_cubes[key]
+
+        key = (start_date, end_date)
+        if key not in _running_cubes:
+            _running_cubes[key] = RunningUsageCube(start_date, end_date)
+        return _running_cubes[key]
@@ -5,47 +5,17 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import time
 from utils.tracer import trace, report_exception
 from data.db_connection import get_db_connection
+from data.result_cache import invalidate_dashboard_cache
+from utils.durations import minutes_from_hhmm
 from data.local_db_handler import get_db_handler
+from data.clients_summary import refresh_clients_usage_summary
 from contextlib import closing
+from functools import partial
 from datetime import datetime, timedelta
 import numpy as np
 import pandas as pd
 
 
-def convert_time_to_minutes(time_value):
-    """
-    Converte valor HH:MM para total de minutos.
-    """
-    try:
-        if pd.isna(time_value) or time_value is None or time_value == '':
-            return 0.0
-
-        # Se for string, remove espaços
-        if isinstance(time_value, str):
-            time_value = time_value.strip()
-            if time_value == '':
-                return 0.0
-
-            # Formato esperado: HH:MM
-            if ':' in time_value:
-                parts = time_value.split(':')
-                if len(parts) >= 2:
-                    hours = int(parts[0])
-                    minutes = int(parts[1])
-                    total_minutes = (hours * 60) + minutes
-                    # print(f"DEBUG: Convertendo {time_value} -> {total_minutes} minutos")
-                    return float(total_minutes)
-
-        # Se não conseguiu converter, tenta como float direto
-        result = float(time_value)
-        # print(f"DEBUG: Valor {time_value} convertido diretamente para {result}")
-        return result
-
-    except (ValueError, TypeError) as e:
-        print(f"ERRO: Erro ao converter tempo {time_value}: {str(e)}")
-        return 0.0
-
-
 def calculate_week_range(start_date=None):
     """
     Calcula o intervalo de semanas a partir de uma data inicial.
@@ -80,43 +50,307 @@ def safe_convert_hours(value):
         return 0.0
 
 
-def normalize_datetime_string(dt_value):
+def normalize_datetime_strings(values):
     """
-    Normaliza valores de datetime para string padronizada.
-    Trata valores nulos como string vazia para comparação.
+    Normaliza uma coluna de datas para texto 'YYYY-MM-DD HH:MM:SS', de uma vez.
+    Valores nulos ou inválidos viram string vazia.
+
+    Args:
+        values (Series): Datas (datetime ou texto)
+
+    Returns:
+        Series: Textos normalizados, com o mesmo índice da entrada
     """
-    if pd.isna(dt_value) or dt_value is None:
-        return ""
+    parsed = pd.to_datetime(values, errors='coerce')
 
-    try:
-        if isinstance(dt_value, str):
-            # Se já é string, tenta converter para datetime e depois para string padronizada
-            dt_obj = pd.to_datetime(dt_value, errors='coerce')
-            if pd.isna(dt_obj):
-                return ""
-            return dt_obj.strftime('%Y-%m-%d %H:%M:%S')
-        else:
-            # Se é datetime, converte direto
-            return pd.to_datetime(dt_value).strftime('%Y-%m-%d %H:%M:%S')
-    except:
-        return str(dt_value) if dt_value else ""
+    # Textos em formato diferente do inferido na primeira linha: nova tentativa elemento a elemento
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry].astype(str), errors='coerce', format='mixed')
 
+    return parsed.dt.strftime('%Y-%m-%d %H:%M:%S').fillna('')
 
-def create_unique_key(client_name, entry_time, exit_time):
+
+def usage_keys(client_names, entry_times, exit_times):
     """
-    Cria uma chave única para identificar registros duplicados.
+    Chaves de comparação (cliente em maiúsculas, entrada, saída) dos registros
+    de clients_usage, para anti-join com os registros já gravados.
+
+    Returns:
+        MultiIndex: Uma chave por registro
     """
-    # Normalizar strings para comparação
-    client = str(client_name).strip().upper() if client_name else "UNKNOWN"
-    entry = normalize_datetime_string(entry_time)
-    exit = normalize_datetime_string(exit_time)
+    clients = pd.Series(client_names, dtype=object).astype(str).str.strip().str.upper()
+    return pd.MultiIndex.from_arrays([
+        clients.to_numpy(),
+        pd.Series(entry_times, dtype=object).to_numpy(),
+        pd.Series(exit_times, dtype=object).to_numpy(),
+    ])
+
+
+# Horário (HH:MM) da carga diária agendada de clients_usage
+CLIENTS_USAGE_INGESTION_TIME = os.environ.get('CLIENTS_USAGE_INGESTION_TIME', '00:15')
+# Nome do job agendado da carga (data/scheduler.py)
+INGESTION_JOB_NAME = 'clients_usage_ingestion'
 
-    return f"{client}|{entry}|{exit}"
+# Nome do checkpoint em ingestion_state das cargas por intervalo de clients_usage
+INGESTION_NAME = 'clients_usage'
 
 
-def process_weekly_data(start_date=None, end_date=None):
+def iter_iso_weeks(start_date, end_date):
+    """
+    Semanas ISO (segunda a domingo) que intersectam o intervalo.
+
+    Yields:
+        tuple: (início da semana, início da busca, fim da busca); a busca é
+               recortada ao intervalo, o início da semana identifica os registros
+    """
+    week_start, _ = calculate_week_range(start_date)
+    while week_start <= end_date:
+        week_end = week_start + timedelta(days=6, hours=23, minutes=59, seconds=59)
+        yield week_start, max(start_date, week_start), min(end_date, week_end)
+        week_start += timedelta(weeks=1)
+
+
+def get_ingestion_state(conn, name=INGESTION_NAME):
+    """
+    Checkpoint da última carga por intervalo.
+
+    Returns:
+        dict: range_start, range_end, next_week, weeks_done, status e updated_at (None se não houver)
+    """
+    row = conn.execute("""
+        SELECT range_start, range_end, next_week, weeks_done, status, updated_at
+        FROM ingestion_state WHERE name = ?
+    """, (name,)).fetchone()
+    return dict(row) if row else None
+
+
+def _save_ingestion_state(name, range_start, range_end, next_week, weeks_done, status, conn):
+    """Grava o checkpoint na transação corrente (sem commit)."""
+    conn.execute("""
+        INSERT INTO ingestion_state (name, range_start, range_end, next_week, weeks_done, status, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(name) DO UPDATE SET
+            range_start = excluded.range_start,
+            range_end = excluded.range_end,
+            next_week = excluded.next_week,
+            weeks_done = excluded.weeks_done,
+            status = excluded.status,
+            updated_at = excluded.updated_at
+    """, (name, range_start, range_end, next_week, weeks_done, status))
+
+
+def _process_week(db_handler, sql_connection, start_of_week, fetch_start, fetch_end, checkpoint=None):
+    """
+    Busca uma semana na stored procedure e grava em clients_usage (store_week).
+
+    Args:
+        start_of_week (datetime): Segunda-feira da semana (define week_number, year e start_date)
+        fetch_start (datetime): Início da busca na stored procedure
+        fetch_end (datetime): Fim da busca na stored procedure
+        checkpoint (callable, opcional): checkpoint(conn), gravado na mesma transação dos registros
+
+    Returns:
+        dict: Resultado da semana com contadores, ou {"error": ...} se a consulta
+              falhar (sem checkpoint: a semana é refeita na retomada)
+    """
+    trace(f"Processando dados de {fetch_start.strftime('%Y-%m-%d %H:%M:%S')} a {fetch_end.strftime('%Y-%m-%d %H:%M:%S')}")
+
+    # Obter dados do banco principal (dia a dia, em paralelo)
+    dashboard_df = sql_connection.execute_stored_procedure_range_df(
+        "sp_VehicleAccessReport", fetch_start, fetch_end, split='day'
+    )
+
+    if dashboard_df is None:
+        trace("Falha na consulta à stored procedure.", color="red")
+        return {"error": f"Falha na consulta à stored procedure para a semana de {start_of_week.strftime('%Y-%m-%d')}"}
+
+    return store_week(db_handler, start_of_week, dashboard_df, checkpoint)
+
+
+def store_week(db_handler, start_of_week, dashboard_df, checkpoint=None):
+    """
+    Grava em clients_usage os eventos da SP de uma semana, em uma única
+    transação, ignorando os já gravados.
+
+    Args:
+        start_of_week (datetime): Segunda-feira da semana (define week_number, year e start_date)
+        dashboard_df (DataFrame): Resultado da sp_VehicleAccessReport para a semana
+        checkpoint (callable, opcional): checkpoint(conn), gravado na mesma transação dos registros
+
+    Returns:
+        dict: Resultado da semana com contadores
+    """
+    end_of_week = start_of_week + timedelta(days=6)
+
+    if dashboard_df.empty:
+        trace("Nenhum dado retornado pela stored procedure.", color="yellow")
+        if checkpoint is not None:
+            with db_handler.transaction():
+                checkpoint(db_handler.conn)
+        return {"status": "success", "records_inserted": 0, "duplicates_ignored": 0, "total_processed": 0,
+                "message": "Nenhum dado disponível para o período"}
+
+    trace(f"Dados retornados da stored procedure: {len(dashboard_df)} registros")
+
+    # Preparar dados para inserção
+    week_number = start_of_week.isocalendar()[1]
+    year = start_of_week.year
+    start_date_str = start_of_week.strftime('%Y-%m-%d')
+    end_date_str = end_of_week.strftime('%Y-%m-%d')
+
+    # Montar os registros de uma vez (colunas inteiras, sem iterar linhas)
+    def text_column(name):
+        if name not in dashboard_df.columns:
+            return pd.Series('Unknown', index=dashboard_df.index, dtype=object)
+        return dashboard_df[name].astype(str).str.strip()
+
+    records = pd.DataFrame({
+        'client_name': text_column('Vehicle'),
+        'classification': text_column('EJA'),
+        # StayTime em minutos totais, com as regras da carga semanal ('H:MM:SS' e números aceitos)
+        'hours': minutes_from_hhmm(dashboard_df['StayTime'], allow_seconds=True, numeric_fallback=True),
+        'entry_time': normalize_datetime_strings(dashboard_df['VehicleEntranceTime']).replace('', '00:00'),
+        'exit_time': normalize_datetime_strings(dashboard_df['VehicleExitTime']),
+    })
+    total_processed = len(records)
+
+    # Repetições dentro do próprio lote contam como duplicatas
+    records = records[~usage_keys(records['client_name'], records['entry_time'],
+                                  records['exit_time']).duplicated()]
+
+    trace(f"Registros processados: {total_processed}")
+
+    # Buscar existentes e gravar em uma única transação (com o resumo e o checkpoint)
+    with closing(db_handler.conn.cursor()) as cursor, db_handler.transaction():
+        # Buscar registros existentes que se sobrepõem ao período
+        existing = pd.read_sql_query("""
+            SELECT client_name, entry_time, exit_time
+            FROM clients_usage
+            WHERE (start_date <= ? AND end_date >= ?) 
+               OR (start_date <= ? AND end_date >= ?)
+               OR (start_date >= ? AND end_date <= ?)
+        """, db_handler.conn,
+            params=(end_date_str, start_date_str, end_date_str, end_date_str, start_date_str, end_date_str))
+
+        trace(f"Registros existentes no período: {len(existing)}")
+
+        # Anti-join: apenas chaves ainda não gravadas
+        is_new = ~usage_keys(records['client_name'], records['entry_time'], records['exit_time']).isin(
+            usage_keys(existing['client_name'], existing['entry_time'], existing['exit_time'])
+        )
+        new_records = records[is_new]
+        duplicates_found = total_processed - len(new_records)
+
+        trace(f"Novos registros para inserir: {len(new_records)}")
+        trace(f"Duplicatas encontradas e ignoradas: {duplicates_found}")
+
+        # Inserir novos registros em lote; a restrição UNIQUE (client_name,
+        # entry_time, exit_time) descarta o que escapar do anti-join
+        inserted_count = 0
+        if not new_records.empty:
+            rows = [
+                (week_number, year, start_date_str, end_date_str,
+                 client_name, classification, hours, entry_time, exit_time)
+                for client_name, classification, hours, entry_time, exit_time in zip(
+                    new_records['client_name'].tolist(),
+                    new_records['classification'].tolist(),
+                    new_records['hours'].tolist(),
+                    new_records['entry_time'].tolist(),
+                    new_records['exit_time'].tolist()
+                )
+            ]
+            cursor.executemany("""
+                INSERT OR IGNORE INTO clients_usage
+                (week_number, year, start_date, end_date, client_name, classification, hours, entry_time, exit_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            inserted_count = cursor.rowcount
+            duplicates_found += len(rows) - inserted_count
+
+        refresh_clients_usage_summary(db_handler.conn, [start_date_str])
+        if checkpoint is not None:
+            checkpoint(db_handler.conn)
+
+    invalidate_dashboard_cache()
+
+    result_message = f"Processamento concluído. Inseridos: {inserted_count}, Duplicatas ignoradas: {duplicates_found}"
+    trace(result_message, color="green")
+
+    return {
+        "status": "success",
+        "records_inserted": inserted_count,
+        "duplicates_ignored": duplicates_found,
+        "total_processed": total_processed,
+        "message": result_message
+    }
+
+
+def _ingest_weeks(db_handler, sql_connection, range_start, range_end, resume=True):
+    """
+    Carga de um intervalo longo semana a semana (ISO): cada semana é buscada
+    e gravada como um bloco próprio, com checkpoint em ingestion_state na
+    mesma transação. Uma carga interrompida é retomada na semana seguinte à
+    última gravada quando chamada novamente com o mesmo intervalo.
+
+    Returns:
+        dict: Resultado consolidado com contadores e semanas processadas, ou
+              {"error": ...} (com os contadores até a falha) se uma semana falhar
+    """
+    conn = db_handler.conn
+    range_start_str = range_start.strftime('%Y-%m-%d %H:%M:%S')
+    range_end_str = range_end.strftime('%Y-%m-%d %H:%M:%S')
+    weeks = list(iter_iso_weeks(range_start, range_end))
+
+    weeks_done = 0
+    state = get_ingestion_state(conn)
+    if (resume and state and state['status'] == 'running'
+            and (state['range_start'], state['range_end']) == (range_start_str, range_end_str)):
+        weeks = [week for week in weeks if week[0].strftime('%Y-%m-%d') >= state['next_week']]
+        weeks_done = state['weeks_done']
+        trace(f"Retomando carga a partir da semana de {state['next_week']} "
+              f"({weeks_done} semanas já concluídas)", color="yellow")
+
+    totals = {"records_inserted": 0, "duplicates_ignored": 0, "total_processed": 0}
+    for index, (start_of_week, fetch_start, fetch_end) in enumerate(weeks):
+        last = index == len(weeks) - 1
+        next_week = start_of_week + timedelta(weeks=1)
+        checkpoint = partial(
+            _save_ingestion_state, INGESTION_NAME, range_start_str, range_end_str,
+            next_week.strftime('%Y-%m-%d'), weeks_done + 1, 'done' if last else 'running'
+        )
+
+        result = _process_week(db_handler, sql_connection, start_of_week, fetch_start, fetch_end, checkpoint)
+        if "error" in result:
+            # O checkpoint continua na semana com falha: a próxima chamada com o mesmo intervalo a refaz
+            trace(f"Carga interrompida na semana de {start_of_week.strftime('%Y-%m-%d')}", color="red")
+            return {**totals, "weeks_processed": index, "error": result["error"]}
+
+        weeks_done += 1
+        for key in totals:
+            totals[key] += result.get(key, 0)
+
+    result_message = (f"Carga concluída: {len(weeks)} semanas. Inseridos: {totals['records_inserted']}, "
+                      f"Duplicatas ignoradas: {totals['duplicates_ignored']}")
+    trace(result_message, color="green")
+
+    return {"status": "success", **totals, "weeks_processed": len(weeks), "message": result_message}
+
+
+def process_weekly_data(start_date=None, end_date=None, resume=True):
     """
     Processa os dados semanais evitando duplicatas de forma simples e robusta.
+
+    Sem intervalo, processa a semana de `start_date` (padrão: semana atual).
+    Com intervalo, carrega semana a semana com checkpoint (ver _ingest_weeks).
+
+    Args:
+        start_date (date | datetime, opcional): Início do intervalo
+        end_date (date | datetime, opcional): Fim do intervalo
+        resume (bool): Retomar uma carga interrompida do mesmo intervalo
+
+    Returns:
+        dict: Resultado com contadores ou {"error": ...}
     """
     try:
         db_handler = get_db_handler()
@@ -126,186 +360,64 @@ def process_weekly_data(start_date=None, end_date=None):
             trace("Falha na conexão com o banco de dados principal.", color="red")
             return {"error": "Conexão com o banco de dados principal falhou"}
 
-        # Calcular intervalo da semana
         if start_date and end_date:
-            if isinstance(start_date, datetime):
-                start_of_week = start_date
-            else:
-                start_of_week = datetime.combine(start_date, datetime.min.time())
-
-            if isinstance(end_date, datetime):
-                end_of_week = end_date
-            else:
-                end_of_week = datetime.combine(end_date, datetime.max.time())
-        else:
-            start_of_week, end_of_week = calculate_week_range(start_date)
-
-        trace(f"Processando dados de {start_of_week.strftime('%Y-%m-%d %H:%M:%S')} a {end_of_week.strftime('%Y-%m-%d %H:%M:%S')}")
+            if not isinstance(start_date, datetime):
+                start_date = datetime.combine(start_date, datetime.min.time())
+            if not isinstance(end_date, datetime):
+                end_date = datetime.combine(end_date, datetime.max.time())
+            return _ingest_weeks(db_handler, sql_connection, start_date, end_date, resume)
 
-        # Obter dados do banco principal
-        dashboard_df = sql_connection.execute_stored_procedure_df(
-            "sp_VehicleAccessReport",
-            [start_of_week.strftime('%Y-%m-%d %H:%M:%S'), end_of_week.strftime('%Y-%m-%d %H:%M:%S')]
-        )
-
-        if dashboard_df is None or dashboard_df.empty:
-            trace("Nenhum dado retornado pela stored procedure.", color="yellow")
-            return {"status": "success", "records_inserted": 0, "message": "Nenhum dado disponível para o período"}
-
-        # print(dashboard_df)
-        trace(f"Dados retornados da stored procedure: {len(dashboard_df)} registros")
-
-        # Preparar dados para inserção
-        week_number = start_of_week.isocalendar()[1]
-        year = start_of_week.year
-        start_date_str = start_of_week.strftime('%Y-%m-%d')
-        end_date_str = end_of_week.strftime('%Y-%m-%d')
-
-        # Processar cada linha dos dados retornados
-        records_to_process = []
-        for _, row in dashboard_df.iterrows():
-            # Normalizar dados
-            client_name = str(row.get('Vehicle', 'Unknown')).strip()
-            classification = str(row.get('EJA', 'Unknown')).strip()
-
-            # Converter StayTime (HH:MM) para total de minutos
-            stay_time_value = row.get('StayTime')
-            minutes = convert_time_to_minutes(stay_time_value)
-            # print(f"DEBUG: Cliente {client_name}, StayTime: {stay_time_value}, Minutos: {minutes}")
-
-            entry_time = normalize_datetime_string(row.get('VehicleEntranceTime'))
-            exit_time = normalize_datetime_string(row.get('VehicleExitTime'))
-
-            # Criar chave única para detectar duplicatas
-            unique_key = create_unique_key(client_name, entry_time, exit_time)
-
-            records_to_process.append({
-                'unique_key': unique_key,
-                'week_number': week_number,
-                'year': year,
-                'start_date': start_date_str,
-                'end_date': end_date_str,
-                'client_name': client_name,
-                'classification': classification,
-                'hours': minutes,  # Agora são minutos totais
-                'entry_time': entry_time if entry_time else "00:00",
-                'exit_time': exit_time if exit_time else ""
-            })
-
-        trace(f"Registros processados: {len(records_to_process)}")
-
-        # Obter registros existentes no período para evitar duplicatas
-        with closing(db_handler.conn.cursor()) as cursor:
-            cursor.execute("BEGIN TRANSACTION")
-
-            try:
-                # Buscar registros existentes que se sobrepõem ao período
-                cursor.execute("""
-                    SELECT client_name, entry_time, exit_time
-                    FROM clients_usage
-                    WHERE (start_date <= ? AND end_date >= ?) 
-                       OR (start_date <= ? AND end_date >= ?)
-                       OR (start_date >= ? AND end_date <= ?)
-                """, (end_date_str, start_date_str, end_date_str, end_date_str, start_date_str, end_date_str))
-
-                existing_records = cursor.fetchall()
-
-                # Criar set de chaves existentes para comparação rápida
-                existing_keys = set()
-                for record in existing_records:
-                    existing_key = create_unique_key(
-                        record[0],  # client_name
-                        record[1],  # entry_time
-                        record[2]   # exit_time
-                    )
-                    existing_keys.add(existing_key)
-
-                trace(f"Registros existentes no período: {len(existing_keys)}")
-
-                # Filtrar apenas registros novos
-                new_records = []
-                duplicates_found = 0
-
-                for record in records_to_process:
-                    if record['unique_key'] not in existing_keys:
-                        new_records.append(record)
-                    else:
-                        duplicates_found += 1
-
-                # print(new_records[:5])
-                trace(f"Novos registros para inserir: {len(new_records)}")
-                trace(f"Duplicatas encontradas e ignoradas: {duplicates_found}")
-
-                # Inserir novos registros
-                inserted_count = 0
-                if new_records:
-                    for record in new_records:
-                        try:
-                            cursor.execute("""
-                                INSERT INTO clients_usage
-                                (week_number, year, start_date, end_date, client_name, classification, hours, entry_time, exit_time)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """, (
-                                record['week_number'],
-                                record['year'],
-                                record['start_date'],
-                                record['end_date'],
-                                record['client_name'],
-                                record['classification'],
-                                record['hours'],
-                                record['entry_time'],
-                                record['exit_time']
-                            ))
-                            inserted_count += 1
-                        except Exception as e:
-                            trace(f"Erro ao inserir registro {record['client_name']}: {str(e)}", color="yellow")
-                            continue
-
-                db_handler.conn.commit()
-
-                result_message = f"Processamento concluído. Inseridos: {inserted_count}, Duplicatas ignoradas: {duplicates_found}"
-                trace(result_message, color="green")
-
-                return {
-                    "status": "success",
-                    "records_inserted": inserted_count,
-                    "duplicates_ignored": duplicates_found,
-                    "total_processed": len(records_to_process),
-                    "message": result_message
-                }
-
-            except Exception as e:
-                db_handler.conn.rollback()
-                raise e
+        start_of_week, end_of_week = calculate_week_range(start_date)
+        return _process_week(db_handler, sql_connection, start_of_week, start_of_week, end_of_week)
 
     except Exception as e:
-        if 'db_handler' in locals() and hasattr(db_handler, 'conn'):
-            db_handler.conn.rollback()
         report_exception(e)
         trace(f"Erro ao processar dados: {str(e)}", color="red")
         return {"error": str(e)}
 
 
+def ingest_since(last_success=None):
+    """
+    Job agendado: carrega clients_usage desde a semana da última execução
+    bem-sucedida (na primeira vez, a semana de ontem) até agora. Após uma
+    parada, as semanas perdidas entram na mesma carga.
+
+    Qualquer semana com falha (inclusive na consulta à SP) interrompe a carga
+    com exceção: o agendador não avança last_success, e a nova tentativa
+    recomeça na mesma semana.
+
+    Raises:
+        RuntimeError: Se a carga falhar (o agendador registra e tenta novamente)
+    """
+    now = datetime.now()
+    start_of_week, _ = calculate_week_range(last_success or now - timedelta(days=1))
+
+    result = process_weekly_data(start_of_week, now, resume=False)
+    if "error" in result or result.get("status") != "success":
+        raise RuntimeError(result.get("error") or f"Carga de clients_usage não concluída: {result}")
+
+    expected_weeks = len(list(iter_iso_weeks(start_of_week, now)))
+    if result.get("weeks_processed") != expected_weeks:
+        raise RuntimeError(f"Carga de clients_usage incompleta: {result.get('weeks_processed')} "
+                           f"de {expected_weeks} semanas")
+    return result
+
+
 def setup_scheduler():
     """
-    Configura o agendador para ser executado dentro de outra aplicação.
-    Args:
-        run_immediately (bool): Se True, executa o processamento imediatamente
+    Registra a carga de clients_usage no agendador do processo (diariamente
+    às CLIENTS_USAGE_INGESTION_TIME) e inicia o agendador.
+
     Returns:
-        schedule.Job: O job agendado
+        Job: O job agendado (None se o agendador estiver desativado)
     """
-    import schedule
-    import threading
-
-    # # Agendar para todas as segundas-feiras às 00:15
-    # schedule.every().day.at("00:15").do(process_weekly_data, [])
-    # trace("Agendamento configurado: Processamento de dados de cliente todos os dias às 00:15", color="green")
+    from data.scheduler import Job, schedule_job
 
-    # # Iniciar thread para verificar agendamentos pendentes
-    # def run_scheduler():
-    #     while True:
-    #         schedule.run_pending()
-    #         time.sleep(60) # Verifica a cada minuto
+    job = schedule_job(Job(INGESTION_JOB_NAME, ingest_since, at=CLIENTS_USAGE_INGESTION_TIME, catch_up=True))
+    if job is not None:
+        trace(f"Agendamento configurado: carga de clientes diariamente às {CLIENTS_USAGE_INGESTION_TIME}",
+              color="green")
+    return job
 
 
 def run_weekly_processing():
@@ -348,6 +460,8 @@ def run_weekly_processing():
             print(f"Registros inseridos: {result.get('records_inserted', 0)}")
             print(f"Duplicatas ignoradas: {result.get('duplicates_ignored', 0)}")
             print(f"Total processado: {result.get('total_processed', 0)}")
+            if 'weeks_processed' in result:
+                print(f"Semanas processadas: {result['weeks_processed']}")
             if 'message' in result:
                 print(f"Mensagem: {result['message']}")
 
@@ -7,6 +7,7 @@ from utils.helpers import *
 from config.layout_config import layout_config
 
 from data.tracks_manager import adjust_tracks_names
+from utils.durations import parse_hhmm
 
 from components.sections import (
     create_section_container, create_section_header,
@@ -30,10 +31,7 @@ def create_track_section(tracks_data, total_hours):
             total_minutes = 0
             for track_info in tracks_data.values():
                 if isinstance(track_info, dict) and 'track_time' in track_info:
-                    track_time = track_info['track_time']
-                    if track_time and ':' in track_time:
-                        hours, minutes = map(int, track_time.split(':'))
-                        total_minutes += hours * 60 + minutes
+                    total_minutes += track_info.get('track_minutes', parse_hhmm(track_info['track_time']))
 
             # Converter minutos totais para formato HH:MM
             tracks_hours = total_minutes // 60
@@ -198,29 +196,19 @@ def safe_process_customers_data(dfs):
 
     try:
         from data.local_db_handler import get_db_handler
+        from data.clients_summary import get_classification_totals
         db_handler = get_db_handler()
 
-        # Query EXATA que funciona no banco
-        query = """
-            SELECT 
-                e.new_classification as classification,
-                COUNT(*) as registros,
-                SUM(c.hours) as total_minutos,
-                ROUND(SUM(c.hours) / 60.0, 2) as total_horas
-            FROM clients_usage c
-            INNER JOIN eja e ON c.classification = e.eja_code
-            WHERE e.new_classification IS NOT NULL
-              AND e.new_classification != ''
-            GROUP BY e.new_classification
-            ORDER BY total_minutos DESC
-        """
-
-        print("Executando query exata do banco...")
-        cursor = db_handler.conn.cursor()
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        print(f"Query retornou {len(rows)} resultados:")
+        # Totais por classificação do resumo materializado de clients_usage
+        try:
+            rows = [
+                (classification, records, minutes, round(minutes / 60.0, 2))
+                for classification, records, minutes in get_classification_totals(db_handler.conn)
+            ]
+        finally:
+            db_handler.close()
+
+        print(f"Resumo retornou {len(rows)} resultados:")
 
         if not rows:
             print("Nenhum resultado retornado")
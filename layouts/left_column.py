@@ -2,11 +2,13 @@
 import dash
 import traceback
 from datetime import datetime, timedelta
+from contextlib import closing
 import pandas as pd
 from utils.tracer import trace, report_exception
 from dash import html
 
 from data.local_db_handler import get_db_handler
+from utils.durations import parse_hhmm
 
 from utils.helpers import *
 from components.sections import (
@@ -161,8 +163,9 @@ def get_utilization_data():
             ORDER BY year, month
         """
 
-        db_handler.cursor.execute(query, (year_start, year_start, month_start))
-        rows = db_handler.cursor.fetchall()
+        with closing(db_handler.conn.cursor()) as cursor:
+            cursor.execute(query, (year_start, year_start, month_start))
+            rows = cursor.fetchall()
 
         # Atualizar os meses que têm dados
         for row in rows:
@@ -248,8 +251,9 @@ def get_availability_data():
             ORDER BY year, month
         """
 
-        db_handler.cursor.execute(query, (year_start, year_start, month_start))
-        rows = db_handler.cursor.fetchall()
+        with closing(db_handler.conn.cursor()) as cursor:
+            cursor.execute(query, (year_start, year_start, month_start))
+            rows = cursor.fetchall()
 
         # Atualizar os meses que têm dados
         for row in rows:
@@ -324,12 +328,9 @@ def create_utilization_availability_column(dfs, ytd_utilization_percentage, ytd_
 
         # Se ainda temos um valor string no formato "HH:MM", converter
         if isinstance(dfs.get('total_hours', ''), str) and ':' in dfs.get('total_hours', ''):
-            try:
-                horas, minutos = map(int, dfs.get('total_hours', '').split(':'))
-                total_horas_decimal = horas + (minutos / 60.0)
-            except Exception:
-                # Se falhar, usar a soma calculada acima
-                pass
+            total_minutes = parse_hhmm(dfs['total_hours'], default=None)
+            if total_minutes is not None:
+                total_horas_decimal = total_minutes / 60.0
 
         # ===== CALCULAR SOMAS PARA CADA CATEGORIA =====
         programas_horas = float(dfs['programs']['hours'].sum() if 'programs' in dfs and 'hours' in dfs['programs'].columns else 0)
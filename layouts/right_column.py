@@ -1,6 +1,8 @@
 # layouts/right_column.py
 from dash import html
 
+from utils.durations import parse_hhmm
+
 from components.sections import (
     create_section_container, create_section_header,
     create_metric_header, create_graph_section,
@@ -18,8 +20,7 @@ def create_optimized_utilization_breakdown(dfs, total_hours):
     try:
         # Extrair o valor numérico do total de horas
         if ':' in total_hours:
-            horas, minutos = map(int, total_hours.split(':'))
-            total_horas_decimal = horas + (minutos / 60.0)
+            total_horas_decimal = parse_hhmm(total_hours) / 60.0
         else:
             total_horas_decimal = float(total_hours)
 
@@ -2,9 +2,8 @@
 
 import os
 import sys
-import time
+from contextlib import closing
 import pandas as pd
-from datetime import datetime, timedelta
 
 # sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
@@ -13,210 +12,61 @@ from datetime import datetime, timedelta
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from data.local_db_handler import get_db_handler
-from data.db_connection import get_db_connection
-from data.database import ReportGenerator
+from data.migrations import apply_migrations, SCHEMA_VERSION
+from data.clients_summary import refresh_clients_usage_summary
+from data.backfill import backfill_weeks, BACKFILL_WORKERS
 
 
-def process_historical_weeks(num_weeks=52):
+def process_historical_weeks(num_weeks=52, workers=None):
     """
     Processa dados históricos para as últimas N semanas.
 
+    As semanas já carregadas são identificadas em uma única consulta; as
+    pendentes são buscadas em paralelo e gravadas por um único escritor
+    (data/backfill.py).
+
     Args:
         num_weeks (int): Número de semanas para processar
+        workers (int, opcional): Semanas consultadas simultaneamente (padrão: BACKFILL_WORKERS)
 
     Returns:
         int: Número de semanas processadas com sucesso
     """
-    # Obter conexões ao banco de dados
-    db_handler = get_db_handler()
-    sql_connection = get_db_connection()
-
-    if not sql_connection:
-        print("Não foi possível estabelecer conexão com o banco de dados principal.", color="red")
-        return 0
-
-    # Data de referência (hoje)
-    current_date = datetime.now()
-
-    success_count = 0
-    error_count = 0
-    skipped_count = 0
-
-    # Processar cada semana, da mais recente para a mais antiga
-    for week_offset in range(1, num_weeks + 1):
-        # Calcular a data de referência para esta semana
-        target_date = current_date - timedelta(weeks=week_offset)
-
-        # Calcular o intervalo da semana
-        start_of_week = target_date - timedelta(days=target_date.weekday())
-        start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_week = start_of_week + timedelta(days=6, hours=23, minutes=59, seconds=59)
-
-        # Calcular número da semana e ano
-        year = start_of_week.year
-        week_number = start_of_week.isocalendar()[1]
-
-        print(f"Processando semana {week_number}/{year}: {start_of_week.strftime('%Y-%m-%d')} a {end_of_week.strftime('%Y-%m-%d')}")
-
-        try:
-            # Verificar se já existem dados para esta semana
-            db_handler.cursor.execute(
-                "SELECT COUNT(*) FROM clients_usage WHERE week_number = ? AND year = ?",
-                (week_number, year)
-            )
-            count = db_handler.cursor.fetchone()[0]
-
-            if count > 0:
-                print(f"  Dados para semana {week_number}/{year} já existem ({count} registros). Pulando...")
-                skipped_count += 1
-                continue
-
-            # Formatar datas para a stored procedure
-            start_date_str = start_of_week.strftime('%Y-%m-%d 00:00:00.000')
-            end_date_str = end_of_week.strftime('%Y-%m-%d 23:59:59.999')
-
-            # Executar a stored procedure para obter os dados
-            print(f"  Consultando banco de dados para o período {start_date_str} a {end_date_str}...")
-            dashboard_df = sql_connection.execute_stored_procedure_df(
-                "sp_VehicleAccessReport",
-                [start_date_str, end_date_str]
-            )
-
-            if dashboard_df is None or dashboard_df.empty:
-                print(f"  Nenhum dado retornado pela stored procedure para semana {week_number}/{year}.")
-                error_count += 1
-                continue
-
-            print(f"  Processando {len(dashboard_df)} registros obtidos...")
-
-            # Usar o novo gerador de relatórios com SQLite
-            report_gen = ReportGenerator(dashboard_df=dashboard_df, db_handler=db_handler)
-
-            # Processar dados para cada classificação
-            classifications = ["PROGRAMS", "OTHER SKILL TEAMS", "INTERNAL USERS", "EXTERNAL SALES"]
-            inserted_count = 0
-
-            # Iniciar transação
-            db_handler.cursor.execute("BEGIN TRANSACTION")
-
-            try:
-                # Remover registros antigos para esta semana (se existirem)
-                db_handler.cursor.execute(
-                    "DELETE FROM clients_usage WHERE week_number = ? AND year = ?",
-                    (week_number, year)
-                )
-
-                # Processar e inserir dados para cada classificação
-                for classification in classifications:
-                    print(f"  Processando classificação: {classification}")
-                    report_data = report_gen.gerar_relatorio_eja(classification)
-
-                    if 'error' in report_data:
-                        print(f"    Erro ao processar dados para {classification}: {report_data['error']}")
-                        continue
-
-                    print(f"    Encontrados {len(report_data['top_itens'])} itens para {classification}")
-
-                    # Inserir dados para cada cliente na classificação
-                    for idx, item in enumerate(report_data['top_itens']):
-                        try:
-                            db_handler.cursor.execute('''
-                                INSERT INTO clients_usage
-                                (week_number, year, start_date, end_date, client_name, classification, hours)
-                                VALUES (?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                week_number,
-                                year,
-                                start_of_week.strftime('%Y-%m-%d'),
-                                end_of_week.strftime('%Y-%m-%d'),
-                                item['TITLE'],
-                                classification,
-                                item['HORAS_DECIMAL']
-                            ))
-                            inserted_count += 1
-
-                            if idx % 10 == 0:  # Log a cada 10 inserções
-                                print(f"      Progresso: {idx+1}/{len(report_data['top_itens'])} itens inseridos")
-
-                        except Exception as e:
-                            print(f"      ERRO ao inserir item {idx+1}: {str(e)}")
-
-                # Commit da transação
-                db_handler.conn.commit()
-                print(f"  Semana {week_number}/{year} processada com sucesso: {inserted_count} registros inseridos")
-                success_count += 1
-
-            except Exception as e:
-                # Rollback em caso de erro
-                db_handler.conn.rollback()
-                print(f"  Erro ao inserir dados para semana {week_number}/{year}: {str(e)}")
-                error_count += 1
-
-            # Pausa para não sobrecarregar o banco
-            time.sleep(1)
-
-        except Exception as e:
-            print(f"  Erro ao processar semana {week_number}/{year}: {str(e)}")
-            error_count += 1
+    summary = backfill_weeks(num_weeks, workers=workers or BACKFILL_WORKERS)
 
     print("\nResumo do processamento histórico:")
-    print(f"  Semanas processadas com sucesso: {success_count}")
-    print(f"  Semanas puladas (já existentes): {skipped_count}")
-    print(f"  Semanas com erro: {error_count}")
+    print(f"  Semanas processadas com sucesso: {summary['succeeded']}")
+    print(f"  Semanas puladas (já existentes): {summary['skipped']}")
+    print(f"  Semanas com erro: {summary['failed']}")
+    print(f"  Registros inseridos: {summary['records_inserted']}")
     print(f"  Total de semanas: {num_weeks}")
+    print(f"  Tempo total: {summary['elapsed']:.1f}s")
 
-    return success_count
+    return summary['succeeded']
+
+
+def week_start_dates(db_handler, week_number, year):
+    """Inícios de semana (start_date) gravados para a semana, para atualizar o resumo."""
+    rows = db_handler.conn.execute(
+        "SELECT DISTINCT start_date FROM clients_usage WHERE week_number = ? AND year = ?",
+        (week_number, year)
+    ).fetchall()
+    return [row[0] for row in rows]
 
 
 def verify_table_exists():
     """
-    Verifica se a tabela clients_usage existe e a cria se necessário.
+    Garante que o esquema do banco local (incluindo clients_usage) está
+    atualizado, aplicando as migrações pendentes (data/migrations.py).
 
     Returns:
-        bool: True se a tabela existe ou foi criada com sucesso
+        bool: True se o esquema está na versão atual
     """
     try:
         db_handler = get_db_handler()
-
-        # Verificar se a tabela existe
-        db_handler.cursor.execute("""
-            SELECT name FROM sqlite_master
-            WHERE type='table' AND name='clients_usage'
-        """)
-
-        if db_handler.cursor.fetchone() is None:
-            print("Tabela clients_usage não encontrada. Criando...")
-
-            # Criar a tabela
-            db_handler.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients_usage (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                week_number INTEGER NOT NULL,
-                year INTEGER NOT NULL,
-                start_date TEXT NOT NULL,
-                end_date TEXT NOT NULL,
-                client_name TEXT NOT NULL,
-                classification TEXT NOT NULL,
-                hours REAL NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                entry_time TEXT NOT NULL,
-                exit_time TEXT NOT NULL,
-                UNIQUE (client_name, entry_time, exit_time) ON CONFLICT IGNORE
-            )
-            ''')
-
-            # Criar índices
-            db_handler.cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_week ON clients_usage (week_number, year)')
-            db_handler.cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_date ON clients_usage (start_date, end_date)')
-            db_handler.cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_client ON clients_usage (client_name)')
-            db_handler.cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_usage_class ON clients_usage (classification)')
-
-            db_handler.conn.commit()
-            print("Tabela clients_usage criada com sucesso!")
-        else:
-            print("Tabela clients_usage já existe.")
-
-        return True
+        version = apply_migrations(db_handler.conn)
+        print(f"Esquema do banco local na versão {version}.")
+        return version == SCHEMA_VERSION
 
     except Exception as e:
         print(f"Erro ao verificar/criar tabela: {str(e)}")
@@ -233,21 +83,22 @@ def list_processed_weeks():
     try:
         db_handler = get_db_handler()
 
-        db_handler.cursor.execute("""
-            SELECT
-                year,
-                week_number,
-                start_date,
-                end_date,
-                COUNT(DISTINCT client_name) as client_count,
-                COUNT(*) as record_count,
-                SUM(hours) as total_hours
-            FROM clients_usage
-            GROUP BY year, week_number
-            ORDER BY year DESC, week_number DESC
-        """)
-
-        rows = db_handler.cursor.fetchall()
+        with closing(db_handler.conn.cursor()) as cursor:
+            cursor.execute("""
+                SELECT
+                    year,
+                    week_number,
+                    start_date,
+                    end_date,
+                    COUNT(DISTINCT client_name) as client_count,
+                    COUNT(*) as record_count,
+                    SUM(hours) as total_hours
+                FROM clients_usage
+                GROUP BY year, week_number
+                ORDER BY year DESC, week_number DESC
+            """)
+
+            rows = cursor.fetchall()
 
         if not rows:
             print("Nenhuma semana processada encontrada.")
@@ -284,23 +135,26 @@ def clear_week_data(year, week_number):
         db_handler = get_db_handler()
 
         # Verificar se existem dados para esta semana
-        db_handler.cursor.execute(
-            "SELECT COUNT(*) FROM clients_usage WHERE week_number = ? AND year = ?",
-            (week_number, year)
-        )
-        count = db_handler.cursor.fetchone()[0]
+        with closing(db_handler.conn.cursor()) as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM clients_usage WHERE week_number = ? AND year = ?",
+                (week_number, year)
+            )
+            count = cursor.fetchone()[0]
 
         if count == 0:
             print(f"Nenhum dado encontrado para semana {week_number}/{year}.")
             return False
 
         # Remover os dados
-        db_handler.cursor.execute(
-            "DELETE FROM clients_usage WHERE week_number = ? AND year = ?",
-            (week_number, year)
-        )
-
-        db_handler.conn.commit()
+        changed_weeks = week_start_dates(db_handler, week_number, year)
+        with db_handler.transaction():
+            with closing(db_handler.conn.cursor()) as cursor:
+                cursor.execute(
+                    "DELETE FROM clients_usage WHERE week_number = ? AND year = ?",
+                    (week_number, year)
+                )
+            refresh_clients_usage_summary(db_handler.conn, changed_weeks)
         print(f"Dados removidos com sucesso: {count} registros da semana {week_number}/{year}.")
         return True
 
@@ -327,8 +181,16 @@ if __name__ == "__main__":
             except ValueError:
                 print(f"Argumento inválido: {sys.argv[2]}. Usando padrão: 52 semanas.")
 
+        # Consultas simultâneas à SP (padrão: BACKFILL_WORKERS)
+        workers = None
+        if len(sys.argv) > 3:
+            try:
+                workers = int(sys.argv[3])
+            except ValueError:
+                print(f"Argumento inválido: {sys.argv[3]}. Usando padrão: {BACKFILL_WORKERS} consultas.")
+
         print(f"Iniciando processamento histórico para as últimas {weeks} semanas...")
-        processed = process_historical_weeks(weeks)
+        processed = process_historical_weeks(weeks, workers)
         print("Processamento histórico concluído.")
 
     elif command == "list":
@@ -1,11 +1,9 @@
 from utils.tracer import trace
-from data.weekly_processor import process_weekly_data
+from data.weekly_processor import setup_scheduler
+from data.scheduler import get_scheduler
 import os
 import sys
-import time
-import schedule
 import logging
-from datetime import datetime
 
 # Adicionar o diretório raiz ao path para importações
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -28,38 +26,34 @@ logging.basicConfig(
 logger = logging.getLogger("weekly_processor")
 
 
-def job():
-    """Função a ser executada no agendamento."""
-    logger.info("Iniciando processamento semanal de dados")
-    try:
-        success = process_weekly_data()
-        if success:
-            logger.info("Processamento semanal concluído com sucesso")
-        else:
-            logger.error("Falha no processamento semanal")
-    except Exception as e:
-        logger.exception(f"Erro durante o processamento semanal: {str(e)}")
-
-
 def main():
-    """Função principal para agendar o processamento semanal."""
+    """
+    Processo dedicado ao agendador: registra a carga de clientes e aguarda.
+    Pode rodar junto com o dashboard; a concessão gravada no SQLite garante
+    que apenas um dos processos execute cada carga.
+
+    Este processo não enxerga as consultas interativas do dashboard (contadas
+    em cada processo), então não adia a carga por elas: roda apenas com a
+    prioridade de CPU reduzida. Para adiar, deixe a carga com o agendador do
+    próprio dashboard.
+    """
     logger.info("Inicializando agendador de processamento semanal")
 
-    # Agendar para todas as segundas-feiras às 00:15
-    # Usamos 00:15 em vez de 00:00 para garantir que não haja conflito com outras tarefas de virada do dia
-    schedule.every().monday.at("00:15").do(job)
+    job = setup_scheduler()
+    if job is None:
+        logger.error("Agendador desativado (SCHEDULER_ENABLED=false)")
+        return
 
-    logger.info("Agendamento configurado: toda segunda-feira às 00:15")
+    logger.info(f"Agendamento configurado: {job.schedule}")
 
     # Executar imediatamente na primeira vez se desejado (opcional)
     if len(sys.argv) > 1 and sys.argv[1] == "--run-now":
         logger.info("Executando processamento inicial imediato")
-        job()
+        if not get_scheduler().run_now(job.name):
+            logger.info("Processamento já em andamento em outro processo")
 
-    # Loop principal para manter o agendador em execução
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Verifica a cada minuto
+    # Manter o processo ativo enquanto a thread do agendador roda
+    get_scheduler().join()
 
 
 if __name__ == "__main__":
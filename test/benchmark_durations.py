@@ -0,0 +1,103 @@
+# test/benchmark_durations.py
+# Compara a conversão vetorizada de StayTime (utils/durations.py) com o .apply por linha
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from utils.durations import minutes_from_hhmm, hours_from_hhmm, parse_hhmm
+
+
+def apply_time_to_hours(time_str):
+    """Conversão por linha usada anteriormente (SimplifiedDataProcessor._safe_time_to_hours)."""
+    if pd.isna(time_str) or not time_str or ':' not in str(time_str):
+        return 0.0
+    try:
+        parts = str(time_str).split(':')
+        if len(parts) != 2:
+            return 0.0
+        return int(parts[0]) + (int(parts[1]) / 60.0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+# Entradas fora do padrão HH:MM: o resultado deve ser o mesmo da conversão por linha
+EDGE_CASES = ['00:00', '7:05', ' 2:05', '12:5', '01:30:00', '1:2:3', '-1:30', '1:', ':30',
+              '45', '1.5', 'bad', '', None, float('nan')]
+
+
+def check_edge_cases():
+    expected = [apply_time_to_hours(value) for value in EDGE_CASES]
+    result = hours_from_hhmm(pd.Series(EDGE_CASES, dtype=object)).tolist()
+    assert np.allclose(expected, result), f"Casos especiais divergentes: {expected} != {result}"
+
+    # Carga semanal de clients_usage: regras do convert_time_to_minutes anterior
+    expected = [weekly_time_to_minutes(value) for value in EDGE_CASES]
+    result = minutes_from_hhmm(pd.Series(EDGE_CASES, dtype=object),
+                               allow_seconds=True, numeric_fallback=True).tolist()
+    assert np.allclose(expected, result), f"Casos especiais (carga semanal) divergentes: {expected} != {result}"
+    assert parse_hhmm('01:30:00', allow_seconds=True) == 90 and parse_hhmm('45', numeric_fallback=True) == 45
+    assert parse_hhmm('01:30:00') == 0 and parse_hhmm('01:30:00', default=None) is None
+    assert parse_hhmm('1:30') == 90 and parse_hhmm(45) == 45 and parse_hhmm(None) == 0
+    print(f"{len(EDGE_CASES)} casos especiais iguais às conversões por linha")
+
+
+def weekly_time_to_minutes(time_value):
+    """Conversão por linha usada anteriormente na carga semanal (convert_time_to_minutes)."""
+    try:
+        if pd.isna(time_value) or time_value is None or time_value == '':
+            return 0.0
+        if isinstance(time_value, str):
+            time_value = time_value.strip()
+            if time_value == '':
+                return 0.0
+            if ':' in time_value:
+                parts = time_value.split(':')
+                if len(parts) >= 2:
+                    return float(int(parts[0]) * 60 + int(parts[1]))
+        return float(time_value)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def build_stay_times(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    hours = rng.integers(0, 12, rows)
+    minutes = rng.integers(0, 60, rows)
+    values = np.array([f"{h:02d}:{m:02d}" for h, m in zip(hours, minutes)], dtype=object)
+    values[rng.random(rows) < 0.03] = None
+    values[rng.random(rows) < 0.01] = ''
+    values[rng.random(rows) < 0.01] = '01:30:00'
+    return pd.Series(values)
+
+
+def timed(label, func, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<28} {best * 1000:10.1f} ms")
+    return result, best
+
+
+if __name__ == '__main__':
+    check_edge_cases()
+
+    for rows in (10_000, 100_000, 1_000_000):
+        stay_time = build_stay_times(rows)
+        print(f"\n{rows:,} linhas")
+
+        expected, apply_time = timed("apply (por linha)", lambda: stay_time.apply(apply_time_to_hours))
+        result, vector_time = timed("minutes_from_hhmm", lambda: hours_from_hhmm(stay_time))
+        timed("minutes_from_hhmm (int)", lambda: minutes_from_hhmm(stay_time))
+
+        assert np.allclose(expected.to_numpy(), result.to_numpy()), "Resultados divergentes"
+        print(f"{'ganho':<28} {apply_time / vector_time:10.1f} x")
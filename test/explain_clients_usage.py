@@ -0,0 +1,113 @@
+# test/explain_clients_usage.py
+# Verifica (EXPLAIN QUERY PLAN) que as consultas de 12 meses de clients_usage
+# usam busca por faixa nos índices de cobertura de start_day, e que o resumo
+# por classificação (clients_usage_summary) confere com a agregação direta
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.local_db_handler import LocalDatabaseHandler
+from data.local_db_handler import LAST_12_MONTHS_START_DAY_SQL
+from data.simplified_processor import WEEKS_COUNT_LAST_12_MONTHS
+from data.clients_summary import refresh_clients_usage_summary, get_classification_totals
+
+
+def populate(conn, weeks=156, clients=50):
+    """Semanas sintéticas até hoje (start_date = segunda-feira da semana)."""
+    today = datetime.now()
+    monday = today - timedelta(days=today.weekday())
+    rows = []
+    for week in range(weeks):
+        start = monday - timedelta(weeks=week)
+        for client in range(clients):
+            rows.append((
+                start.isocalendar()[1], start.year, start.strftime('%Y-%m-%d'),
+                (start + timedelta(days=6)).strftime('%Y-%m-%d'), f"client-{client}",
+                str(1000 + client % 10), 60 + client, f"{start:%Y-%m-%d} {client:02d}:00:00", ""
+            ))
+    conn.executemany("""
+        INSERT INTO clients_usage
+        (week_number, year, start_date, end_date, client_name, classification, hours, entry_time, exit_time)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.executemany(
+        "INSERT INTO eja (eja_code, title, new_classification) VALUES (?, ?, ?)",
+        [(1000 + code, f"EJA {code}", f"Classe {code % 3}") for code in range(10)]
+    )
+    conn.commit()
+
+
+def query_plan(conn, query):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+
+
+def expected_weeks(conn):
+    """Mesma contagem pela expressão anterior (varredura de datetime(start_date))."""
+    return conn.execute("""
+        SELECT COUNT(DISTINCT year || '-' || week_number) FROM clients_usage
+        WHERE datetime(start_date) >= datetime('now', '-12 months')
+    """).fetchone()[0]
+
+
+def expected_classification_totals(conn, last_12_months):
+    """Mesmos totais pela junção direta de clients_usage com eja (consulta anterior ao resumo)."""
+    where = "AND datetime(c.start_date) >= datetime('now', '-12 months')" if last_12_months else ""
+    return [tuple(row) for row in conn.execute(f"""
+        SELECT e.new_classification, COUNT(*), SUM(c.hours) as total_minutos
+        FROM clients_usage c
+        INNER JOIN eja e ON c.classification = e.eja_code
+        WHERE e.new_classification IS NOT NULL AND e.new_classification != ''
+        {where}
+        GROUP BY e.new_classification
+        ORDER BY total_minutos DESC
+    """)]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        handler = LocalDatabaseHandler(db_path=os.path.join(directory, "explain.db"))
+        conn = handler.conn
+        populate(conn)
+        refresh_clients_usage_summary(conn)
+        conn.commit()
+        conn.execute("ANALYZE")
+
+        weeks_plan = query_plan(conn, WEEKS_COUNT_LAST_12_MONTHS)
+        print("Contagem de semanas:", weeks_plan)
+        assert any("USING COVERING INDEX idx_clients_usage_start_week (start_day>?)" in step
+                   for step in weeks_plan), weeks_plan
+
+        summary_plan = query_plan(
+            conn, f"SELECT classification, SUM(minutes) FROM clients_usage_summary "
+                  f"WHERE start_day >= {LAST_12_MONTHS_START_DAY_SQL} GROUP BY classification"
+        )
+        print("Resumo por classificação:", summary_plan)
+        assert any("USING COVERING INDEX idx_clients_usage_summary_day (start_day>?)" in step
+                   for step in summary_plan), summary_plan
+
+        weeks = conn.execute(WEEKS_COUNT_LAST_12_MONTHS).fetchone()[0]
+        assert weeks == expected_weeks(conn), (weeks, expected_weeks(conn))
+        print(f"Semanas nos últimos 12 meses: {weeks}")
+
+        for last_12_months in (False, True):
+            totals = get_classification_totals(conn, last_12_months=last_12_months)
+            assert totals == expected_classification_totals(conn, last_12_months), totals
+
+        # Semana reprocessada: apenas ela é recalculada no resumo
+        week = conn.execute("SELECT MAX(start_date) FROM clients_usage").fetchone()[0]
+        conn.execute("DELETE FROM clients_usage WHERE start_date = ? AND client_name = 'client-0'", (week,))
+        refresh_clients_usage_summary(conn, [week])
+        conn.commit()
+        assert get_classification_totals(conn) == expected_classification_totals(conn, False)
+        print(f"Horas por classificação: {get_classification_totals(conn, last_12_months=True)}")
+
+        handler.close()
+        print("OK")
+
+
+if __name__ == '__main__':
+    main()
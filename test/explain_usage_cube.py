@@ -0,0 +1,86 @@
+# test/explain_usage_cube.py
+# Verifica (EXPLAIN QUERY PLAN) que as leituras do cubo de utilização por período
+# usam busca por faixa de `day`: totais diários pelo índice de cobertura (sem ler
+# a tabela), linhas do período e busca por EJA pelos índices iniciados por `day`
+
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.local_db_handler import LocalDatabaseHandler
+from data.usage_cube import query_daily_totals, query_usage_cube
+
+
+def populate(conn, days=400, ejas=200):
+    """Dias sintéticos até hoje, uma linha por EJA e dia (metade com saída)."""
+    today = date.today()
+    rows = []
+    for offset in range(days):
+        day = (today - timedelta(days=offset)).strftime('%Y-%m-%d')
+        for eja in range(ejas):
+            rows.append((day, 1000 + eja, f"Local {eja % 5}", f"Depto {eja % 7}", f"V-{eja}",
+                         f"Empresa {eja % 3}", eja % 2, 30 + eja, 1 + eja % 4, f"{day} 08:00:00"))
+    conn.executemany("""
+        INSERT INTO usage_cube
+        (day, eja, locality_name, vehicle_department, vehicle, vehicle_company,
+         has_exit, minutes, events, first_entry)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+
+
+def query_plan(conn, query):
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        handler = LocalDatabaseHandler(db_path=os.path.join(directory, "explain.db"))
+        conn = handler.conn
+        populate(conn)
+        conn.execute("ANALYZE")
+
+        end = date.today()
+        start = end - timedelta(days=30)
+        period = f"day BETWEEN '{start:%Y-%m-%d}' AND '{end:%Y-%m-%d}'"
+
+        totals_plan = query_plan(
+            conn, f"SELECT day, SUM(minutes), SUM(events) FROM usage_cube "
+                  f"WHERE has_exit = 1 AND {period} GROUP BY day"
+        )
+        print("Totais diários:", totals_plan)
+        assert any("USING COVERING INDEX idx_usage_cube_day_totals (day>? AND day<?)" in step
+                   for step in totals_plan), totals_plan
+
+        rows_plan = query_plan(conn, f"SELECT * FROM usage_cube WHERE {period}")
+        print("Linhas do período:", rows_plan)
+        assert any("USING INDEX idx_usage_cube_day" in step and "(day>? AND day<?)" in step
+                   for step in rows_plan), rows_plan
+
+        eja_plan = query_plan(conn, f"SELECT SUM(minutes) FROM usage_cube WHERE {period} AND eja = 1010")
+        print("Busca por EJA:", eja_plan)
+        assert any("USING INDEX idx_usage_cube_day_eja" in step for step in eja_plan), eja_plan
+
+        # Mesmos resultados pelos índices e pela varredura da tabela
+        totals = query_daily_totals(conn, f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}")
+        expected = {row[0]: (int(row[1]), int(row[2])) for row in conn.execute(f"""
+            SELECT day, SUM(minutes), SUM(events) FROM usage_cube NOT INDEXED
+            WHERE has_exit = 1 AND {period} GROUP BY day
+        """)}
+        assert totals == expected, (totals, expected)
+
+        cube = query_usage_cube(conn, f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}")
+        assert len(cube) == conn.execute(
+            f"SELECT COUNT(*) FROM usage_cube NOT INDEXED WHERE {period}"
+        ).fetchone()[0]
+        print(f"Dias com totais: {len(totals)}, linhas do período: {len(cube)}")
+
+        handler.close()
+        print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# utils/durations.py
+# Conversão de durações (StayTime HH:MM) em minutos inteiros, de forma vetorizada.
+# Minutos inteiros são a unidade interna; o formato HH:MM é gerado apenas na exibição.
+
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def _parse_text(text, allow_seconds=False, numeric_fallback=False):
+    """
+    Converte um texto 'H:MM' em minutos; None se inválido.
+
+    Regras padrão (conversores do dashboard): exatamente duas partes inteiras,
+    'H:MM:SS' é inválido. A carga semanal de clients_usage aceita também
+    'H:MM:SS' (segundos ignorados, allow_seconds) e textos sem ':' como
+    número de minutos (numeric_fallback).
+    """
+    parts = text.split(':')
+    if len(parts) == 1 and numeric_fallback:
+        try:
+            value = float(text)
+        except ValueError:
+            return None
+        return value if math.isfinite(value) else None
+    if len(parts) < 2 or (len(parts) > 2 and not allow_seconds):
+        return None
+    try:
+        return int(parts[0]) * 60 + int(parts[1])
+    except ValueError:
+        return None
+
+
+def parse_hhmm(value, default=0, allow_seconds=False, numeric_fallback=False):
+    """
+    Converte um único valor HH:MM em minutos inteiros.
+
+    Args:
+        value: Texto 'HH:MM', número (já em minutos) ou vazio
+        default: Valor retornado para entradas vazias ou inválidas
+        allow_seconds (bool): Aceitar 'H:MM:SS' (segundos ignorados)
+        numeric_fallback (bool): Aceitar textos numéricos como minutos (sem arredondar)
+
+    Returns:
+        int: Total de minutos (float para números com numeric_fallback)
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return default
+    if isinstance(value, str):
+        minutes = _parse_text(value, allow_seconds, numeric_fallback)
+        return default if minutes is None else minutes
+    try:
+        return float(value) if numeric_fallback else int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def minutes_from_hhmm(values, allow_seconds=False, numeric_fallback=False):
+    """
+    Converte uma Series de StayTime (HH:MM) em minutos inteiros (int64).
+    Valores ausentes ou inválidos viram 0.
+
+    Os textos são fatorados antes da conversão: apenas os valores distintos
+    (algumas centenas por mês) são interpretados, e o resultado é expandido
+    por indexação.
+
+    Args:
+        values (Series | array-like): Durações 'HH:MM' ou minutos numéricos
+        allow_seconds, numeric_fallback: Regras de parse_hhmm
+
+    Returns:
+        Series: Minutos (int64; float64 com numeric_fallback), com o mesmo índice da entrada
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    dtype = np.float64 if numeric_fallback else np.int64
+
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.fillna(0).astype(dtype)
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    if len(uniques) == 0:
+        return pd.Series(np.zeros(len(series), dtype=dtype), index=series.index)
+
+    parsed = np.fromiter((parse_hhmm(value, 0, allow_seconds, numeric_fallback) for value in uniques),
+                         dtype=dtype, count=len(uniques))
+
+    # Código -1 (ausente) aponta para o 0 acrescentado ao final
+    lookup = np.append(parsed, 0)
+    return pd.Series(lookup[codes], index=series.index)
+
+
+def hours_from_hhmm(values):
+    """Converte uma Series HH:MM em horas decimais (float)."""
+    return minutes_from_hhmm(values) / 60.0
+
+
+def format_minutes(minutes):
+    """
+    Formata minutos inteiros como 'HH:MM' (horas podem passar de 99).
+
+    Args:
+        minutes (int | float): Total de minutos
+
+    Returns:
+        str: Duração formatada
+    """
+    try:
+        total = int(minutes)
+    except (TypeError, ValueError):
+        total = 0
+    if total < 0:
+        total = 0
+    return f"{total // 60:02d}:{total % 60:02d}"
@@ -232,3 +232,33 @@ def is_running_in_docker():
     docker_env_var = os.environ.get('RUNNING_IN_DOCKER') == 'true'
 
     return is_linux and (docker_env or docker_cgroup or docker_env_var)
+
+
+# SetThreadPriority (Windows)
+THREAD_PRIORITY_LOWEST = -2
+
+
+def lower_thread_priority(niceness=19):
+    """
+    Reduz a prioridade de CPU da thread atual (tarefas em segundo plano).
+    No Linux o nice é aplicado por thread; no Windows a thread recebe
+    THREAD_PRIORITY_LOWEST. Em outros sistemas não faz nada.
+
+    Returns:
+        bool: True se a prioridade foi reduzida
+    """
+    system = platform.system().lower()
+    try:
+        if system == 'linux' and hasattr(os, 'setpriority'):
+            import threading
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+            return True
+        if system == 'windows':
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            if kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_LOWEST):
+                return True
+            print(f"Não foi possível reduzir a prioridade da thread: erro {kernel32.GetLastError()}")
+    except (OSError, PermissionError, AttributeError) as e:
+        print(f"Não foi possível reduzir a prioridade da thread: {e}")
+    return False